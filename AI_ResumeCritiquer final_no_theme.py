@@ -1,62 +1,63 @@
-import streamlit as st
-import PyPDF2
-import io
+import hashlib
 import os
+
 import google.generativeai as genai
+import streamlit as st
 from dotenv import load_dotenv
 
+import spark_core
+
 load_dotenv()
 
+MODEL_NAME = "gemini-2.5-flash"
+
 st.set_page_config(page_title="AI Resume Critiquer", page_icon="📃", layout="centered")
 st.title("AI Resume Critiquer")
 st.markdown("Upload your resume and get AI-powered feedback tailored to your needs!")
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+
+@st.cache_resource
+def load_model():
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(MODEL_NAME)
+
+
+# Keyed by the upload's content hash; the leading underscore keeps Streamlit
+# from hashing the raw bytes on every rerun
+@st.cache_data(show_spinner=False, max_entries=64)
+def extract_text(file_hash, filename, _data):
+    return spark_core.extract_resume_text(filename, _data)
+
+
+# Same text and role as before: reuse the review instead of calling Gemini again
+@st.cache_data(show_spinner=False, max_entries=256, ttl=24 * 3600)
+def review_resume(file_content, job_role):
+    model = load_model()
+    return spark_core.review_resume(lambda prompt: model.generate_content(prompt).text, file_content, job_role)
+
 
 uploaded_file = st.file_uploader("Upload your resume (PDF or TXT)", type=["pdf", "txt"])
 job_role = st.text_input("Enter the job role you're targeting (optional)")
 analyze = st.button("Analyze Resume")
 
-def extract_text_from_pdf(pdf_file):
-    pdf_reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() + "\n"
-    return text
-
-def extract_text_from_file(uploaded_file):
-    if uploaded_file.type == "application/pdf":
-        return extract_text_from_pdf(io.BytesIO(uploaded_file.read()))
-    return uploaded_file.read().decode("utf-8")
-
-if analyze and uploaded_file:
-    try:
-        file_content = extract_text_from_file(uploaded_file)
-        
-        if not file_content.strip():
-            st.error("File does not have any content...")
-            st.stop()
-        
-        prompt = f"""You are an expert resume reviewer with years of experience in HR and recruitment.
-
-Please analyze this resume and provide constructive feedback. 
-Focus on the following aspects:
-1. Content clarity and impact
-2. Skills presentation
-3. Experience descriptions
-4. Specific improvements for {job_role if job_role else 'general job applications'}
-
-Resume content:
-{file_content}
-
-Please provide your analysis in a clear, structured format with specific recommendations."""
-        
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        
-        st.markdown("### Analysis Results")
-        st.markdown(response.text)
-    
-    except Exception as e:
-        st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
+if uploaded_file:
+    data = uploaded_file.getvalue()
+    request = (hashlib.sha256(data).hexdigest(), job_role)
+    # Remember the click, so later reruns keep showing the (cached) analysis
+    if analyze:
+        st.session_state["analyzed"] = request
+
+    if st.session_state.get("analyzed") == request:
+        try:
+            with st.spinner("Analyzing resume..."):
+                file_content = extract_text(request[0], uploaded_file.name, data)
+                review = review_resume(file_content, job_role)
+
+            st.markdown("### Analysis Results")
+            st.metric("ATS Score", f"{review['ats_score']}/100")
+            st.markdown(review["analysis"])
+
+        except spark_core.RequestError as e:
+            st.error(f"{str(e)}...")
+        except Exception as e:
+            st.error(f"An error occurred: {str(e)}")
@@ -1,42 +1,30 @@
-import cv2
-import numpy as np
+import hashlib
+
 import streamlit as st
 from PIL import Image
-from tensorflow.keras.applications.mobilenet_v2 import (
-    MobileNetV2,
-    preprocess_input,
-    decode_predictions,
-)
 
+import spark_core
 
-# Load the pre-trained MobileNetV2 model
-def load_model():
-    model = MobileNetV2(weights="imagenet")
-    return model
 
+# Load the pre-trained MobileNetV2 model once per server process
+@st.cache_resource
+def load_model():
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
 
-# Preprocess the image for model input
-def preprocess_image(image):
-    img = np.array(image)  # Convert PIL image to numpy array
-    img = cv2.resize(img, (224, 224))  # Resize to 224x224 pixels
-    img = preprocess_input(img)  # Preprocess as per MobileNetV2 requirements
-    img = np.expand_dims(img, axis=0)  # Add batch dimension
-    return img
+    return MobileNetV2(weights="imagenet")
 
 
-# Make predictions using the model
-def classify_image(model, image):
-    try:
-        processed_image = preprocess_image(image)
-        predictions = model.predict(processed_image)  # ✅ Fixed: use processed_image
-        decoded_preds = decode_predictions(predictions, top=3)[
-            0
-        ]  # ✅ Fixed: renamed variable
-        return decoded_preds
+# Same upload (by content hash) and top-k: reuse the result instead of
+# decoding, preprocessing and predicting again on every rerun.
+# The leading underscore keeps Streamlit from hashing the raw bytes.
+@st.cache_data(show_spinner=False, max_entries=256)
+def classify_image(file_hash, _data, top=3):
+    from tensorflow.keras.applications.mobilenet_v2 import decode_predictions
 
-    except Exception as e:
-        st.error(f"An error occurred during classification: {str(e)}")
-        return None
+    model = load_model()
+    return spark_core.classify_image(
+        lambda batch: model.predict(batch, verbose=0), decode_predictions, _data, top
+    )
 
 
 # Streamlit app
@@ -48,28 +36,28 @@ def main():
     st.title("Image Classification")
     st.write("Upload an image, and the AI model tell its categories.")
 
-    @st.cache_resource
-    def load_cached_model():
-        return load_model()
-
-    model = load_cached_model()
-
     uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
 
     if uploaded_file is not None:
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Uploaded Image", use_container_width=True)
+        data = uploaded_file.getvalue()
+        file_hash = hashlib.sha256(data).hexdigest()
+        st.image(Image.open(uploaded_file), caption="Uploaded Image", use_container_width=True)
 
+        # Remember the click, so later reruns keep showing the (cached) result
         if st.button("Classify Image"):
-            with st.spinner("Classifying image..."):
-                predictions = classify_image(model, image)
-
-                if predictions:
-                    st.subheader("Classification Results:")
-                    for _, label, score in predictions:
-                        st.write(
-                            f"**{label}**: {score*100:.2f}%"
-                        )  # ✅ Fixed: proper percentage
+            st.session_state["classified"] = file_hash
+
+        if st.session_state.get("classified") == file_hash:
+            try:
+                with st.spinner("Classifying image..."):
+                    predictions = classify_image(file_hash, data)
+            except Exception as e:
+                st.error(f"An error occurred during classification: {str(e)}")
+                return
+
+            st.subheader("Classification Results:")
+            for prediction in predictions:
+                st.write(f"**{prediction['label']}**: {prediction['confidence']:.2f}%")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,352 @@
+"""Admission control: per-IP rate limits and a bounded LLM concurrency gate.
+
+RateLimiter keeps a token bucket per (client IP, endpoint). RATE_LIMITS lists
+the limited endpoints as `path=count/period` pairs, e.g.
+
+    RATE_LIMITS=/api/chat=20/min,/api/resume-review=6/min
+
+where a client may burst up to `count` requests and then gets one more every
+period/count. Requests over the limit are answered 429 with Retry-After.
+`RATE_LIMITS=default` turns on DEFAULT_RATE_LIMITS; left unset, those
+defaults apply only when TRUSTED_PROXY_HOPS is set (see below), since keyed
+on a proxy's address they would throttle every user together.
+
+Clients are told apart by IP. Behind reverse proxies (a load balancer, a CDN,
+the hosting platform's router) every request comes from a proxy address, so
+set TRUSTED_PROXY_HOPS to the number of proxies in front of the app: the
+client is then the address that many entries from the right of
+X-Forwarded-For (werkzeug's ProxyFix rule, used by the Flask app too).
+Entries further left are client-supplied and never trusted. With limits on,
+no trusted hops and requests arriving with X-Forwarded-For, a warning is
+logged once.
+
+ConcurrencyGate bounds how many Gemini calls are in flight per worker
+(LLM_MAX_CONCURRENCY). Extra calls wait in a FIFO queue of at most
+LLM_MAX_QUEUE entries for at most LLM_MAX_QUEUE_SECONDS; past either limit
+they fail fast with GateRejected, which the views turn into 503 +
+Retry-After instead of letting the request run into the LLM deadline.
+Threads and asyncio tasks share the same gate.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from llm_gateway import LLMUnavailable
+
+DEFAULT_RATE_LIMITS = (
+    "/api/chat=20/min,/api/chat/stream=20/min,/api/resume-review=6/min,/api/resume-review/batch=2/min,"
+    "/api/image-classify=60/min,/api/image-classify/batch=6/min,/api/contact=5/min"
+)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+RATE_LIMITS = os.getenv("RATE_LIMITS") or ('default' if TRUSTED_PROXY_HOPS > 0 else 'off')
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_MAX_QUEUE_SECONDS = float(os.getenv("LLM_MAX_QUEUE_SECONDS", "5"))
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600}
+
+
+class RateLimited(Exception):
+    """A client went over its request budget for an endpoint"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GateRejected(LLMUnavailable):
+    """The LLM queue is full, or a call waited longer than the max queue time"""
+
+
+def retry_after_header(seconds):
+    return str(max(1, math.ceil(seconds)))
+
+
+def forwarded_client_ip(peer, forwarded_for, hops=None):
+    """Client address behind `hops` trusted proxies; the peer itself when there are none"""
+    hops = TRUSTED_PROXY_HOPS if hops is None else hops
+    if hops <= 0 or not forwarded_for:
+        return peer
+    addresses = [a.strip() for a in forwarded_for.split(',')]
+    # Fewer entries than proxies: the header is not what our proxies wrote
+    if len(addresses) < hops or not addresses[-hops]:
+        return peer
+    return addresses[-hops]
+
+
+_proxy_warned = False
+
+
+def warn_untrusted_proxy(limiter, forwarded_for):
+    """Log once when per-IP limits are keyed on what looks like a proxy's address"""
+    global _proxy_warned
+    if _proxy_warned or not forwarded_for or TRUSTED_PROXY_HOPS > 0 or not limiter.enabled:
+        return
+    _proxy_warned = True
+    print("⚠️ Rate limits are on but requests arrive through a proxy (X-Forwarded-For) and "
+          "TRUSTED_PROXY_HOPS=0: every client shares the proxy's budget. Set TRUSTED_PROXY_HOPS "
+          "to the number of proxies in front of the app, or RATE_LIMITS=off.")
+
+
+def parse_limits(spec):
+    """'path=count/period,...' -> {path: (count, period seconds)}; '' or 'off' -> {};
+    'default' -> DEFAULT_RATE_LIMITS"""
+    limits = {}
+    if not spec or spec.strip().lower() == 'off':
+        return limits
+    if spec.strip().lower() == 'default':
+        spec = DEFAULT_RATE_LIMITS
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        path, _, rate = part.strip().rpartition('=')
+        count, _, period = rate.partition('/')
+        period = period.strip().lower() or 's'
+        seconds = PERIODS.get(period)
+        if seconds is None:
+            seconds = float(period.rstrip('s'))  # e.g. "10/30s"
+        limits[path.strip()] = (int(count), float(seconds))
+    return limits
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+
+
+class RateLimiter:
+    """Token bucket per (client, endpoint); endpoints without a limit pass"""
+
+    def __init__(self, limits=None, max_keys=10000):
+        self.limits = parse_limits(RATE_LIMITS) if limits is None else limits
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = {}  # endpoint -> count
+
+    @property
+    def enabled(self):
+        return bool(self.limits)
+
+    def check(self, client, endpoint):
+        """Take one token or raise RateLimited"""
+        limit = self.limits.get(endpoint)
+        if limit is None:
+            return
+        capacity, period = limit
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((client, endpoint))
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[(client, endpoint)] = _Bucket(capacity, now)
+            bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                self.allowed += 1
+                return
+            self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+            retry_after = (1 - bucket.tokens) / rate
+        raise RateLimited(f"Too many requests to {endpoint}, try again in {retry_after_header(retry_after)}s",
+                          retry_after)
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        for key, bucket in list(self._buckets.items()):
+            capacity, period = self.limits[key[1]]
+            if bucket.tokens + (now - bucket.updated) * capacity / period >= capacity:
+                del self._buckets[key]
+
+    def stats(self):
+        return {
+            'limits': {path: f"{count}/{period:g}s" for path, (count, period) in self.limits.items()},
+            'clients_tracked': len(self._buckets),
+            'allowed': self.allowed,
+            'rejected': dict(self.rejected)
+        }
+
+
+class _Waiter:
+    __slots__ = ('loop', 'event', 'future', 'granted')
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Slot:
+    """One admitted LLM call; release() (or leaving the with block) frees it"""
+
+    def __init__(self, gate):
+        self._gate = gate
+        self._started = time.monotonic()
+
+    def release(self):
+        gate, self._gate = self._gate, None
+        if gate is not None:
+            gate._release(time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ConcurrencyGate:
+    """At most `limit` holders; FIFO queue bounded in length and wait time"""
+
+    def __init__(self, limit=None, max_queue=None, max_wait=None):
+        self.limit = LLM_MAX_CONCURRENCY if limit is None else limit
+        self.max_queue = LLM_MAX_QUEUE if max_queue is None else max_queue
+        self.max_wait = LLM_MAX_QUEUE_SECONDS if max_wait is None else max_wait
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.active = 0
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = {'queue_full': 0, 'queue_timeout': 0}
+        self.wait_seconds = 0.0
+        self._hold_seconds = 1.0  # moving average of how long a call holds its slot
+
+    def _enter(self, waiter):
+        """Take a free slot (True) or join the queue (False); raise when it is full"""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                self.rejected['queue_full'] += 1
+                raise GateRejected("Too many AI requests in progress, please retry shortly",
+                                   retry_after=self.retry_after())
+            self._waiters.append(waiter)
+            self.queued_total += 1
+            return False
+
+    def _give_up(self, waiter, waited, reason='queue_timeout'):
+        """Leave the queue after a timeout; True if the slot arrived meanwhile"""
+        with self._lock:
+            self.wait_seconds += waited
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            if reason:
+                self.rejected[reason] += 1
+            return False
+
+    def _timeout_error(self):
+        return GateRejected(f"AI request queue wait exceeded {self.max_wait:g}s, please retry shortly",
+                            retry_after=self.retry_after())
+
+    def acquire(self):
+        """Block until admitted (threads); returns a Slot"""
+        if self.limit <= 0:
+            return Slot(None)
+        waiter = _Waiter()
+        if self._enter(waiter):
+            return Slot(self)
+        started = time.monotonic()
+        waiter.event.wait(self.max_wait)
+        if not self._give_up(waiter, time.monotonic() - started):
+            raise self._timeout_error()
+        return Slot(self)
+
+    async def acquire_async(self):
+        """acquire() for asyncio tasks: waits without holding a thread"""
+        if self.limit <= 0:
+            return Slot(None)
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._enter(waiter):
+            return Slot(self)
+        started = time.monotonic()
+        try:
+            await asyncio.wait([waiter.future], timeout=self.max_wait)
+        except asyncio.CancelledError:
+            if self._give_up(waiter, time.monotonic() - started, reason=None):
+                self._release(0.0)
+            raise
+        if not self._give_up(waiter, time.monotonic() - started):
+            raise self._timeout_error()
+        return Slot(self)
+
+    def _release(self, held):
+        with self._lock:
+            if held:
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held
+            # Hand the slot straight to the next waiter so nobody can cut the queue
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                self.admitted += 1
+                waiter.wake()
+                return
+            self.active -= 1
+
+    def retry_after(self):
+        """Rough time until the current queue drains"""
+        return self._hold_seconds * (len(self._waiters) + 1) / max(1, self.limit)
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'max_queue': self.max_queue,
+            'max_wait_seconds': self.max_wait,
+            'active': self.active,
+            'queue_depth': len(self._waiters),
+            'admitted': self.admitted,
+            'queued_total': self.queued_total,
+            'wait_seconds_total': round(self.wait_seconds, 3),
+            'rejected': dict(self.rejected),
+            'avg_hold_seconds': round(self._hold_seconds, 3)
+        }
+
+
+def init_app(app, limiter):
+    """Trust TRUSTED_PROXY_HOPS proxies for remote_addr, then check the rate limiter
+    before every Flask view (nothing when no limits)"""
+    if TRUSTED_PROXY_HOPS > 0:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+    if not limiter.enabled:
+        return False
+    from flask import jsonify, request
+
+    @app.before_request
+    def _rate_limit():
+        if request.method == 'OPTIONS' or request.url_rule is None:
+            return None  # CORS preflights and 404s don't spend tokens
+        warn_untrusted_proxy(limiter, request.headers.get('X-Forwarded-For'))
+        try:
+            limiter.check(request.remote_addr, request.url_rule.rule)
+        except RateLimited as e:
+            response = jsonify({'error': str(e)})
+            response.status_code = 429
+            response.headers['Retry-After'] = retry_after_header(e.retry_after)
+            return response
+        return None
+
+    return True
@@ -1,21 +1,41 @@
-from flask import Flask, request, jsonify
+from lazy_loader import ResourceRegistry
+
+# Created first so the startup report covers every import below
+resources = ResourceRegistry()
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import PyPDF2
-import io
 import os
 import json
+import time
 from datetime import datetime
-import google.generativeai as genai
 from dotenv import load_dotenv
-import cv2
 import numpy as np
-from PIL import Image
-from tensorflow.keras.applications.mobilenet_v2 import (
-    MobileNetV2,
-    preprocess_input,
-    decode_predictions,
-)
-from supabase import create_client, Client
+from image_batcher import MicroBatcher
+from model_server import ModelServerClient, ModelServerUnavailable
+import admission
+import ats_scorer
+import batch_classify
+import image_preprocess
+import inference_backends
+import pdf_extract
+import request_metrics
+import resume_batch
+import resume_compact
+import spark_core
+from batch_classify import BatchClassifier, BatchLimitError
+from image_preprocess import ImageLimitError
+from pdf_extract import PDFLimitError
+from resume_batch import ResumeBatchLimitError, ResumeBatchReviewer
+from spark_core import (IMAGE_EXTENSIONS, RESUME_EXTENSIONS, RequestError, build_resume_prompt,
+                        parse_review_response)
+from usage_logger import UsageLogWriter
+from usage_stats import UsageRollups, parse_time, supabase_rows
+from storage import SQLiteStore, SupabaseStore, message_columns, message_cursor
+from result_cache import ImageResultCache, ResumeReviewCache, make_backend
+from chat_cache import SemanticChatCache
+from chat_sessions import ConversationStore
+from llm_gateway import LLMDeadlineExceeded, LLMGateway, LLMUnavailable
 
 # Load environment variables
 load_dotenv()
@@ -23,86 +43,470 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+request_metrics.init_app(app)  # Server-Timing header + /api/metrics (METRICS_ENABLED=0 to disable)
+rate_limiter = admission.RateLimiter()  # per-IP token buckets (RATE_LIMITS; see admission.py)
+admission.init_app(app, rate_limiter)
 
-# Configure Google AI
+# Heavy dependencies are loaded on first use (see lazy_loader.py) so a fresh
+# worker can serve /api/health and /api/chat without importing TensorFlow.
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
-
-# Initialize Supabase Client
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = None
 
-if SUPABASE_URL and SUPABASE_KEY:
+
+def _load_genai():
+    """Configure Google AI"""
+    import google.generativeai as genai
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai
+
+
+def _load_supabase():
+    """Initialize Supabase Client (None when unavailable)"""
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        print("⚠️ Supabase credentials missing. Local file storage will be used as fallback.")
+        return None
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        from supabase import create_client
+        client = create_client(SUPABASE_URL, SUPABASE_KEY)
         print("✅ Supabase initialized successfully")
+        return client
     except Exception as e:
         print(f"❌ Failed to initialize Supabase: {str(e)}")
-else:
-    print("⚠️ Supabase credentials missing. Local file storage will be used as fallback.")
+        return None
+
+
+def _load_mobilenet():
+    from tensorflow.keras.applications import mobilenet_v2
+    return mobilenet_v2
+
+
+def _load_pypdf2():
+    import PyPDF2
+    return PyPDF2
+
+
+def _load_cv2():
+    import cv2
+    return cv2
 
-# Load Image Classification Model
-image_model = MobileNetV2(weights="imagenet")
+
+genai_client = resources.register('genai', _load_genai)
+supabase_client = resources.register('supabase', _load_supabase)
+pypdf2 = resources.register('PyPDF2', _load_pypdf2)
+cv2_module = resources.register('cv2', _load_cv2)
+mobilenet_v2 = resources.register('mobilenet_v2', _load_mobilenet)
+
+# Load Image Classification Model (IMAGE_BACKEND: keras, graph, tflite-fp16, tflite-int8, onnx)
+image_model = resources.register('image_model', lambda: inference_backends.load_backend())
+
+# Optional shared model process (MODEL_SERVER_ADDRESS); see model_server.py
+model_server = ModelServerClient()
+
+
+def predict_images(batch):
+    """Run a preprocessed batch on the model server, or in-process as a fallback"""
+    if model_server.available:
+        try:
+            return model_server.predict(batch)
+        except ModelServerUnavailable:
+            pass
+    return image_model.get().predict(batch)
+
+
+# Concurrent classify requests share one forward pass per batch window
+image_batcher = MicroBatcher(predict_images)
+
+# Re-uploads of the same image skip decode, preprocessing and inference
+image_cache = ImageResultCache(
+    make_backend(os.getenv("IMAGE_CACHE_BACKEND", "memory"), 'images',
+                 int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "1024"))),
+    ttl=int(os.getenv("IMAGE_CACHE_TTL", "86400")),
+    perceptual=os.getenv("IMAGE_CACHE_PHASH", "0") == "1",
+    max_distance=int(os.getenv("IMAGE_CACHE_PHASH_DISTANCE", "4"))
+)
 
 
 # Initialize Chat Model with Google Search Grounding
 # Using Gemini's built-in search - no external APIs needed!
-chat_model_with_search = genai.GenerativeModel(
-    model_name='gemini-2.5-flash',
-    tools='google_search_retrieval'  # Built-in Google Search
+chat_model_with_search = resources.register(
+    'chat_model_with_search',
+    lambda: genai_client.get().GenerativeModel(
+        model_name='gemini-2.5-flash',
+        tools='google_search_retrieval'  # Built-in Google Search
+    )
 )
 
 # Fallback model without search for non-search queries
-chat_model_basic = genai.GenerativeModel(
-    model_name='gemini-2.5-flash'
+chat_model_basic = resources.register(
+    'chat_model_basic',
+    lambda: genai_client.get().GenerativeModel(model_name='gemini-2.5-flash')
+)
+
+RESUME_MODEL_NAME = 'gemini-2.5-flash'
+# 'fast' answers with the local ATS score only (ats_scorer), no Gemini call
+RESUME_MODES = ('full', 'fast')
+
+resume_model = resources.register(
+    'resume_model',
+    lambda: genai_client.get().GenerativeModel(RESUME_MODEL_NAME)
 )
 
-print("✅ Gemini models initialized with Google Search grounding")
+# Every Gemini call goes through the gateway: deadlines, retries, circuit breakers,
+# and a bounded number in flight (the rest queue briefly, then get a 503)
+llm_gateway = LLMGateway({
+    'search': chat_model_with_search,
+    'basic': chat_model_basic,
+    'resume': resume_model
+}, gate=admission.ConcurrencyGate())
+CHAT_MODELS = ('search', 'basic')
+
+# Resubmitted resumes reuse their extracted text and parsed review
+resume_cache = ResumeReviewCache(
+    make_backend(os.getenv("RESUME_CACHE_BACKEND", "disk"), 'resume_text',
+                 int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "2048"))),
+    make_backend(os.getenv("RESUME_CACHE_BACKEND", "disk"), 'resume_reviews',
+                 int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "2048"))),
+    ttl=int(os.getenv("RESUME_CACHE_TTL", "604800"))
+)
+
+# Bulk screening: parallel extraction, at most RESUME_BATCH_WORKERS reviews in flight per batch
+resume_batch_reviewer = ResumeBatchReviewer()
+
+# Server-side chat history (opt-in per request with 'conversationId')
+chat_sessions = ConversationStore(
+    make_backend(os.getenv("CHAT_SESSION_BACKEND", "memory"), 'chat_sessions',
+                 int(os.getenv("CHAT_SESSION_MAX", "5000"))),
+    ttl=int(os.getenv("CHAT_SESSION_TTL", "86400")),
+    token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+)
+
+# Repeated context-free, non-time-sensitive questions ("who are you?") skip Gemini
+chat_cache = SemanticChatCache()
+
+
+def get_supabase():
+    """Supabase client, or None when running in local-only mode"""
+    return supabase_client.get()
+
+
+# Local SQLite (WAL) database for messages, usage logs and usage rollups
+local_store = SQLiteStore()
+
+
+def get_store():
+    """Primary storage: Supabase when configured, otherwise the local database"""
+    supabase = get_supabase()
+    return SupabaseStore(supabase) if supabase else local_store
 
 
 # Helper Functions for Analytics
-def log_usage(tool_name):
-    """Log tool usage to Supabase or console"""
+def _insert_usage_rows(rows):
+    """Bulk-insert usage rows (runs on the usage log writer thread)"""
+    store = get_store()
+    store.insert_usage(rows)
+    if store is local_store:
+        for row in rows:
+            print(f"📊 Activity (Local): {row['tool_name']}")
+    else:
+        print(f"📊 Activity logged: {len(rows)} rows")
+
+
+# Per-tool and hour/day counters behind /api/stats (works without Supabase)
+usage_rollups = UsageRollups(local_store.path)
+
+
+def _seed_usage_rows(before):
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Supabase is not available")
+    return supabase_rows(supabase, before)
+
+
+# A fresh (empty) rollup database is backfilled from Supabase usage_logs
+if SUPABASE_URL and SUPABASE_KEY:
+    usage_rollups.seed_in_background(_seed_usage_rows)
+
+# Usage rows are written in the background so requests never wait on Supabase
+usage_logger = UsageLogWriter(_insert_usage_rows, on_batch=usage_rollups.record)
+
+
+def log_usage(tool_name, ip_address=None):
+    """Queue a usage log entry for Supabase or console"""
     try:
-        entry = {
-            'timestamp': datetime.now().isoformat(),
-            'tool_name': tool_name,
-            'ip_address': request.remote_addr
-        }
-        
-        if supabase:
-            supabase.table('usage_logs').insert(entry).execute()
-            print(f"📊 Activity logged: {tool_name}")
-        else:
-            print(f"📊 Activity (Local): {tool_name}")
+        with request_metrics.phase('log_usage'):
+            usage_logger.log({
+                'timestamp': datetime.now().isoformat(),
+                'tool_name': tool_name,
+                'ip_address': ip_address or request.remote_addr
+            })
     except Exception as e:
         print(f"⚠️ Failed to log usage: {str(e)}")
 
 
 # Helper Functions for Resume Review
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF file"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        raise Exception(f"Error extracting text from PDF: {str(e)}")
+def extract_text_from_pdf(data):
+    """Extract text from PDF bytes (page/size/time limits in pdf_extract.py)"""
+    pypdf2.get()  # first use is timed in the startup report
+    return spark_core.extract_pdf_text(data)
+
+
+def llm_unavailable_response(error):
+    """503 for a Gemini outage or a full LLM queue, with Retry-After when known"""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after is not None:
+        response.headers['Retry-After'] = admission.retry_after_header(retry_after)
+    return response
+
+
+def read_resume_upload(file):
+    """Upload bytes; PDFs are read at most one byte past the limit (extraction rejects them)"""
+    if file.filename.endswith('.pdf'):
+        return file.read(pdf_extract.MAX_BYTES + 1)
+    return file.read()
+
+
+def resume_text(filename, data, bypass_cache=False):
+    """Extract (or reuse) the text of an uploaded resume"""
+    if not filename.endswith('.pdf'):
+        return spark_core.extract_resume_text(filename, data)
+    text_key = resume_cache.text_key(data)
+    file_content = None if bypass_cache else resume_cache.texts.get(text_key)
+    if file_content is None:
+        with request_metrics.phase('pdf_extract'):
+            file_content = spark_core.extract_resume_text(filename, data, extract_text_from_pdf)
+        resume_cache.texts.set(text_key, file_content)
+    return file_content
+
+
+def prepare_resume(filename, data, job_role='', job_description='', jd_tokens=None, bypass_cache=False,
+                   fast=False):
+    """Extract and locally score one resume, then compact it and look up the review cache.
+    `job_description` is already compacted. Returns (prompt, review key, cached review,
+    token report, local ATS score); with `fast` only the local score is filled in."""
+    file_content = resume_text(filename, data, bypass_cache)
+    
+    # Deterministic keyword score on the full text, before any truncation
+    with request_metrics.phase('ats_score'):
+        local_score = ats_scorer.score(file_content, job_description, job_role)
+    if fast:
+        return None, None, None, None, local_score
+    
+    # Whitespace, page furniture and boilerplate out; fit the prompt token budget
+    with request_metrics.phase('compact'):
+        file_content, resume_tokens = resume_compact.compact_resume(file_content)
+    
+    if not file_content.strip():
+        raise RequestError('File does not have any content')
+    
+    # Same resume + role + JD (+ model) as before: reuse the parsed review
+    review_key = resume_cache.review_key(file_content, job_role, job_description, RESUME_MODEL_NAME)
+    review = None if bypass_cache else resume_cache.reviews.get(review_key)
+    prompt = None if review is not None else build_resume_prompt(file_content, job_role, job_description)
+    return prompt, review_key, review, {'resume': resume_tokens, 'job_description': jd_tokens}, local_score
+
+
+def review_resume(prompt, review_key):
+    """Gemini call + parse for a prepared resume (shared model, deadline and retries via the gateway)"""
+    review = parse_review_response(llm_gateway.generate('resume', prompt))
+    resume_cache.reviews.set(review_key, review)
+    return review
+
+
+def resume_mode(form):
+    """'full' (local score + Gemini review, the default) or 'fast' (local score only)"""
+    mode = form.get('mode') or 'full'
+    if mode not in RESUME_MODES:
+        raise RequestError(f"mode must be one of: {', '.join(RESUME_MODES)}")
+    if mode == 'fast' and not (form.get('jobDescription') or form.get('jobRole')):
+        raise RequestError('mode=fast needs a jobDescription or jobRole to score against')
+    return mode
+
+
+def prepare_resume_review(files, form):
+    """Everything before the Gemini call for /api/resume-review: validate the
+    upload, then prepare_resume(). Returns (prompt, review key, cached review,
+    prompt token report, local ATS score)."""
+    # Check if file is present (first access parses the multipart upload)
+    with request_metrics.phase('upload'):
+        if 'file' not in files:
+            raise RequestError('No file provided')
+    
+    file = files['file']
+    job_role = form.get('jobRole', '')
+    bypass_cache = form.get('bypassCache', '').lower() in ('1', 'true', 'yes')
+    fast = resume_mode(form) == 'fast'
+    
+    if file.filename == '':
+        raise RequestError('No file selected')
+    if not file.filename.endswith(RESUME_EXTENSIONS):
+        raise RequestError('Invalid file type. Only PDF and TXT are supported')
+    
+    with request_metrics.phase('compact'):
+        job_description, jd_tokens = resume_compact.compact_job_description(form.get('jobDescription', ''))
+    return prepare_resume(file.filename, read_resume_upload(file), job_role, job_description, jd_tokens,
+                          bypass_cache, fast)
+
+
+def resume_review_result(review, cached, prompt_tokens=None, local_score=None):
+    """Response body; `review` is None in fast mode, where the local score is the ATS score"""
+    if review is None:
+        return {
+            'success': True,
+            'mode': 'fast',
+            'analysis': None,
+            'ats_score': local_score['score'] if local_score else None,
+            'cached': False,
+            'local_score': local_score
+        }
+    return {
+        'success': True,
+        'mode': 'full',
+        'analysis': review['analysis'],
+        'ats_score': review['ats_score'],
+        'cached': cached,
+        'prompt_tokens': prompt_tokens,
+        'local_score': local_score
+    }
 
 
 # Helper Functions for Image Classification
+def decode_top_predictions(predictions, top):
+    """ImageNet labels for each row of a prediction batch"""
+    return spark_core.label_predictions(mobilenet_v2.get().decode_predictions, predictions, top)
+
+
+# Bulk classification: thread-pool decode, fixed-size batches straight to the model
+batch_classifier = BatchClassifier(predict_images, decode_top_predictions, cache=image_cache)
+
+
 def preprocess_image_for_classification(image):
-    """Preprocess image for MobileNetV2"""
+    """Full-resolution reference path (see bench_image_preprocess.py); the API uses image_preprocess"""
     img = np.array(image)
-    img = cv2.resize(img, (224, 224))
-    img = preprocess_input(img)
+    img = cv2_module.get().resize(img, (224, 224))
+    img = mobilenet_v2.get().preprocess_input(img)
     img = np.expand_dims(img, axis=0)
     return img
 
 
+# Helper Functions for Chat
+CHAT_FALLBACK_REPLY = "I'm sorry, I couldn't process that response."
+
+
+def chat_request_data(data):
+    """Parsed chat request body; RequestError (400) unless it is a JSON object"""
+    if not isinstance(data, dict):
+        raise RequestError('Request body must be a JSON object')
+    return data
+
+
+def open_conversation(data):
+    """Server-side session mode: (conversation id, stored conversation) or (None, None)"""
+    if 'conversationId' not in data or not chat_sessions.enabled:
+        return None, None
+    conversation_id = data.get('conversationId') or chat_sessions.new_id()
+    if not chat_sessions.valid_id(conversation_id):
+        raise RequestError('conversationId must be 1-64 letters, digits, "_" or "-"')
+    return conversation_id, chat_sessions.load(conversation_id)
+
+
+def chat_has_context(gemini_history, conversation=None):
+    """Earlier turns (or a session summary) make a reply specific to this conversation"""
+    return bool(gemini_history) or bool(conversation and conversation['summary'])
+
+
+def cached_chat_reply(latest_message, gemini_history, conversation=None):
+    """Semantic cache hit for this question, or None (miss or not cacheable)"""
+    return chat_cache.lookup(latest_message, chat_has_context(gemini_history, conversation))
+
+
+def remember_chat_reply(latest_message, gemini_history, conversation, reply, model_name, started):
+    """Cache a fresh upstream reply with the latency a later hit will save"""
+    chat_cache.store(latest_message, reply, model_name, (time.perf_counter() - started) * 1000,
+                     chat_has_context(gemini_history, conversation))
+
+
+def chat_result(reply, latest_message, conversation_id=None, conversation=None, cached=False):
+    """Response body for a chat turn; stores the turn in session mode"""
+    reply = reply or CHAT_FALLBACK_REPLY
+    result = {
+        'success': True,
+        'response': reply,
+        'cached': cached
+    }
+    if conversation is not None:
+        chat_sessions.append(conversation_id, conversation, latest_message, reply)
+        result['conversationId'] = conversation_id
+    return result
+
+
+def chat_stream_event(kind, payload, ndjson=False):
+    """One streaming chat event as an SSE frame or an NDJSON line"""
+    if ndjson:
+        return json.dumps({'type': kind, **payload}) + '\n'
+    return f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+
+
+def chat_stream_summary(parts, model_name, started, ttft_ms, latest_message, conversation_id=None,
+                        conversation=None, cached=False):
+    """Payload of the final 'done' event; stores the turn in session mode"""
+    total_ms = (time.perf_counter() - started) * 1000
+    if not cached:
+        print(f"✅ Streamed chat reply from {model_name} model in {total_ms:.0f} ms")
+    summary = {
+        'success': True,
+        'model': model_name,
+        'response': ''.join(parts),
+        'cached': cached,
+        'ttft_ms': round(ttft_ms, 1) if ttft_ms is not None else None,
+        'total_ms': round(total_ms, 1)
+    }
+    if conversation is not None:
+        chat_sessions.append(conversation_id, conversation, latest_message, summary['response'])
+        summary['conversationId'] = conversation_id
+    return summary
+
+
+def build_chat_prompt(data, conversation=None):
+    """Split a chat request into (latest message, full prompt, Gemini history)"""
+    history = data.get('messages', [])
+    
+    # Get the latest message
+    latest_message = history[-1].get('content', '') if history else data.get('message', '')
+    
+    # Prepend system instructions
+    today = datetime.now().strftime("%B %d, %Y")
+    system_prompt = f"""You are S.P.A.R.K. — your Smart Personal Assistant for Real-time Knowledge. 
+Today's date is {today}. 
+Your identity is S.P.A.R.K. (Smart Personal Assistant for Real-time Knowledge). 
+You have access to a comprehensive search for real-time information.
+Use search for: current weather, news, sports scores, stock prices, or any time-sensitive data.
+Always be helpful, friendly, and professional.
+If anyone asks 'Who are you?', reply: 'I am S.P.A.R.K. — your Smart Personal Assistant for Real-time Knowledge. I'm powered by advanced Gemini AI.'"""
+    
+    if conversation is not None:
+        # Server-side session: history (already trimmed to budget) comes from the store
+        latest_message = data.get('message') or latest_message
+        gemini_history = chat_sessions.gemini_history(conversation)
+        if conversation['summary']:
+            system_prompt += f"\nEarlier in this conversation:\n{conversation['summary']}"
+        return latest_message, f"{system_prompt}\n\nUser: {latest_message}", gemini_history
+    
+    # Build chat history for Gemini
+    gemini_history = []
+    for msg in history[:-1]:  # All except the last message
+        role = 'user' if msg.get('role') == 'user' else 'model'
+        gemini_history.append({
+            'role': role,
+            'parts': [msg.get('content', '')]
+        })
+    
+    full_prompt = f"{system_prompt}\n\nUser: {latest_message}"
+    return latest_message, full_prompt, gemini_history
+
+
 # API Endpoints
 
 @app.route('/api/resume-review', methods=['POST'])
@@ -110,87 +514,81 @@ def resume_review():
     """Endpoint for resume review"""
     log_usage('resume_review')
     try:
-        # Check if file is present
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        job_role = request.form.get('jobRole', '')
-        job_description = request.form.get('jobDescription', '')
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        # Extract text based on file type
-        if file.filename.endswith('.pdf'):
-            file_content = extract_text_from_pdf(io.BytesIO(file.read()))
-        elif file.filename.endswith('.txt'):
-            file_content = file.read().decode('utf-8')
-        else:
-            return jsonify({'error': 'Invalid file type. Only PDF and TXT are supported'}), 400
-        
-        if not file_content.strip():
-            return jsonify({'error': 'File does not have any content'}), 400
-        
-        # Create prompt for AI analysis
-        prompt = f"""You are a brutally honest, zero-fluff recruitment critic and expert resume reviewer. 
-Your goal is to tear apart this resume and give the candidate the harsh truth they need to hear to actually get hired. NO SUGAR-COATING.
+        prompt, review_key, review, prompt_tokens, local_score = prepare_resume_review(request.files,
+                                                                                       request.form)
+        cached = review is not None
 
-Analyze the resume for the role of: {job_role if job_role else 'General Role'}
-{"Compare it strictly against this Job Description:" if job_description else ""}
-{job_description if job_description else ""}
+        if prompt is not None:
+            review = review_resume(prompt, review_key)
 
-Focus on:
-1. Hard Truths: What is objectively wrong or weak?
-2. Red Flags: Why would a recruiter toss this in the trash in 5 seconds?
-3. Keyword Gaps: What essential skills are missing?
-4. Formatting Nightmares: Is it readable for an ATS?
+        return jsonify(resume_review_result(review, cached, prompt_tokens, local_score))
+    
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except PDFLimitError as e:
+        return jsonify({'error': str(e)}), 413
+    except (LLMUnavailable, LLMDeadlineExceeded) as e:
+        return llm_unavailable_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-IMPORTANT: You must also provide a numerical ATS compatibility score between 0 and 100. Be strict. If it's bad, give it a low score.
 
-Format your response as follows:
-ATS Score: [Score]
-Analysis:
-[Your brutal, honest, and direct feedback here in markdown format. Use bolding and headers for emphasis.]
+@app.route('/api/resume-review/batch', methods=['POST'])
+def resume_review_batch():
+    """Review (or, with mode=fast, only score) many resumes against one role / JD;
+    per-resume lines as NDJSON, then a ranking"""
+    log_usage('resume_review_batch')
+    uploads = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not uploads:
+        return jsonify({'error': 'No files provided'}), 400
+    job_role = request.form.get('jobRole', '')
+    bypass_cache = request.form.get('bypassCache', '').lower() in ('1', 'true', 'yes')
+    try:
+        fast = resume_mode(request.form) == 'fast'
+        items = resume_batch.collect_resumes(uploads)
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except ResumeBatchLimitError as e:
+        return jsonify({'error': str(e)}), 413
+    # The JD is compacted once and shared by every resume's prompt
+    job_description, jd_tokens = resume_compact.compact_job_description(request.form.get('jobDescription', ''))
+    started = time.perf_counter()
 
-Actionable Suggestions:
-[A numbered list of specific steps the candidate must take to fix the issues identified.]
+    def prepare(filename, data):
+        return prepare_resume(filename, data, job_role, job_description, jd_tokens, bypass_cache)
 
-Resume content:
-{file_content}"""
-        
-        # Get AI response
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        text = response.text
-        
-        # Parse ATS score and analysis
-        ats_score = 0
-        analysis_text = text
-        
-        if "ATS Score:" in text:
-            try:
-                score_part = text.split("ATS Score:")[1].split("\n")[0].strip()
-                # Remove any non-numeric characters like '%'
-                score_str = "".join(filter(str.isdigit, score_part))
-                if score_str:
-                    ats_score = int(score_str)
-                
-                if "Analysis:" in text:
-                    analysis_text = text.split("Analysis:")[1].strip()
-                else:
-                    analysis_text = text.split(score_part)[1].strip()
-            except:
-                pass
+    def text(filename, data):
+        return resume_text(filename, data, bypass_cache)
 
-        return jsonify({
-            'success': True,
-            'analysis': analysis_text,
-            'ats_score': ats_score
-        })
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    def score(texts):
+        return ats_scorer.score_many(texts, job_description, job_role)
+
+    def generate():
+        if fast:
+            lines = resume_batch_reviewer.score(items, text, score)
+        else:
+            lines = resume_batch_reviewer.run(items, prepare, review_resume)
+        results = []
+        try:
+            for line in lines:
+                if line['type'] == 'result':
+                    results.append(line)
+                yield json.dumps(line) + '\n'
+        finally:
+            lines.close()  # client gone: cancel the batch's queued reviews now
+        succeeded = sum(1 for r in results if r['success'])
+        yield json.dumps({
+            'type': 'done',
+            'mode': 'fast' if fast else 'full',
+            'total': len(items),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'ranking': resume_batch.ranking(results),
+            'job_description_tokens': jd_tokens,
+            'total_ms': round((time.perf_counter() - started) * 1000, 1)
+        }) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
 
 
 @app.route('/api/image-classify', methods=['POST'])
@@ -198,9 +596,10 @@ def image_classify():
     """Endpoint for image classification"""
     log_usage('image_classify')
     try:
-        # Check if file is present
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+        # Check if file is present (first access parses the multipart upload)
+        with request_metrics.phase('upload'):
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file provided'}), 400
         
         file = request.files['file']
         
@@ -208,97 +607,114 @@ def image_classify():
             return jsonify({'error': 'No file selected'}), 400
         
         # Check file type
-        if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+        if not file.filename.lower().endswith(IMAGE_EXTENSIONS):
             return jsonify({'error': 'Invalid file type. Only JPG, JPEG, and PNG are supported'}), 400
         
-        # Open and process image
-        image = Image.open(io.BytesIO(file.read()))
-        processed_image = preprocess_image_for_classification(image)
-        
-        # Make predictions
-        predictions = image_model.predict(processed_image)
-        decoded_preds = decode_predictions(predictions, top=3)[0]
+        try:
+            top = min(max(int(request.form.get('top', 3)), 1), 10)
+        except ValueError:
+            return jsonify({'error': 'top must be an integer'}), 400
+
+        # Same bytes (and top-k) as an earlier upload: answer from the cache
+        data = image_preprocess.read_upload(file)
+        cached = image_cache.get(image_cache.key(data, top))
+        if cached is not None:
+            return jsonify({'success': True, 'predictions': cached, 'cached': True})
+
+        # Decode (downscaled while decoding, RGB) and check the perceptual tier
+        with request_metrics.phase('decode'):
+            try:
+                image = image_preprocess.decode_image(data)
+            except OSError as e:
+                # Not an image, or a corrupt / truncated one (UnidentifiedImageError is an OSError)
+                return jsonify({'error': image_preprocess.decode_error(e)}), 400
+        cached, phash = image_cache.lookup_similar(image, top)
+        if cached is not None:
+            image_cache.store(data, top, cached, phash=phash)
+            return jsonify({'success': True, 'predictions': cached, 'cached': True})
+
+        with request_metrics.phase('preprocess'):
+            processed_image = image_preprocess.preprocess_image(image)
         
-        # Format results
-        results = [
-            {
-                'label': label,
-                'confidence': float(score * 100)
-            }
-            for _, label, score in decoded_preds
-        ]
+        # Make predictions (batched with any concurrent requests; includes queue wait)
+        with request_metrics.phase('predict'):
+            predictions = image_batcher.predict(processed_image)
+        results = decode_top_predictions(predictions, top)[0]
+        image_cache.store(data, top, results, image=image, phash=phash)
         
         return jsonify({
             'success': True,
-            'predictions': results
+            'predictions': results,
+            'cached': False
         })
     
+    except ImageLimitError as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/image-classify/batch', methods=['POST'])
+def image_classify_batch():
+    """Classify many images (files and/or zip archives); per-item results as NDJSON"""
+    log_usage('image_classify_batch')
+    uploads = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not uploads:
+        return jsonify({'error': 'No files provided'}), 400
+    try:
+        top = min(max(int(request.form.get('top', 3)), 1), 10)
+    except ValueError:
+        return jsonify({'error': 'top must be an integer'}), 400
+    try:
+        items = batch_classify.collect_uploads(uploads)
+    except BatchLimitError as e:
+        return jsonify({'error': str(e)}), 413
+    started = time.perf_counter()
+
+    def generate():
+        succeeded = failed = 0
+        for result in batch_classifier.run(items, top):
+            if result['success']:
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps({'type': 'result', **result}) + '\n'
+        yield json.dumps({
+            'type': 'done',
+            'total': len(items),
+            'succeeded': succeeded,
+            'failed': failed,
+            'total_ms': round((time.perf_counter() - started) * 1000, 1)
+        }) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Endpoint for chat functionality"""
     log_usage('chatbot')
     try:
-        data = request.json
-        history = data.get('messages', [])
+        data = chat_request_data(request.get_json(silent=True))
+        conversation_id, conversation = open_conversation(data)
+        latest_message, full_prompt, gemini_history = build_chat_prompt(data, conversation)
         
-        # Get the latest message
-        latest_message = history[-1].get('content', '') if history else data.get('message', '')
+        hit = cached_chat_reply(latest_message, gemini_history, conversation)
+        if hit is not None:
+            return jsonify(chat_result(hit['reply'], latest_message, conversation_id, conversation, cached=True))
         
-        # Prepend system instructions
-        today = datetime.now().strftime("%B %d, %Y")
-        system_prompt = f"""You are S.P.A.R.K. — your Smart Personal Assistant for Real-time Knowledge. 
-Today's date is {today}. 
-Your identity is S.P.A.R.K. (Smart Personal Assistant for Real-time Knowledge). 
-You have access to a comprehensive search for real-time information.
-Use search for: current weather, news, sports scores, stock prices, or any time-sensitive data.
-Always be helpful, friendly, and professional.
-If anyone asks 'Who are you?', reply: 'I am S.P.A.R.K. — your Smart Personal Assistant for Real-time Knowledge. I'm powered by advanced Gemini AI.'"""
-        
-        # Build chat history for Gemini
-        gemini_history = []
-        for msg in history[:-1]:  # All except the last message
-            role = 'user' if msg.get('role') == 'user' else 'model'
-            gemini_history.append({
-                'role': role,
-                'parts': [msg.get('content', '')]
-            })
-        
-        reply = None
-        
-        # Try with Search Grounding Model first
-        try:
-            print(f"DEBUG: Attempting chat with Search Model for message: {latest_message[:50]}...")
-            chat_session = chat_model_with_search.start_chat(history=gemini_history)
-            full_prompt = f"{system_prompt}\n\nUser: {latest_message}"
-            response = chat_session.send_message(full_prompt)
-            reply = response.text
-            print("✅ Successfully got response from Search Model")
-        except Exception as search_error:
-            print(f"⚠️ Search grounding model failed: {str(search_error)}")
-            # Fallback to Basic Model
-            try:
-                print("DEBUG: Falling back to Basic Model...")
-                chat_session = chat_model_basic.start_chat(history=gemini_history)
-                full_prompt = f"{system_prompt}\n\nUser: {latest_message}"
-                response = chat_session.send_message(full_prompt)
-                reply = response.text
-                print("✅ Successfully got response from Basic Model")
-            except Exception as basic_error:
-                print(f"❌ Basic model also failed: {str(basic_error)}")
-                raise basic_error
-
-        if not reply:
-            reply = "I'm sorry, I couldn't process that response."
-        
-        return jsonify({
-            'success': True,
-            'response': reply
-        })
+        # Search grounding first, basic model as fallback (skipped while its circuit is open)
+        print(f"DEBUG: Chat request for message: {latest_message[:50]}...")
+        started = time.perf_counter()
+        reply, model_name = llm_gateway.chat(CHAT_MODELS, gemini_history, full_prompt)
+        remember_chat_reply(latest_message, gemini_history, conversation, reply, model_name, started)
+        return jsonify(chat_result(reply, latest_message, conversation_id, conversation))
     
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except (LLMUnavailable, LLMDeadlineExceeded) as e:
+        print(f"❌ Chat unavailable: {str(e)}")
+        return llm_unavailable_response(e)
     except Exception as e:
         print(f"❌ CRITICAL Chat Endpoint Error: {str(e)}")
         import traceback
@@ -306,6 +722,68 @@ If anyone asks 'Who are you?', reply: 'I am S.P.A.R.K. — your Smart Personal A
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat: tokens as Server-Sent Events (NDJSON with ?format=ndjson)"""
+    log_usage('chatbot')
+    started = time.perf_counter()
+    try:
+        data = chat_request_data(request.get_json(silent=True))
+        conversation_id, conversation = open_conversation(data)
+        latest_message, full_prompt, gemini_history = build_chat_prompt(data, conversation)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    hit = cached_chat_reply(latest_message, gemini_history, conversation)
+    try:
+        # Queue for an LLM slot now, so an overload is a 503 rather than an error event
+        slot = llm_gateway.admit() if hit is None else None
+    except LLMUnavailable as e:
+        return llm_unavailable_response(e)
+    ndjson = request.args.get('format') == 'ndjson'
+
+    def event(kind, payload):
+        return chat_stream_event(kind, payload, ndjson)
+
+    def generate():
+        if hit is not None:
+            # The whole cached reply as one token
+            ttft_ms = (time.perf_counter() - started) * 1000
+            yield event('token', {'text': hit['reply']})
+            yield event('done', chat_stream_summary([hit['reply']], hit['model'], started, ttft_ms, latest_message,
+                                                    conversation_id, conversation, cached=True))
+            return
+        parts = []
+        ttft_ms = None
+        model_name = None
+        # Same order as /api/chat; the gateway falls back only before the first token
+        try:
+            for model_name, text in llm_gateway.stream_chat(CHAT_MODELS, gemini_history, full_prompt, slot=slot):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                    print(f"⏱️ Chat time-to-first-token: {ttft_ms:.0f} ms ({model_name} model)")
+                parts.append(text)
+                yield event('token', {'text': text})
+        except Exception as e:
+            yield event('error', {'error': str(e)})
+            return
+
+        if parts:
+            remember_chat_reply(latest_message, gemini_history, conversation, ''.join(parts), model_name, started)
+        else:
+            parts.append(CHAT_FALLBACK_REPLY)
+            yield event('token', {'text': CHAT_FALLBACK_REPLY})
+        yield event('done', chat_stream_summary(parts, model_name, started, ttft_ms,
+                                                latest_message, conversation_id, conversation))
+
+    response = Response(
+        generate(),
+        mimetype='application/x-ndjson' if ndjson else 'text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    if slot is not None:
+        response.call_on_close(slot.release)  # also when the client leaves before the first token
+    return response
+
 
 @app.route('/', methods=['GET'])
 def index():
@@ -316,22 +794,93 @@ def index():
         'docs_url': 'See README.md for API documentation',
         'endpoints': {
             'resume_review': '/api/resume-review',
+            'resume_review_batch': '/api/resume-review/batch',
             'image_classify': '/api/image-classify',
-            'chat': '/api/chat'
+            'image_classify_batch': '/api/image-classify/batch',
+            'chat': '/api/chat',
+            'chat_stream': '/api/chat/stream'
         }
     })
 
 
+def _database_status():
+    """Report the database without forcing the Supabase client to load"""
+    if not supabase_client.loaded:
+        return 'pending' if (SUPABASE_URL and SUPABASE_KEY) else 'local_only'
+    return 'connected' if supabase_client.get() else 'local_only'
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'message': 'SPARK AI Tools API is running',
-        'database': 'connected' if supabase else 'local_only'
+        'database': _database_status(),
+        'image_batcher': image_batcher.stats(),
+        'batch_classifier': batch_classifier.stats(),
+        'resume_batch': resume_batch_reviewer.stats(),
+        'model_server': model_server.stats(),
+        'image_backend': image_model.get().stats() if image_model.loaded else {'backend': inference_backends.BACKEND},
+        'image_cache': image_cache.stats(),
+        'resume_cache': resume_cache.stats(),
+        'usage_logger': usage_logger.stats(),
+        'chat_sessions': chat_sessions.stats(),
+        'chat_cache': chat_cache.stats(),
+        'llm_gateway': llm_gateway.stats(),
+        'rate_limiter': rate_limiter.stats(),
+        'startup': resources.report()
     })
 
 
+# Component state sampled at scrape time, next to the per-request histograms
+request_metrics.metrics.callback(
+    'llm_circuit_open', 'Whether the circuit breaker of a Gemini model is open.',
+    lambda: {name: int(b['state'] == 'open') for name, b in llm_gateway.stats()['breakers'].items()},
+    labels=('model',))
+request_metrics.metrics.callback(
+    'llm_calls_total', 'Gemini calls by outcome.',
+    lambda: {(outcome,): llm_gateway.stats()[outcome] for outcome in ('calls', 'retried', 'hedged', 'deadline_exceeded')},
+    labels=('outcome',), kind='counter')
+request_metrics.metrics.callback(
+    'llm_in_flight', 'Gemini calls holding a concurrency slot.',
+    lambda: llm_gateway.gate.active)
+request_metrics.metrics.callback(
+    'llm_queue_depth', 'Gemini calls waiting for a concurrency slot.',
+    lambda: llm_gateway.gate.stats()['queue_depth'])
+request_metrics.metrics.callback(
+    'llm_queue_rejected_total', 'Gemini calls turned away by the concurrency gate.',
+    lambda: llm_gateway.gate.stats()['rejected'],
+    labels=('reason',), kind='counter')
+request_metrics.metrics.callback(
+    'rate_limited_total', 'Requests rejected by the per-IP rate limiter.',
+    lambda: rate_limiter.stats()['rejected'],
+    labels=('endpoint',), kind='counter')
+request_metrics.metrics.callback(
+    'image_batch_queue_depth', 'Images waiting for the classifier micro-batcher.',
+    lambda: image_batcher.stats()['queue_depth'])
+request_metrics.metrics.callback(
+    'usage_log_queue_depth', 'Usage rows waiting to be written.',
+    lambda: usage_logger.stats()['queue_depth'])
+request_metrics.metrics.callback(
+    'cache_hits_total', 'Result cache hits.',
+    lambda: {'image': image_cache.hits, 'resume_text': resume_cache.texts.hits,
+             'resume_review': resume_cache.reviews.hits, 'chat': chat_cache.hits},
+    labels=('cache',), kind='counter')
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this worker process"""
+    if not request_metrics.ENABLED:
+        return jsonify({'error': 'Metrics are disabled (METRICS_ENABLED=0)'}), 404
+    return Response(request_metrics.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+MESSAGES_PAGE_SIZE = 100
+MESSAGES_MAX_PAGE_SIZE = 1000
+
+
 @app.route('/api/messages', methods=['GET'])
 def get_messages():
     """Endpoint for admin to view messages"""
@@ -342,23 +891,45 @@ def get_messages():
         return jsonify({'error': 'Unauthorized'}), 401
         
     try:
-        if supabase:
-            # Fetch from Supabase
-            result = supabase.table('messages').select("*").order('timestamp', desc=True).execute()
-            messages = result.data
-        else:
-            # Fallback to local file
-            file_path = 'data/messages.json'
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    messages = json.load(f)
-            else:
-                messages = []
+        try:
+            limit = request.args.get('limit', type=int)
+            before = request.args.get('before')
+            # 400 for a malformed cursor; the stored form is kept for SQLite's string compare
+            _, before_id = message_cursor(before, request.args.get('before_id'))
+            fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+            message_columns(fields)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        stream = request.args.get('format') == 'ndjson'
+
+        # Supabase, or the same local database the contact fallback writes to.
+        # The cursor needs timestamp and id even when they are projected away.
+        store = get_store()
+        columns = list(dict.fromkeys(['id', 'timestamp'] + fields)) if fields else None
+
+        def project(row):
+            return {f: row.get(f) for f in fields} if fields else row
+
+        if stream:
+            # NDJSON: rows are written as they are read; no limit unless asked
+            rows = store.iter_messages(before=before, before_id=before_id, limit=limit, fields=columns)
+            return Response(
+                (json.dumps(project(row)) + '\n' for row in rows),
+                mimetype='application/x-ndjson'
+            )
+
+        limit = min(max(limit or MESSAGES_PAGE_SIZE, 1), MESSAGES_MAX_PAGE_SIZE)
+        messages = store.list_messages(before=before, before_id=before_id, limit=limit, fields=columns)
+        next_cursor = None
+        if len(messages) == limit:
+            last = messages[-1]
+            next_cursor = {'before': last['timestamp'], 'before_id': last['id']}
                 
         return jsonify({
             'success': True,
             'count': len(messages),
-            'messages': messages
+            'messages': [project(row) for row in messages],
+            'next_cursor': next_cursor
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -374,24 +945,29 @@ def get_stats():
         return jsonify({'error': 'Unauthorized'}), 401
         
     try:
-        if supabase:
-            # Fetch usage logs from Supabase
-            result = supabase.table('usage_logs').select("tool_name").execute()
-            logs = result.data
-            
-            # Count occurrences
-            stats = {}
-            for log in logs:
-                tool = log['tool_name']
-                stats[tool] = stats.get(tool, 0) + 1
-                
-            return jsonify({
-                'success': True,
-                'total_uses': len(logs),
-                'breakdown': stats
-            })
-        else:
-            return jsonify({'error': 'Statistics require Supabase connection'}), 400
+        try:
+            start = parse_time(request.args.get('from'))
+            end = parse_time(request.args.get('to'), end=True)
+        except ValueError:
+            return jsonify({'error': 'from/to must be ISO dates or timestamps'}), 400
+        bucket = request.args.get('bucket')
+        if bucket and bucket not in ('hour', 'day'):
+            return jsonify({'error': 'bucket must be hour or day'}), 400
+
+        # Answered from rollups maintained by the usage log writer
+        with request_metrics.phase('rollups'):
+            stats = usage_rollups.totals(start, end)
+        response = {
+            'success': True,
+            'total_uses': sum(stats.values()),
+            'breakdown': stats,
+            'from': start,
+            'to': end
+        }
+        if bucket:
+            response['bucket'] = bucket
+            response['buckets'] = usage_rollups.series(bucket, start, end)
+        return jsonify(response)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -418,10 +994,11 @@ def contact():
         }
         
         # 1. Try Supabase (Primary)
+        supabase = get_supabase()
         if supabase:
             try:
-                # We don't include timestamp as it's handled by 'created_at' default in Supabase
-                supabase.table('messages').insert(new_message).execute()
+                with request_metrics.phase('supabase'):
+                    SupabaseStore(supabase).insert_message(new_message)
                 print(f"✅ Message from {name} saved to Supabase")
                 return jsonify({'success': True, 'message': 'Sent via Supabase'})
             except Exception as e:
@@ -429,26 +1006,11 @@ def contact():
 
         # 2. Try Local Fallback (Secondary)
         try:
-            # For local fallback, we still want a timestamp for our JSON file
+            # For local fallback, we still want a timestamp
             local_message = new_message.copy()
             local_message['timestamp'] = datetime.now().isoformat()
-            
-            # Use /tmp on Spaces to avoid Permission Denied
-            data_dir = '/tmp/spark_data' if os.name != 'nt' else 'data'
-            os.makedirs(data_dir, exist_ok=True)
-            file_path = os.path.join(data_dir, 'messages.json')
-            
-            messages = []
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as f:
-                    try:
-                        messages = json.load(f)
-                    except:
-                        messages = []
-            
-            messages.append(local_message)
-            with open(file_path, 'w') as f:
-                json.dump(messages, f, indent=4)
+            with request_metrics.phase('local_store'):
+                local_store.insert_message(local_message)
             
             print(f"⚠️ Message from {name} saved to LOCAL storage")
             return jsonify({'success': True, 'message': 'Sent via Local Storage'})
@@ -461,6 +1023,10 @@ def contact():
         return jsonify({'error': str(e)}), 500
 
 
+print(f"✅ API module ready in {resources.mark_ready():.0f} ms")
+resources.warmup_from_env()
+
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🚀 SPARK AI Tools Backend Server")
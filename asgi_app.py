@@ -0,0 +1,418 @@
+"""ASGI entry point for the async serving mode (SERVER_MODE=async).
+
+In the default sync mode every request holds a gunicorn thread for its whole
+lifetime, so with 4 threads the fifth concurrent chat waits for a Gemini call
+to finish even though the worker is idle. Here the LLM-bound endpoints run
+natively on the event loop:
+
+    POST /api/chat            -> llm_gateway.achat (send_message_async)
+    POST /api/chat/stream     -> llm_gateway.astream_chat (send_message_async, stream=True)
+    POST /api/resume-review   -> llm_gateway.agenerate (generate_content_async)
+
+and only their blocking parts (multipart parsing, PDF extraction, session and
+cache storage) go to a small thread pool. Everything else (image
+classification, analytics, contact, ...) is the unchanged Flask app,
+called through a WSGI bridge on the same pool, so CPU-bound inference never
+runs on the loop; set MODEL_SERVER_ADDRESS to move it out of the process.
+A bridged response is produced on a single pool thread from start to end
+(streamed ones included), since generators like the NDJSON message export
+hold per-thread resources between chunks.
+
+    gunicorn -c gunicorn.conf.py            # with SERVER_MODE=async
+    python asgi_app.py                      # uvicorn, for local runs
+"""
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import parse_qs
+
+import admission
+import app as flask_app
+import request_metrics
+from app import (CHAT_FALLBACK_REPLY, CHAT_MODELS, RequestError, build_chat_prompt, cached_chat_reply,
+                 chat_request_data, chat_result, chat_stream_event, chat_stream_summary, llm_gateway, log_usage,
+                 open_conversation, parse_review_response, prepare_resume_review, rate_limiter,
+                 remember_chat_reply, resume_cache, resume_review_result)
+from llm_gateway import LLMDeadlineExceeded, LLMUnavailable
+from pdf_extract import PDFLimitError
+
+SYNC_THREADS = int(os.getenv("ASYNC_SYNC_THREADS", "8"))
+BRIDGE_BUFFER_CHUNKS = 16  # streamed WSGI chunks queued ahead of a slow client
+MAX_BODY_BYTES = int(os.getenv("ASYNC_MAX_BODY_BYTES", str(128 * 1024 * 1024)))
+
+sync_pool = ThreadPoolExecutor(SYNC_THREADS, thread_name_prefix="asgi-sync")
+_DONE = object()
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def run_sync(fn, *args):
+    """Run blocking code on the pool, keeping the request's context (phase timings)"""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(sync_pool, context.run, fn, *args)
+
+
+async def read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise BodyTooLarge(f"Request body exceeds {MAX_BODY_BYTES} bytes")
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def peer_ip(scope):
+    client = scope.get('client')
+    return client[0] if client else 'unknown'
+
+
+def _header(scope, name):
+    """All values of one request header, comma-joined like WSGI does"""
+    return ','.join(v.decode('latin-1') for k, v in scope.get('headers', []) if k.lower() == name)
+
+
+def client_ip(scope):
+    """Same client address as Flask's remote_addr (X-Forwarded-For past TRUSTED_PROXY_HOPS)"""
+    return admission.forwarded_client_ip(peer_ip(scope), _header(scope, b'x-forwarded-for'))
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': peer_ip(scope),  # the Flask app resolves proxies itself
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            key = f'HTTP_{key}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def retry_after(seconds):
+    """Extra headers for a 429/503 (none when the wait is unknown)"""
+    if seconds is None:
+        return []
+    return [(b'retry-after', admission.retry_after_header(seconds).encode())]
+
+
+def unavailable(error):
+    return 503, {'error': str(error)}, retry_after(getattr(error, 'retry_after', None))
+
+
+class ClosingStream:
+    """Async iterator of str chunks whose `on_close` runs on aclose(), iterated or not
+
+    An async generator that never started skips its own finally blocks, so a
+    resource it must give back (an LLM slot) is handed to the stream as well.
+    """
+
+    def __init__(self, chunks, on_close=None):
+        self._chunks = chunks
+        self._on_close = on_close
+
+    def __aiter__(self):
+        return self._chunks.__aiter__()
+
+    async def aclose(self):
+        try:
+            await self._chunks.aclose()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+async def send_response(send, status, payload, server_timing=None, extra_headers=()):
+    """Send a dict as JSON, or stream an async iterator of str chunks"""
+    headers = [(b'access-control-allow-origin', b'*'), *extra_headers]  # same as flask-cors
+    if isinstance(payload, dict):
+        headers.append((b'content-type', b'application/json'))
+    if server_timing:
+        headers += [(b'server-timing', server_timing.encode('latin-1')), (b'timing-allow-origin', b'*')]
+    if isinstance(payload, dict):
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': json.dumps(payload).encode()})
+        return
+    try:
+        # Inside the try: a client gone before the headers still closes the stream
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        async for chunk in payload:
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    finally:
+        await payload.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+# -- native async views --------------------------------------------------
+
+def json_body(body):
+    """Decoded JSON request body, or None when it is not valid JSON"""
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+async def chat(scope, body):
+    """Async twin of app.chat()"""
+    log_usage('chatbot', client_ip(scope))
+    try:
+        data = chat_request_data(json_body(body))
+        conversation_id, conversation = await run_sync(open_conversation, data)
+        latest_message, full_prompt, gemini_history = build_chat_prompt(data, conversation)
+        hit = cached_chat_reply(latest_message, gemini_history, conversation)
+        if hit is not None:
+            return 200, await run_sync(chat_result, hit['reply'], latest_message, conversation_id, conversation,
+                                       True), []
+        started = time.perf_counter()
+        reply, model_name = await llm_gateway.achat(CHAT_MODELS, gemini_history, full_prompt)
+        remember_chat_reply(latest_message, gemini_history, conversation, reply, model_name, started)
+        return 200, await run_sync(chat_result, reply, latest_message, conversation_id, conversation), []
+    except RequestError as e:
+        return e.status, {'error': str(e)}, []
+    except (LLMUnavailable, LLMDeadlineExceeded) as e:
+        print(f"❌ Chat unavailable: {str(e)}")
+        return unavailable(e)
+    except Exception as e:
+        print(f"❌ CRITICAL Chat Endpoint Error: {str(e)}")
+        return 500, {'error': str(e)}, []
+
+
+async def chat_stream(scope, body):
+    """Async twin of app.chat_stream()"""
+    log_usage('chatbot', client_ip(scope))
+    started = time.perf_counter()
+    try:
+        data = chat_request_data(json_body(body))
+        conversation_id, conversation = await run_sync(open_conversation, data)
+        latest_message, full_prompt, gemini_history = build_chat_prompt(data, conversation)
+    except Exception as e:
+        return 400, {'error': str(e)}, []
+    hit = cached_chat_reply(latest_message, gemini_history, conversation)
+    try:
+        slot = await llm_gateway.admit_async() if hit is None else None
+    except LLMUnavailable as e:
+        return unavailable(e)
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    ndjson = query.get('format') == ['ndjson']
+
+    async def generate():
+        if hit is not None:
+            ttft_ms = (time.perf_counter() - started) * 1000
+            yield chat_stream_event('token', {'text': hit['reply']}, ndjson)
+            summary = await run_sync(chat_stream_summary, [hit['reply']], hit['model'], started, ttft_ms,
+                                     latest_message, conversation_id, conversation, True)
+            yield chat_stream_event('done', summary, ndjson)
+            return
+        parts = []
+        ttft_ms = None
+        model_name = None
+        try:
+            async for model_name, text in llm_gateway.astream_chat(CHAT_MODELS, gemini_history, full_prompt,
+                                                                   slot=slot):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                    print(f"⏱️ Chat time-to-first-token: {ttft_ms:.0f} ms ({model_name} model)")
+                parts.append(text)
+                yield chat_stream_event('token', {'text': text}, ndjson)
+        except Exception as e:
+            yield chat_stream_event('error', {'error': str(e)}, ndjson)
+            return
+        finally:
+            slot.release()
+
+        if parts:
+            remember_chat_reply(latest_message, gemini_history, conversation, ''.join(parts), model_name, started)
+        else:
+            parts.append(CHAT_FALLBACK_REPLY)
+            yield chat_stream_event('token', {'text': CHAT_FALLBACK_REPLY}, ndjson)
+        summary = await run_sync(chat_stream_summary, parts, model_name, started, ttft_ms,
+                                 latest_message, conversation_id, conversation)
+        yield chat_stream_event('done', summary, ndjson)
+
+    headers = [
+        (b'content-type', b'application/x-ndjson' if ndjson else b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]
+    # The stream owns the slot: released on close even if generate() never starts
+    return 200, ClosingStream(generate(), slot.release if slot is not None else None), headers
+
+
+def _prepare_resume(environ):
+    from werkzeug.wrappers import Request
+
+    form_request = Request(environ)
+    with request_metrics.phase('upload'):
+        files, form = form_request.files, form_request.form
+    return prepare_resume_review(files, form)
+
+
+async def resume_review(scope, body):
+    """Async twin of app.resume_review()"""
+    log_usage('resume_review', client_ip(scope))
+    try:
+        prompt, review_key, review, prompt_tokens, local_score = await run_sync(_prepare_resume,
+                                                                                wsgi_environ(scope, body))
+        cached = review is not None
+        if prompt is not None:
+            review = parse_review_response(await llm_gateway.agenerate('resume', prompt))
+            await run_sync(resume_cache.reviews.set, review_key, review)
+        return 200, resume_review_result(review, cached, prompt_tokens, local_score), []
+    except RequestError as e:
+        return e.status, {'error': str(e)}, []
+    except PDFLimitError as e:
+        return 413, {'error': str(e)}, []
+    except (LLMUnavailable, LLMDeadlineExceeded) as e:
+        return unavailable(e)
+    except Exception as e:
+        return 500, {'error': str(e)}, []
+
+
+ROUTES = {
+    ('POST', '/api/chat'): chat,
+    ('POST', '/api/chat/stream'): chat_stream,
+    ('POST', '/api/resume-review'): resume_review,
+}
+
+
+async def native(view, scope, body, send):
+    token = request_metrics.begin_request() if request_metrics.ENABLED else None
+    try:
+        admission.warn_untrusted_proxy(rate_limiter, _header(scope, b'x-forwarded-for'))
+        rate_limiter.check(client_ip(scope), scope['path'])
+    except admission.RateLimited as e:
+        status, payload, headers = 429, {'error': str(e)}, retry_after(e.retry_after)
+    else:
+        status, payload, headers = await view(scope, body)
+    server_timing = None
+    if token is not None:
+        server_timing = request_metrics.end_request(token, scope['path'], scope['method'], status)
+    await send_response(send, status, payload, server_timing, headers)
+
+
+# -- everything else: the Flask app on the thread pool ---------------------
+
+async def bridge(scope, body, send):
+    environ = wsgi_environ(scope, body)
+    response = {}
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(maxsize=BRIDGE_BUFFER_CHUNKS)
+    stop = threading.Event()
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+        return lambda data: None  # write() is not used by Flask
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+    def produce():
+        # Call, iterate and close on this one thread: a streamed body may hold
+        # a per-thread resource (e.g. a SQLite cursor) from one chunk to the next
+        try:
+            iterable = flask_app.app(environ, start_response)
+            try:
+                for chunk in iterable:
+                    if stop.is_set():
+                        break  # client gone
+                    if chunk:
+                        put(chunk)
+            finally:
+                close = getattr(iterable, 'close', None)
+                if close is not None:
+                    close()
+        except Exception as e:
+            put(e)
+            return
+        put(_DONE)
+
+    loop.run_in_executor(sync_pool, produce)
+    try:
+        item = await chunks.get()
+        if isinstance(item, Exception):
+            raise item
+        await send({'type': 'http.response.start', 'status': response['status'],
+                    'headers': response['headers']})
+        # Streamed responses (SSE / NDJSON) are forwarded chunk by chunk
+        while item is not _DONE:
+            if item:
+                await send({'type': 'http.response.body', 'body': item, 'more_body': True})
+            item = await chunks.get()
+            if isinstance(item, Exception):
+                raise item
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        # Unblock a producer waiting on a full queue; it stops at its next chunk
+        stop.set()
+        while not chunks.empty():
+            chunks.get_nowait()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.get_running_loop().run_in_executor(sync_pool, flask_app.usage_logger.flush)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return  # no websocket endpoints
+    try:
+        body = await read_body(receive)
+    except BodyTooLarge as e:
+        return await send_response(send, 413, {'error': str(e)})
+    view = ROUTES.get((scope['method'], scope['path']))
+    if view is not None:
+        return await native(view, scope, body, send)
+    return await bridge(scope, body, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get("PORT", 5000))
+    print(f"🚀 SPARK AI Tools Backend (async mode) on http://localhost:{port}")
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,145 @@
+"""Local, deterministic ATS pre-score: resume vs. job description in milliseconds.
+
+The Gemini review takes seconds and its score is scraped from free text. This
+scorer needs no model: the job description (or, without one, the job role) is
+tokenized into unigram and bigram keywords, weighted by sublinear term
+frequency (1 + log tf) so that terms the JD keeps repeating count more, and
+each resume is scored on
+
+    keyword_coverage  weighted share of JD keywords that appear in the resume
+    similarity        cosine of the TF vectors over the JD's keywords
+
+    score = round(100 * (COVERAGE_WEIGHT * coverage + (1 - COVERAGE_WEIGHT) * similarity))
+
+with the highest-weighted missing keywords listed. Weights depend only on the
+JD, never on which other resumes are in the batch, so a resume scores the same
+alone or in a batch of fifty. `score_many` scores a batch as one matrix
+product: a (resumes x keywords) count matrix against the JD weight vector.
+"""
+import math
+import os
+import re
+import time
+
+import numpy as np
+
+COVERAGE_WEIGHT = float(os.getenv("ATS_COVERAGE_WEIGHT", "0.7"))
+MAX_KEYWORDS = int(os.getenv("ATS_MAX_KEYWORDS", "400"))  # JD terms scored, by weight
+TOP_KEYWORDS = 15  # matched / missing keywords listed per resume
+
+# "c++", "c#", "node.js", "ci/cd", "scikit-learn" stay one token; "python." loses the dot
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#./\-]*[a-z0-9+#]|[a-z0-9]")
+STOPWORDS = frozenset("""
+a about above across after again against all also am an and any are as at be been before being below between
+both but by can could did do does doing done down during each either etc even ever every few for from further
+get gets getting give given go had has have having he her here hers him his how however i if in into is it its
+itself just least less like made make makes making many may me more most much must my no nor not now of off on
+once one only or other others our ours out over own per please plus rather same she should so some such than
+that the their theirs them then there these they this those through thus to too under until up upon us use used
+using very via was we well were what when where whether which while who whom whose why will with within without
+would yet you your yours
+able ability strong excellent good great proven demonstrated solid years year experience experienced
+work working works job role roles position candidate candidates team teams company including include includes
+new various responsible responsibilities requirement requirements required preferred plus ideal ideally
+need needs want looking seeking join bonus understanding knowledge skills skill familiarity familiar
+""".split())
+
+
+def tokenize(text):
+    """Lowercase keyword tokens; stopwords and bare numbers (years, counts) removed"""
+    tokens = []
+    for token in _TOKEN.findall((text or '').lower()):
+        token = token.rstrip('.-/')
+        if token and token not in STOPWORDS and not token.replace('.', '').isdigit():
+            tokens.append(token)
+    return tokens
+
+
+def terms(text):
+    """Unigrams plus adjacent-keyword bigrams ("machine learning", "spring boot")"""
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class JobProfile:
+    """The JD's keywords and their weights, built once and reused for every resume"""
+
+    def __init__(self, text):
+        counts = {}
+        for term in terms(text):
+            counts[term] = counts.get(term, 0) + 1
+        # A bigram that only occurs once is usually an accident of word order
+        weighted = [(term, 1 + math.log(count)) for term, count in counts.items()
+                    if ' ' not in term or count > 1]
+        # Highest weight first; ties keep the JD's own order (dicts are ordered)
+        weighted.sort(key=lambda item: -item[1])
+        weighted = weighted[:MAX_KEYWORDS]
+        self.keywords = [term for term, _ in weighted]
+        self.index = {term: i for i, term in enumerate(self.keywords)}
+        self.weights = np.array([weight for _, weight in weighted], dtype=np.float32)
+        self._weights_norm = float(np.linalg.norm(self.weights)) or 1.0
+        self._weights_sum = float(self.weights.sum()) or 1.0
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def counts(self, texts):
+        """(len(texts) x keywords) term counts, plus each text's full TF norm"""
+        matrix = np.zeros((len(texts), len(self.keywords)), dtype=np.float32)
+        norms = np.ones(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            doc = {}
+            for term in terms(text):
+                doc[term] = doc.get(term, 0) + 1
+            for term, count in doc.items():
+                column = self.index.get(term)
+                if column is not None:
+                    matrix[row, column] = count
+            if doc:
+                tf = 1 + np.log(np.fromiter(doc.values(), dtype=np.float32, count=len(doc)))
+                norms[row] = float(np.linalg.norm(tf))
+        return matrix, norms
+
+    def score_matrix(self, counts, norms):
+        """Coverage, cosine similarity and 0-100 score for every row at once"""
+        present = counts > 0
+        tf = np.where(present, 1 + np.log(np.maximum(counts, 1)), 0).astype(np.float32)
+        coverage = (present @ self.weights) / self._weights_sum
+        similarity = (tf @ self.weights) / (norms * self._weights_norm)
+        scores = np.rint(100 * (COVERAGE_WEIGHT * coverage + (1 - COVERAGE_WEIGHT) * similarity))
+        return present, coverage, similarity, scores.astype(int)
+
+
+def _report(profile, present_row, coverage, similarity, score, ms):
+    matched = [profile.keywords[i] for i in np.flatnonzero(present_row)[:TOP_KEYWORDS]]
+    missing = [profile.keywords[i] for i in np.flatnonzero(~present_row)[:TOP_KEYWORDS]]
+    return {
+        'score': int(score),
+        'keyword_coverage': round(float(coverage), 3),
+        'similarity': round(float(similarity), 3),
+        'matched_keywords': matched,
+        'missing_keywords': missing,
+        'ms': round(ms, 2)
+    }
+
+
+def score_many(resumes, job_description, job_role=''):
+    """Score every resume text against one JD (the job role when there is no JD).
+
+    Returns one report dict per resume, or None for all of them when there is
+    nothing to score against.
+    """
+    started = time.perf_counter()
+    profile = JobProfile(job_description or job_role)
+    if not profile:
+        return [None] * len(resumes)
+    counts, norms = profile.counts(resumes)
+    present, coverage, similarity, scores = profile.score_matrix(counts, norms)
+    ms = (time.perf_counter() - started) * 1000 / max(1, len(resumes))
+    return [_report(profile, present[i], coverage[i], similarity[i], scores[i], ms)
+            for i in range(len(resumes))]
+
+
+def score(resume, job_description, job_role=''):
+    """score_many() for a single resume"""
+    return score_many([resume], job_description, job_role)[0]
@@ -0,0 +1,193 @@
+"""Bulk image classification for /api/image-classify/batch.
+
+Uploads (plain images and/or zip archives) are expanded into items up front,
+with per-item errors instead of failing the whole request. Items are decoded
+and preprocessed in a thread pool (PIL releases the GIL while decoding)
+straight into one of two preallocated float32 batch buffers: while the model
+runs on one batch, the pool fills the other. Every forward pass uses the same
+batch size, so fixed-shape backends (TFLite, tf.function) never reallocate or
+retrace. Results are yielded per item as soon as their batch finishes.
+"""
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import image_preprocess
+from image_preprocess import INPUT_SIZE, ImageLimitError
+from spark_core import IMAGE_EXTENSIONS
+
+MAX_FILES = int(os.getenv("IMAGE_BATCH_MAX_FILES", "200"))
+MAX_TOTAL_BYTES = int(os.getenv("IMAGE_BATCH_MAX_TOTAL_BYTES", str(100 * 1024 * 1024)))
+BATCH_SIZE = int(os.getenv("IMAGE_BATCH_CLASSIFY_SIZE", "16"))
+DECODE_WORKERS = int(os.getenv("IMAGE_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class BatchLimitError(Exception):
+    """Too many files or too many bytes in one batch request"""
+
+
+class _Budget:
+    def __init__(self, max_files, max_total_bytes):
+        self.max_files = max_files
+        self.max_total_bytes = max_total_bytes
+        self.files = 0
+        self.bytes = 0
+
+    def take(self, size):
+        self.files += 1
+        self.bytes += size
+        if self.max_files and self.files > self.max_files:
+            raise BatchLimitError(f"A batch can contain at most {self.max_files} images")
+        if self.max_total_bytes and self.bytes > self.max_total_bytes:
+            raise BatchLimitError(f"A batch can contain at most {self.max_total_bytes} bytes of images")
+
+
+def _zip_items(upload, budget, max_bytes):
+    try:
+        archive = zipfile.ZipFile(upload.stream)
+    except zipfile.BadZipFile:
+        yield upload.filename, None, 'Invalid zip archive'
+        return
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            base = os.path.basename(name)
+            if info.is_dir() or name.startswith('__MACOSX/') or base.startswith('.'):
+                continue
+            if not base.lower().endswith(IMAGE_EXTENSIONS):
+                continue  # archives often carry READMEs etc.; only images count
+            if max_bytes and info.file_size > max_bytes:
+                # Checked against the header, so oversized members are never inflated
+                budget.take(0)
+                yield name, None, f"Image exceeds the upload limit of {max_bytes} bytes"
+                continue
+            budget.take(info.file_size)
+            yield name, archive.read(info), None
+
+
+def collect_uploads(files, max_files=None, max_total_bytes=None, max_bytes=None):
+    """Expand uploads and zips into [(filename, bytes or None, error or None)]"""
+    max_bytes = image_preprocess.MAX_BYTES if max_bytes is None else max_bytes
+    budget = _Budget(MAX_FILES if max_files is None else max_files,
+                     MAX_TOTAL_BYTES if max_total_bytes is None else max_total_bytes)
+    items = []
+    for upload in files:
+        filename = upload.filename or ''
+        if filename.lower().endswith('.zip'):
+            items.extend(_zip_items(upload, budget, max_bytes))
+            continue
+        if not filename.lower().endswith(IMAGE_EXTENSIONS):
+            items.append((filename, None, 'Invalid file type. Only JPG, JPEG, and PNG are supported'))
+            continue
+        try:
+            data = image_preprocess.read_upload(upload, max_bytes)
+        except ImageLimitError as e:
+            budget.take(0)
+            items.append((filename, None, str(e)))
+            continue
+        budget.take(len(data))
+        items.append((filename, data, None))
+    return items
+
+
+class BatchClassifier:
+    """Decode in a thread pool, predict in fixed-size double-buffered batches"""
+
+    def __init__(self, predict_fn, decode_fn, cache=None, batch_size=None, workers=None):
+        self.predict_fn = predict_fn
+        self.decode_fn = decode_fn  # (predictions, top) -> [[{'label', 'confidence'}], ...]
+        self.cache = cache
+        self.batch_size = max(1, batch_size or BATCH_SIZE)
+        self.workers = max(1, workers or DECODE_WORKERS)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.items = 0
+        self.batches = 0
+        self.errors = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="image-decode")
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    @staticmethod
+    def _prepare(data, out):
+        image_preprocess.preprocess_image(image_preprocess.decode_image(data), out)
+
+    def _submit(self, chunk, buffer):
+        pool = self._pool()
+        return [pool.submit(self._prepare, data, buffer[row]) for row, (_, _, data) in enumerate(chunk)]
+
+    def run(self, items, top):
+        """Yield one result dict per item (errors and cache hits first)"""
+        self.requests += 1
+        self.items += len(items)
+        pending = []
+        for index, (filename, data, error) in enumerate(items):
+            if error is not None:
+                self.errors += 1
+                yield {'index': index, 'filename': filename, 'success': False, 'error': error}
+                continue
+            cached = self.cache.get(self.cache.key(data, top)) if self.cache is not None else None
+            if cached is not None:
+                yield {'index': index, 'filename': filename, 'success': True,
+                       'predictions': cached, 'cached': True}
+                continue
+            pending.append((index, filename, data))
+        if not pending:
+            return
+
+        size = min(self.batch_size, len(pending))
+        chunks = [pending[start:start + size] for start in range(0, len(pending), size)]
+        buffers = [np.zeros((size, INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32) for _ in range(2)]
+        futures = self._submit(chunks[0], buffers[0])
+        for number, chunk in enumerate(chunks):
+            buffer, current = buffers[number % 2], futures
+            if number + 1 < len(chunks):
+                # Decode the next batch while this one is on the model
+                futures = self._submit(chunks[number + 1], buffers[(number + 1) % 2])
+            rows = []
+            for row, ((index, filename, _), future) in enumerate(zip(chunk, current)):
+                try:
+                    future.result()
+                    rows.append(row)
+                except Exception as e:
+                    buffer[row] = 0
+                    self.errors += 1
+                    yield {'index': index, 'filename': filename, 'success': False, 'error': image_preprocess.decode_error(e)}
+            if not rows:
+                continue
+            buffer[len(chunk):] = 0  # last batch: padding rows keep the batch shape fixed
+            try:
+                predictions = np.asarray(self.predict_fn(buffer))
+                self.batches += 1
+                results = self.decode_fn(predictions[rows], top)
+            except Exception as e:
+                self.errors += len(rows)
+                for row in rows:
+                    index, filename, _ = chunk[row]
+                    yield {'index': index, 'filename': filename, 'success': False, 'error': str(e)}
+                continue
+            for row, predictions in zip(rows, results):
+                index, filename, data = chunk[row]
+                if self.cache is not None:
+                    self.cache.store(data, top, predictions)
+                yield {'index': index, 'filename': filename, 'success': True,
+                       'predictions': predictions, 'cached': False}
+
+    def stats(self):
+        return {
+            'batch_size': self.batch_size,
+            'decode_workers': self.workers,
+            'requests': self.requests,
+            'items': self.items,
+            'batches': self.batches,
+            'errors': self.errors
+        }
@@ -0,0 +1,351 @@
+"""Offline load test for the API endpoints.
+
+Starts app.py in-process on a local threaded HTTP server with Gemini,
+Supabase and the image model replaced by the stubs in bench_stubs.py, then
+drives each endpoint at each concurrency level and reports throughput and
+p50/p95/p99 latency. Results are written as JSON; pass an earlier file with
+--compare to see the change between commits.
+
+    python bench_api.py [--endpoints chat resume image contact stats] [--concurrency 1 8 32]
+                        [--requests 200] [--llm-latency-ms 800 --llm-failure-rate 0.02]
+                        [--json bench.json] [--compare previous.json]
+
+Use --url to drive an already running server instead (no stubs are installed
+then, so it talks to whatever services that server is configured with).
+
+--serve sync async runs the same load against gunicorn in each SERVER_MODE
+(see gunicorn.conf.py), with the stubs installed by bench_server.py:
+
+    python bench_api.py --serve sync async --endpoints chat resume --concurrency 8 32 64
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ENDPOINTS = ('chat', 'chat_stream', 'resume', 'image', 'contact', 'stats')
+DEFAULT_ENDPOINTS = ('chat', 'resume', 'image', 'contact', 'stats')
+
+
+def _multipart(fields, files):
+    """Encode form fields and (name, filename, bytes, type) files"""
+    boundary = uuid.uuid4().hex
+    out = io.BytesIO()
+    for name, value in fields.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data, content_type in files:
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                  f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'.encode())
+        out.write(data)
+        out.write(b'\r\n')
+    out.write(f'--{boundary}--\r\n'.encode())
+    return out.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def _json(payload):
+    return json.dumps(payload).encode(), 'application/json'
+
+
+class Workload:
+    """Request builders per endpoint; distinct payloads so caches don't hide the work"""
+
+    def __init__(self, distinct=32, admin_key=None):
+        from bench_image_preprocess import make_image
+        from bench_pdf_extract import make_pdf
+
+        self.admin_key = admin_key or os.getenv("ADMIN_SECRET_KEY", "spark_admin_2025")
+        self.images = [make_image(640 + i, 480, "JPEG") for i in range(distinct)]
+        self.pdf = make_pdf(2)
+
+    def build(self, endpoint, n):
+        """(method, path, body, content type) for the n-th request"""
+        if endpoint in ('chat', 'chat_stream'):
+            body, ctype = _json({'messages': [{'role': 'user', 'content': f'Benchmark question {n}?'}]})
+            path = '/api/chat' if endpoint == 'chat' else '/api/chat/stream?format=ndjson'
+            return 'POST', path, body, ctype
+        if endpoint == 'resume':
+            body, ctype = _multipart({'jobRole': 'Backend Engineer', 'bypassCache': 'true'},
+                                     [('file', 'resume.pdf', self.pdf, 'application/pdf')])
+            return 'POST', '/api/resume-review', body, ctype
+        if endpoint == 'image':
+            data = self.images[n % len(self.images)]
+            body, ctype = _multipart({'top': '3'}, [('file', f'img{n}.jpg', data, 'image/jpeg')])
+            return 'POST', '/api/image-classify', body, ctype
+        if endpoint == 'contact':
+            body, ctype = _json({'name': 'Bench', 'email': f'bench{n}@example.com', 'message': f'Load test {n}'})
+            return 'POST', '/api/contact', body, ctype
+        if endpoint == 'stats':
+            return 'GET', f'/api/stats?key={self.admin_key}', None, None
+        raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'mean_ms': None, 'max_ms': None}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2),
+            'mean_ms': round(float(values.mean()), 2), 'max_ms': round(float(values.max()), 2)}
+
+
+def run_level(base_url, workload, endpoint, concurrency, requests, timeout):
+    """Fire `requests` requests with `concurrency` workers (one connection each)"""
+    url = urlsplit(base_url)
+    local = threading.local()
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+    latencies, statuses = [], {}
+    results_lock = threading.Lock()
+
+    def connection():
+        if getattr(local, 'conn', None) is None:
+            local.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+        return local.conn
+
+    def worker():
+        while True:
+            with counter_lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            method, path, body, ctype = workload.build(endpoint, n)
+            headers = {'Content-Type': ctype} if ctype else {}
+            started = time.perf_counter()
+            try:
+                conn = connection()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()  # streamed endpoints: latency = full body
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    conn.close()
+                    local.conn = None
+            except Exception as e:
+                status = type(e).__name__
+                local.conn = None
+            elapsed = time.perf_counter() - started
+            with results_lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    ok = statuses.get(200, 0)
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': requests,
+        'ok': ok,
+        'errors': requests - ok,
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(ok / wall, 2) if wall else None,
+        **_percentiles(latencies)
+    }
+
+
+def _bench_env(scratch):
+    # Keep benchmark data out of the real local database; measure uncached work
+    return {
+        "LOCAL_DB_PATH": os.path.join(scratch, 'bench.db'),
+        "IMAGE_CACHE_BACKEND": "off",
+        "RESUME_CACHE_BACKEND": "memory",
+        "CHAT_CACHE": "off",
+        "MODEL_SERVER_ADDRESS": "",
+        "RATE_LIMITS": "off",  # every benchmark client shares one IP
+    }
+
+
+def start_local_server(args):
+    """Import app with stubs installed and serve it on a free local port"""
+    for name, value in _bench_env(tempfile.mkdtemp(prefix='spark_bench_')).items():
+        os.environ.setdefault(name, value)
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import app
+    import bench_stubs
+
+    bench_stubs.install(
+        app,
+        llm=bench_stubs.Profile(args.llm_latency_ms, args.llm_jitter_ms, args.llm_failure_rate),
+        db=bench_stubs.Profile(args.db_latency_ms, args.db_jitter_ms, args.db_failure_rate),
+        image_batch_ms=args.model_batch_ms,
+        image_item_ms=args.model_item_ms,
+        supabase=not args.local_only
+    )
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"  # keep-alive between requests
+    WSGIRequestHandler.log_request = lambda *a, **kw: None
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def start_gunicorn(mode, args):
+    """Serve bench_server.py with gunicorn in SERVER_MODE=mode on a free port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    scratch = tempfile.mkdtemp(prefix='spark_bench_')
+    env = {
+        **_bench_env(scratch),
+        **os.environ,
+        "SERVER_MODE": mode,
+        "BENCH_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "BENCH_LLM_JITTER_MS": str(args.llm_jitter_ms),
+        "BENCH_LLM_FAILURE_RATE": str(args.llm_failure_rate),
+        "BENCH_DB_LATENCY_MS": str(args.db_latency_ms),
+        "BENCH_DB_JITTER_MS": str(args.db_jitter_ms),
+        "BENCH_DB_FAILURE_RATE": str(args.db_failure_rate),
+        "BENCH_MODEL_BATCH_MS": str(args.model_batch_ms),
+        "BENCH_MODEL_ITEM_MS": str(args.model_item_ms),
+        "BENCH_LOCAL_ONLY": "1" if args.local_only else "0",
+    }
+    target = 'bench_server:asgi' if mode == 'async' else 'bench_server:app'
+    log = open(os.path.join(scratch, f'gunicorn_{mode}.log'), 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', target],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn ({mode}) exited, see {log.name}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return f"http://127.0.0.1:{port}", process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({mode}) did not become healthy, see {log.name}")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _cell(value):
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def compare(previous_path, results):
+    """Print p95 / throughput changes against an earlier results file"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {(r.get('mode'), r['endpoint'], r['concurrency']): r for r in previous['results']}
+    print(f"\nCompared with {previous_path} ({previous.get('commit')}):")
+    print(f"{'endpoint':>12} {'conc':>5} {'p95 ms':>16} {'rps':>16}")
+    for r in results:
+        old = before.get((r.get('mode'), r['endpoint'], r['concurrency']))
+        if not old or not old['p95_ms'] or not r['p95_ms'] or not old['throughput_rps']:
+            continue
+        p95 = (r['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+        rps = (r['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] * 100
+        print(f"{r['endpoint']:>12} {r['concurrency']:>5} {old['p95_ms']:>7.1f}→{r['p95_ms']:<7.1f}{p95:+.0f}% "
+              f"{old['throughput_rps']:>6.1f}→{r['throughput_rps']:<6.1f}{rps:+.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline API load test")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(DEFAULT_ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and level")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--url", help="benchmark a running server instead of a stubbed local one")
+    parser.add_argument("--serve", nargs="+", choices=("sync", "async"),
+                        help="run gunicorn in these SERVER_MODEs instead of the in-process server")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--db-latency-ms", type=float, default=30.0)
+    parser.add_argument("--db-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--db-failure-rate", type=float, default=0.0)
+    parser.add_argument("--model-batch-ms", type=float, default=20.0, help="stub image model cost per batch")
+    parser.add_argument("--model-item-ms", type=float, default=2.0, help="stub image model cost per image")
+    parser.add_argument("--local-only", action="store_true", help="no Supabase stub: use the SQLite fallback")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    workload = Workload()
+    results = []
+    print(f"{'mode':>6} {'endpoint':>12} {'conc':>5} {'ok':>5} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+
+    def run_all(base_url, mode):
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                r = run_level(base_url, workload, endpoint, concurrency, args.requests, args.timeout)
+                if mode is not None:
+                    r['mode'] = mode
+                results.append(r)
+                print(f"{mode or '-':>6} {endpoint:>12} {concurrency:>5} {r['ok']:>5} {r['errors']:>4} "
+                      f"{_cell(r['throughput_rps'])} {_cell(r['p50_ms'])} {_cell(r['p95_ms'])} {_cell(r['p99_ms'])}")
+
+    server = None
+    if args.url:
+        run_all(args.url.rstrip('/'), None)
+    elif args.serve:
+        for mode in args.serve:
+            base_url, process = start_gunicorn(mode, args)
+            try:
+                run_all(base_url, mode)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    else:
+        base_url, server = start_local_server(args)
+        run_all(base_url, None)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'target': args.url or ('gunicorn stubs' if args.serve else 'in-process stubs'),
+        'config': {
+            'requests': args.requests,
+            'llm': {'latency_ms': args.llm_latency_ms, 'jitter_ms': args.llm_jitter_ms,
+                    'failure_rate': args.llm_failure_rate},
+            'db': {'latency_ms': args.db_latency_ms, 'jitter_ms': args.db_jitter_ms,
+                   'failure_rate': args.db_failure_rate, 'local_only': args.local_only},
+            'image_model': {'batch_ms': args.model_batch_ms, 'item_ms': args.model_item_ms},
+            'serve': args.serve
+        },
+        'results': results
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.compare:
+        compare(args.compare, results)
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
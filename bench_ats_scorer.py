@@ -0,0 +1,64 @@
+"""Latency of the local ATS scorer, one resume at a time vs. one matrix call.
+
+Synthetic resumes (bench_resume_compact's generator) are scored against a job
+description with `ats_scorer.score` in a loop and with a single
+`ats_scorer.score_many` call, and the two must agree. For reference, the
+Gemini review it can replace (mode=fast) takes seconds per resume.
+
+    python bench_ats_scorer.py [--resumes 50 200 1000] [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import random
+import time
+
+import ats_scorer
+from bench_resume_compact import base_resume
+
+JOB_DESCRIPTION = """Senior Backend Engineer
+We are looking for a backend engineer to design and operate Python services on AWS.
+Requirements: Python, Django or Flask, PostgreSQL, Kafka, Redis, Kubernetes, Terraform, CI/CD.
+You will own data pipelines end to end, mentor junior developers and lead design reviews.
+Nice to have: Go, Airflow, machine learning pipelines, cost optimization on AWS."""
+
+
+def resumes(count, seed=11):
+    rng = random.Random(seed)
+    return ['\n'.join(base_resume(rng, jobs=rng.randint(1, 6), bullets=rng.randint(2, 6))) for _ in range(count)]
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local ATS scorer benchmark")
+    parser.add_argument("--resumes", type=int, nargs="+", default=[1, 50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'resumes':>8} {'loop ms':>9} {'matrix ms':>10} {'per resume':>11} {'speedup':>8}")
+    for count in args.resumes:
+        texts = resumes(count)
+        looped = [ats_scorer.score(text, JOB_DESCRIPTION) for text in texts]
+        batched = ats_scorer.score_many(texts, JOB_DESCRIPTION)
+        assert [r['score'] for r in looped] == [r['score'] for r in batched], "loop and matrix scores differ"
+        loop_ms = best_ms(lambda: [ats_scorer.score(text, JOB_DESCRIPTION) for text in texts], args.repeat)
+        matrix_ms = best_ms(lambda: ats_scorer.score_many(texts, JOB_DESCRIPTION), args.repeat)
+        results.append({'resumes': count, 'loop_ms': round(loop_ms, 2), 'matrix_ms': round(matrix_ms, 2),
+                        'scores': sorted(r['score'] for r in batched)})
+        print(f"{count:>8} {loop_ms:>9.1f} {matrix_ms:>10.1f} {matrix_ms / count:>9.3f}ms {loop_ms / matrix_ms:>7.1f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'job_description': JOB_DESCRIPTION, 'results': results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Benchmark image preprocessing: full-resolution decode vs draft-mode decode.
+
+Compares the original `preprocess_image_for_classification` path (PIL decode at
+full size, np.array, cv2.resize) with image_preprocess (draft/reduced decode,
+one RGB conversion, scaling straight into a float32 buffer). Latency is the
+best of --repeat runs; peak memory is measured in a fresh subprocess per case.
+The synthetic photos are generated locally, so no sample files are needed.
+
+    python bench_image_preprocess.py [--sizes 640x480 1920x1080 6000x4000] [--json out.json]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import image_preprocess
+
+
+def make_image(width, height, fmt="JPEG"):
+    """Smooth synthetic photo (upscaled noise) encoded as JPEG or RGBA PNG"""
+    from PIL import Image
+
+    rng = np.random.default_rng(width * height)
+    mode = "RGBA" if fmt == "PNG" else "RGB"
+    small = rng.integers(0, 256, (48, 64, len(mode)), dtype=np.uint8)
+    image = Image.fromarray(small, mode).resize((width, height), Image.BICUBIC)
+    out = io.BytesIO()
+    image.save(out, fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+    return out.getvalue()
+
+
+def preprocess_original(data):
+    """The original implementation, for comparison.
+
+    MobileNetV2's preprocess_input is x / 127.5 - 1, inlined so TensorFlow
+    isn't needed to run the benchmark.
+    """
+    import cv2
+    from PIL import Image
+
+    img = np.array(Image.open(io.BytesIO(data)))
+    img = cv2.resize(img, (224, 224))
+    img = img.astype(np.float32) / 127.5 - 1.0
+    return np.expand_dims(img, axis=0)
+
+
+def preprocess_new(data, out=None):
+    image = image_preprocess.decode_image(data, max_pixels=0)
+    return image_preprocess.preprocess_image(image, out)[None]
+
+
+METHODS = {'original': preprocess_original, 'new': preprocess_new}
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def peak_memory_mb(method, path):
+    """Extra peak RSS of one preprocessing call, in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, __file__, "--measure", method, path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _peak_rss_kb():
+    """Peak RSS in KB (VmHWM on Linux, ru_maxrss elsewhere)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(method, path):
+    with open(path, "rb") as f:
+        data = f.read()
+    import cv2  # noqa: F401  (imported up front so only the call itself is measured)
+    from PIL import Image  # noqa: F401
+
+    try:
+        # The peak is inherited across fork; reset it to the current RSS
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    before = _peak_rss_kb()
+    METHODS[method](data)
+    print((_peak_rss_kb() - before) / 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image preprocessing benchmark")
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1920x1080", "4000x3000", "6000x4000"])
+    parser.add_argument("--png", action="store_true", help="also benchmark RGBA PNGs")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--measure", nargs=2, metavar=("METHOD", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    cases = [(size, "JPEG") for size in args.sizes]
+    if args.png:
+        cases += [(size, "PNG") for size in args.sizes]
+
+    results = []
+    buffer = np.empty((224, 224, 3), dtype=np.float32)
+    print(f"{'image':>15} {'size KB':>8} {'orig ms':>8} {'new ms':>7} {'orig MB':>8} {'new MB':>7} {'diff':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size, fmt in cases:
+            width, height = (int(v) for v in size.split("x"))
+            data = make_image(width, height, fmt)
+            path = os.path.join(tmp, f"{size}.{fmt.lower()}")
+            with open(path, "wb") as f:
+                f.write(data)
+
+            original_ms, expected = timed(lambda: preprocess_original(data), args.repeat)
+            new_ms, got = timed(lambda: preprocess_new(data, buffer), args.repeat)
+            # The original keeps the alpha channel, which MobileNetV2 can't take
+            valid = expected.shape == got.shape
+            diff = float(np.abs(expected - got).mean()) if valid else None
+            result = {
+                'image': f"{size} {fmt}",
+                'bytes': len(data),
+                'original_ms': round(original_ms, 2),
+                'new_ms': round(new_ms, 2),
+                'original_peak_mb': round(peak_memory_mb("original", path), 1),
+                'new_peak_mb': round(peak_memory_mb("new", path), 1),
+                'original_shape': list(expected.shape),
+                'mean_abs_diff': round(diff, 4) if valid else None
+            }
+            results.append(result)
+            print(f"{result['image']:>15} {len(data) / 1024:>8.0f} {original_ms:>8.1f} {new_ms:>7.1f} "
+                  f"{result['original_peak_mb']:>8.1f} {result['new_peak_mb']:>7.1f} "
+                  f"{'%.3f' % diff if valid else 'shape':>6}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
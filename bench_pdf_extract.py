@@ -0,0 +1,126 @@
+"""Benchmark PDF text extraction over synthetic PDFs of increasing size.
+
+Compares the old `text +=` loop, the page generator + join, and the optional
+process-pool mode. No external tools are needed: the PDFs are written by hand.
+
+    python bench_pdf_extract.py [--pages 5 25 100 200] [--workers 4] [--json out.json]
+"""
+import argparse
+import io
+import json
+import os
+import time
+
+import pdf_extract
+
+
+def make_pdf(num_pages, lines_per_page=45):
+    """Build a minimal multi-page text PDF in memory"""
+    return make_text_pdf([
+        ['Page %d line %d: Experienced engineer, Python, Flask, SQL, AWS.' % (page + 1, line + 1)
+         for line in range(lines_per_page)]
+        for page in range(num_pages)
+    ])
+
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_text_pdf(pages):
+    """Build a PDF with one text line per entry of each page's list of lines"""
+    objects = []
+    num_pages = len(pages)
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * num_pages + 1  # after each page's content + page
+    page_ids = []
+    for page_lines in pages:
+        lines = [f"({_pdf_string(line)}) Tj 0 -14 Td" for line in page_lines]
+        stream = ("BT /F1 11 Tf 50 780 Td " + " ".join(lines) + " ET").encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font, content)
+        ))
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, num_pages))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+              % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+def extract_concat(data):
+    """The original implementation, for comparison"""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    text = ""
+    for page in reader.pages:
+        text += page.extract_text() + "\n"
+    return text
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction benchmark")
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 25, 100, 200])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'pages':>6} {'size KB':>8} {'concat ms':>10} {'join ms':>9} {'pool ms':>9}")
+    for pages in args.pages:
+        data = make_pdf(pages)
+        concat_ms, expected = timed(lambda: extract_concat(data), args.repeat)
+        join_ms, text = timed(
+            lambda: pdf_extract.extract_text(data, max_pages=0, max_bytes=0, timeout=0, workers=0),
+            args.repeat)
+        pool_ms, pooled = timed(
+            lambda: pdf_extract.extract_text(data, max_pages=0, max_bytes=0, timeout=0,
+                                             workers=args.workers),
+            args.repeat)
+        assert text.split() == expected.split() == pooled.split()
+        results.append({
+            'pages': pages,
+            'bytes': len(data),
+            'concat_ms': round(concat_ms, 2),
+            'join_ms': round(join_ms, 2),
+            'pool_ms': round(pool_ms, 2),
+            'workers': args.workers
+        })
+        print(f"{pages:>6} {len(data) / 1024:>8.1f} {concat_ms:>10.1f} {join_ms:>9.1f} {pool_ms:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Prompt token reduction from resume_compact on a synthetic resume corpus.
+
+Each document is rendered to a PDF (or kept as text) and run through the same
+extraction + compaction as /api/resume-review. The corpus covers a clean
+one-pager, page headers/footers, template boilerplate, whitespace-heavy
+exports, a long career that exceeds the token budget and a pasted job
+description full of repeated legal text. For every document it reports
+tokens before/after, lines dropped, truncated sections and whether the
+experience and skills sections survived.
+
+    python bench_resume_compact.py [--budget 2500] [--jd-budget 800] [--json out.json]
+"""
+import argparse
+import json
+import random
+import time
+
+import pdf_extract
+import resume_compact
+from bench_pdf_extract import make_text_pdf
+
+COMPANIES = ['Acme Corp', 'Globex', 'Initech', 'Umbrella Labs', 'Hooli', 'Stark Industries', 'Wayne Tech']
+ROLES = ['Software Engineer', 'Senior Software Engineer', 'Backend Developer', 'Data Engineer', 'Tech Lead']
+ACHIEVEMENTS = [
+    'Built a {tech} service handling {n}k requests per second with p99 under 80 ms',
+    'Cut cloud spend by {n}% by right-sizing {tech} clusters and adding autoscaling',
+    'Led a team of {n} engineers migrating a monolith to {tech} microservices',
+    'Designed the {tech} data pipeline feeding {n} downstream analytics dashboards',
+    'Reduced deploy time from hours to {n} minutes with a {tech} based CI/CD pipeline',
+    'Mentored {n} junior developers and ran weekly {tech} design reviews',
+]
+TECH = ['Python', 'Flask', 'Django', 'PostgreSQL', 'Kafka', 'Kubernetes', 'AWS', 'Terraform', 'Redis', 'Go']
+
+
+def experience(rng, jobs, bullets):
+    lines = ['WORK EXPERIENCE']
+    for job in range(jobs):
+        start = 2023 - 2 * job
+        lines.append(f"{rng.choice(ROLES)} | {rng.choice(COMPANIES)} | {start - 2} - {start}")
+        for _ in range(bullets):
+            lines.append('- ' + rng.choice(ACHIEVEMENTS).format(tech=rng.choice(TECH), n=rng.randint(2, 60)))
+    return lines
+
+
+def base_resume(rng, jobs=3, bullets=4, extras=True):
+    lines = ['Jordan Example', 'jordan@example.com | +1 555 0100 | linkedin.com/in/jordan-example',
+             'PROFESSIONAL SUMMARY',
+             'Backend engineer with a decade of experience building reliable, observable Python services.']
+    lines += experience(rng, jobs, bullets)
+    lines += ['TECHNICAL SKILLS', 'Languages: Python, Go, SQL, Bash',
+              'Infrastructure: AWS, Kubernetes, Terraform, Docker', 'Data: PostgreSQL, Kafka, Redis, Airflow',
+              'EDUCATION', 'B.Sc. Computer Science, State University, 2013']
+    if extras:
+        lines += ['PROJECTS', 'Open-source rate limiter for Flask (1.2k GitHub stars)',
+                  'HOBBIES', 'Climbing, chess, sourdough baking', 'REFERENCES', 'References available upon request']
+    return lines
+
+
+def paginate(lines, per_page, header=(), footer=None):
+    pages = []
+    for start in range(0, len(lines), per_page):
+        page = list(header) + lines[start:start + per_page]
+        if footer:
+            page.append(footer.format(page=len(pages) + 1, pages=-(-len(lines) // per_page)))
+        pages.append(page)
+    return pages
+
+
+def corpus(seed=7):
+    """[(name, resume text, job description)] through the real PDF extraction where applicable"""
+    rng = random.Random(seed)
+
+    def pdf_text(pages):
+        return pdf_extract.extract_text(make_text_pdf(pages), max_pages=0, max_bytes=0, timeout=0, workers=0)
+
+    docs = []
+    docs.append(('clean one-pager', pdf_text([base_resume(rng, jobs=2, bullets=3, extras=False)]), ''))
+
+    lines = base_resume(rng, jobs=4, bullets=5)
+    docs.append(('header/footer, 2 pages', pdf_text(paginate(
+        lines, 24, header=['Jordan Example - Resume'], footer='Page {page} of {pages}')), ''))
+
+    lines = base_resume(rng, jobs=4, bullets=5)
+    boilerplate = 'This resume was created with ResumeBuilderPro - www.resumebuilderpro.example'
+    lines = lines[:10] + ['References available upon request'] + lines[10:] + [boilerplate]
+    docs.append(('template boilerplate, 3 pages', pdf_text(paginate(
+        lines, 14, header=['JORDAN EXAMPLE', 'jordan@example.com | +1 555 0100'], footer=boilerplate)), ''))
+
+    lines = base_resume(rng, jobs=3, bullets=4)
+    spaced = ['   '.join(line.split(' ')) + '        ' for line in lines]
+    text = '\r\n'.join(spaced).replace('WORK EXPERIENCE', '\tWORK\t\tEXPERIENCE\t') + '\r\n\r\n\r\n\r\n'
+    docs.append(('whitespace-heavy TXT export', text, ''))
+
+    lines = base_resume(rng, jobs=14, bullets=9)
+    docs.append(('long career, 8 pages', pdf_text(paginate(
+        lines, 18, header=['Jordan Example'], footer='- {page} -')), ''))
+
+    legal = ('We are an equal opportunity employer and value diversity. All qualified applicants will receive '
+             'consideration without regard to race, religion, gender, or disability.')
+    jd = ['Senior Backend Engineer', 'You will design and operate Python services on AWS.']
+    for section in range(12):
+        jd += [f"Responsibility {section}: own {rng.choice(TECH)} systems end to end, on call included.",
+               legal, '', '     ']
+    docs.append(('pasted JD with repeated legal text', pdf_text([base_resume(rng)]), '\n'.join(jd * 3)))
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume prompt compaction benchmark")
+    parser.add_argument("--budget", type=int, default=resume_compact.RESUME_TOKEN_BUDGET)
+    parser.add_argument("--jd-budget", type=int, default=resume_compact.JD_TOKEN_BUDGET)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'document':>36} {'before':>7} {'after':>6} {'saved':>6} {'dropped':>8} {'ms':>6}  truncated / kept")
+    for name, text, jd in corpus():
+        started = time.perf_counter()
+        compacted, report = resume_compact.compact_resume(text, args.budget)
+        _, jd_report = resume_compact.compact_job_description(jd, args.jd_budget)
+        ms = (time.perf_counter() - started) * 1000
+        before = report['tokens_before'] + jd_report['tokens_before']
+        after = report['tokens_after'] + jd_report['tokens_after']
+        kept = {section: section.upper() in compacted.upper() for section in ('experience', 'skills')}
+        truncated = report['truncated_sections'] + [f"jd:{s}" for s in jd_report['truncated_sections']]
+        results.append({'document': name, 'tokens_before': before, 'tokens_after': after,
+                        'resume': report, 'job_description': jd_report, 'kept': kept, 'ms': round(ms, 2)})
+        saved = (before - after) / before * 100 if before else 0.0
+        print(f"{name:>36} {before:>7} {after:>6} {saved:>5.0f}% "
+              f"{report['lines_dropped'] + jd_report['lines_dropped']:>8} {ms:>6.1f}  "
+              f"{','.join(truncated) or '-'} / {'experience+skills' if all(kept.values()) else kept}")
+
+    total_before = sum(r['tokens_before'] for r in results)
+    total_after = sum(r['tokens_after'] for r in results)
+    print(f"\nCorpus: {total_before} -> {total_after} tokens "
+          f"({(total_before - total_after) / total_before * 100:.0f}% fewer), budget {args.budget} + {args.jd_budget}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'budget': args.budget, 'jd_budget': args.jd_budget, 'results': results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""The API with bench_stubs installed, for load tests against real servers.
+
+bench_api.py --serve starts gunicorn on this module so both serving modes
+can be compared under the same stubbed latencies:
+
+    gunicorn -c gunicorn.conf.py bench_server:app     # SERVER_MODE=sync
+    gunicorn -c gunicorn.conf.py bench_server:asgi    # SERVER_MODE=async
+
+Stub behaviour comes from the environment: BENCH_LLM_LATENCY_MS,
+BENCH_LLM_JITTER_MS, BENCH_LLM_FAILURE_RATE (likewise BENCH_DB_*),
+BENCH_MODEL_BATCH_MS, BENCH_MODEL_ITEM_MS and BENCH_LOCAL_ONLY=1.
+"""
+import os
+
+import app as api
+import bench_stubs
+
+
+def _profile(prefix):
+    return bench_stubs.Profile(
+        float(os.getenv(f"BENCH_{prefix}_LATENCY_MS", "0")),
+        float(os.getenv(f"BENCH_{prefix}_JITTER_MS", "0")),
+        float(os.getenv(f"BENCH_{prefix}_FAILURE_RATE", "0"))
+    )
+
+
+bench_stubs.install(
+    api,
+    llm=_profile('LLM'),
+    db=_profile('DB'),
+    image_batch_ms=float(os.getenv("BENCH_MODEL_BATCH_MS", "20")),
+    image_item_ms=float(os.getenv("BENCH_MODEL_ITEM_MS", "2")),
+    supabase=os.getenv("BENCH_LOCAL_ONLY", "0") != "1"
+)
+
+app = api.app
+
+import asgi_app  # noqa: E402  (after the stubs, so both entry points share them)
+
+asgi = asgi_app.app
@@ -0,0 +1,252 @@
+"""Local stand-ins for Gemini, Supabase and the image model.
+
+Used by the offline benchmarks so the API can be driven without network
+access or API keys. Every stub sleeps for a configurable latency (plus
+uniform jitter) and fails with a configurable probability, so fallbacks,
+circuit breakers and the local storage path can be exercised on purpose.
+
+    import app, bench_stubs
+    bench_stubs.install(app, llm=bench_stubs.Profile(latency_ms=800, failure_rate=0.05))
+"""
+import asyncio
+import random
+import threading
+import time
+import types
+
+import numpy as np
+
+
+class StubServiceError(Exception):
+    """Injected failure"""
+
+
+class Profile:
+    """Latency / failure behaviour of one stubbed service"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, failure_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+    def delay(self):
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    def call(self, name, timeout=None, delay=None):
+        """Sleep like the real service would, honouring a client timeout"""
+        delay = self.delay() if delay is None else delay
+        if timeout is not None and delay > timeout:
+            time.sleep(max(0.0, timeout))
+            raise TimeoutError(f"{name} timed out")
+        time.sleep(delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise StubServiceError(f"{name}: injected failure")
+
+    async def acall(self, name, timeout=None, delay=None):
+        """call() for the async client methods: waits without holding a thread"""
+        delay = self.delay() if delay is None else delay
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(max(0.0, timeout))
+            raise TimeoutError(f"{name} timed out")
+        await asyncio.sleep(delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise StubServiceError(f"{name}: injected failure")
+
+    def as_dict(self):
+        return {'latency_ms': self.latency_ms, 'jitter_ms': self.jitter_ms, 'failure_rate': self.failure_rate}
+
+
+# -- Gemini ------------------------------------------------------------------
+
+RESUME_REPLY = """ATS Score: 72/100
+
+Analysis:
+**Strengths**: Clear structure, relevant stack (Python, Flask, SQL).
+**Weaknesses**: Bullet points describe duties, not results.
+**Suggestions**: Quantify impact; tailor the summary to the role."""
+
+
+def _timeout(request_options):
+    return (request_options or {}).get('timeout')
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubChatSession:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = history
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        reply = f"Stub reply ({len(self.history)} earlier turns): {str(prompt)[-60:]}"
+        if not stream:
+            self.model.profile.call(self.model.name, _timeout(request_options))
+            return types.SimpleNamespace(text=reply)
+        return self._stream(reply, _timeout(request_options))
+
+    async def send_message_async(self, prompt, stream=False, request_options=None):
+        reply = f"Stub reply ({len(self.history)} earlier turns): {str(prompt)[-60:]}"
+        if not stream:
+            await self.model.profile.acall(self.model.name, _timeout(request_options))
+            return types.SimpleNamespace(text=reply)
+        total = self.model.profile.delay()
+        await self.model.profile.acall(self.model.name, _timeout(request_options), total * 0.3)
+        return self._astream(reply, total)
+
+    async def _astream(self, reply, total):
+        words = reply.split(' ')
+        chunks = [' '.join(words[i:i + 4]) + ' ' for i in range(0, len(words), 4)]
+        for chunk in chunks:
+            yield _Chunk(chunk)
+            await asyncio.sleep(total * 0.7 / len(chunks))
+
+    def _stream(self, reply, timeout):
+        # ~30% of the latency before the first token, the rest spread over chunks
+        total = self.model.profile.delay()
+        self.model.profile.call(self.model.name, timeout, total * 0.3)
+        words = reply.split(' ')
+        chunks = [' '.join(words[i:i + 4]) + ' ' for i in range(0, len(words), 4)]
+        for chunk in chunks:
+            yield _Chunk(chunk)
+            time.sleep(total * 0.7 / len(chunks))
+
+
+class StubGenerativeModel:
+    """generate_content / start_chat with the google.generativeai call shapes"""
+
+    def __init__(self, name, profile=None, reply=None):
+        self.name = name
+        self.profile = profile or Profile()
+        self.reply = reply
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        self.profile.call(self.name, _timeout(request_options))
+        return types.SimpleNamespace(text=self.reply or f"Stub answer to: {str(prompt)[:60]}")
+
+    async def generate_content_async(self, prompt, request_options=None, **kwargs):
+        await self.profile.acall(self.name, _timeout(request_options))
+        return types.SimpleNamespace(text=self.reply or f"Stub answer to: {str(prompt)[:60]}")
+
+    def start_chat(self, history=None):
+        return StubChatSession(self, history or [])
+
+
+# -- Supabase ----------------------------------------------------------------
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.rows = None
+        self.columns = None
+        self.filters = []
+        self.order_by = []
+        self.count = None
+        self.offset = 0
+
+    def insert(self, rows):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def select(self, columns='*'):
+        self.columns = None if columns == '*' else columns.split(',')
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def or_(self, expression):
+        return self  # keyset cursors aren't modelled; pages just repeat
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def range(self, start, end):
+        self.offset, self.count = start, end - start + 1
+        return self
+
+    def execute(self):
+        self.client.profile.call(f"supabase.{self.table_name}")
+        with self.client.lock:
+            table = self.client.tables.setdefault(self.table_name, [])
+            if self.rows is not None:
+                for row in self.rows:
+                    table.append(dict(row, id=len(table) + 1))
+                return types.SimpleNamespace(data=self.rows)
+            rows = [row for row in table if all(f(row) for f in self.filters)]
+        for column, desc in reversed(self.order_by):
+            rows.sort(key=lambda row: str(row.get(column)), reverse=desc)
+        rows = rows[self.offset:self.offset + self.count if self.count else None]
+        if self.columns:
+            rows = [{c: row.get(c) for c in self.columns} for row in rows]
+        return types.SimpleNamespace(data=rows)
+
+
+class StubSupabase:
+    """In-memory tables behind the supabase-py query builder calls the app makes"""
+
+    def __init__(self, profile=None):
+        self.profile = profile or Profile()
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+
+# -- Image model -------------------------------------------------------------
+
+class StubImageBackend:
+    """inference_backends-compatible backend: fixed cost per batch plus per image"""
+
+    name = 'stub'
+
+    def __init__(self, batch_ms=20.0, item_ms=2.0):
+        self.batch_ms = batch_ms
+        self.item_ms = item_ms
+        self.calls = 0
+
+    def predict(self, batch):
+        self.calls += 1
+        time.sleep((self.batch_ms + self.item_ms * len(batch)) / 1000.0)
+        # Deterministic pseudo-probabilities derived from the pixels
+        seeds = np.abs(np.asarray(batch).reshape(len(batch), -1)[:, ::997].sum(axis=1) * 1000).astype(np.int64)
+        outputs = np.empty((len(batch), 1000), dtype=np.float32)
+        for row, seed in enumerate(seeds):
+            outputs[row] = np.random.default_rng(int(seed)).dirichlet(np.ones(1000))
+        return outputs
+
+    def stats(self):
+        return {'backend': self.name, 'calls': self.calls}
+
+
+def _decode_predictions(predictions, top=5):
+    return [
+        [(f"n{index:08d}", f"class_{index}", float(row[index])) for index in np.argsort(row)[::-1][:top]]
+        for row in np.asarray(predictions)
+    ]
+
+
+stub_mobilenet_v2 = types.SimpleNamespace(decode_predictions=_decode_predictions)
+
+
+def install(app, llm=None, db=None, image_batch_ms=20.0, image_item_ms=2.0, supabase=True):
+    """Swap the app's external services for stubs (call before the first request)"""
+    llm = llm or Profile()
+    app.chat_model_with_search.override(StubGenerativeModel('search', llm))
+    app.chat_model_basic.override(StubGenerativeModel('basic', llm))
+    app.resume_model.override(StubGenerativeModel('resume', llm, reply=RESUME_REPLY))
+    app.image_model.override(StubImageBackend(image_batch_ms, image_item_ms))
+    app.mobilenet_v2.override(stub_mobilenet_v2)
+    client = StubSupabase(db) if supabase else None
+    app.supabase_client.override(client)
+    return client
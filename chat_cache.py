@@ -0,0 +1,206 @@
+"""Semantic cache for repeated, context-free chat questions.
+
+A lot of /api/chat traffic is the same handful of FAQ-style questions ("who
+are you?", "Who are you", "what can you do") and each one still costs a
+grounded Gemini call. `SemanticChatCache` answers them from memory:
+
+- `embed` turns a message into a hashed feature vector with NumPy only:
+  word unigrams and bigrams plus character trigrams, each hashed (CRC32) into
+  one of CHAT_CACHE_DIM signed buckets, then L2-normalized. Case,
+  punctuation, filler words ("hey", "please") and chat shorthand ("u",
+  "what's") do not change it; a different topic word drops the cosine well
+  below the threshold ("CEO of Google" vs "CEO of Apple" is ~0.78).
+- Vectors sit in one preallocated (max entries x dim) matrix, so a lookup is
+  a single matrix-vector product; a match above CHAT_CACHE_THRESHOLD
+  (cosine) that has not expired (CHAT_CACHE_TTL) is a candidate.
+- Similarity alone is not enough: one word can flip the answer ("flask with
+  postgresql" vs "mysql", "junior" vs "senior", "safe" vs "not safe",
+  "with eggs" vs "without eggs") while barely moving the cosine. A candidate
+  is only served when both messages have exactly the same set of content
+  words (everything but the filler; negations are never filler) and the
+  same numbers and operators ("2+2" is not "2+3" nor "2-2").
+- Only short, single-turn, FAQ-style questions are cached. Anything with
+  conversation context, messages over MAX_MESSAGE_CHARS, and time-sensitive
+  questions (weather, news, scores, prices, "today", "latest", ... the
+  things the system prompt sends to search) are never looked up nor stored.
+
+The index is per worker process and bounded; when full, the least recently
+used entry is replaced. Stats report hits, misses, why messages were skipped,
+and the upstream latency that hits saved.
+"""
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE", "on").lower() not in ('off', '0', 'false', 'none')
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512"))
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "3600"))
+CHAT_CACHE_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.97"))
+CHAT_CACHE_DIM = int(os.getenv("CHAT_CACHE_DIM", "1024"))
+MAX_MESSAGE_CHARS = 80  # FAQ-style questions are short; longer prompts are one-off tasks
+
+_WORD = re.compile(r"[a-z0-9']+")
+# Numbers and the operators between them must match exactly for a hit
+_NUMBER = re.compile(r"\d+(?:\.\d+)?|[-+*/^%=<>]")
+# Words that make an answer go stale (the system prompt routes these to search)
+TIME_SENSITIVE = re.compile(r"""\b(
+    weather|forecast|temperature|rain(ing)?|snow(ing)?|humidity|
+    news|headlines?|breaking|update[sd]?|happen(ed|ing)|announce[sd]?|
+    scores?|match(es)?|game|games|won|wins?|results?|standings?|fixtures?|live|
+    stocks?|shares?|prices?|cost|market|crypto|bitcoin|btc|eth|exchange\s+rate|rates?|
+    today|tonight|tomorrow|yesterday|now|current(ly)?|latest|recent(ly)?|
+    this\s+(week|month|year|season)|right\s+now|
+    time|date|day|election|traffic|trending|release[sd]?
+)\b""", re.IGNORECASE | re.VERBOSE)
+# Dropped before embedding so "hey, who are you?" matches "who are you";
+# never add words that change meaning ("not", "no", "without", "never")
+FILLER = frozenset(['hi', 'hey', 'hello', 'please', 'pls', 'plz', 'ok', 'okay', 'so', 'um', 'uh', 'spark',
+                    'thanks', 'thank', 'tell', 'me', 'can', 'could', 'would', 'just', 'the', 'a', 'an'])
+# Chat shorthand, spelled out before embedding
+ALIASES = {'u': 'you', 'r': 'are', 'ur': 'your', 'ya': 'you', 'wat': 'what', "what's": 'what is',
+           "who's": 'who is', "you're": 'you are', 'whats': 'what is', 'whos': 'who is'}
+
+
+def words(text):
+    tokens = ' '.join(ALIASES.get(w, w) for w in _WORD.findall((text or '').lower())).split()
+    return [w for w in tokens if w not in FILLER]
+
+
+def content_words(text):
+    """The words a cache hit must share exactly with the cached question"""
+    return frozenset(words(text))
+
+
+def _bucket(feature):
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+def embed(text, dim=None):
+    """Hashed word + char n-gram vector (float32, unit length; zeros for empty text)"""
+    dim = dim or CHAT_CACHE_DIM
+    vector = np.zeros(dim, dtype=np.float32)
+    tokens = words(text)
+    features = [(f"w:{w}", 2.0) for w in tokens]
+    features += [(f"b:{a} {b}", 1.0) for a, b in zip(tokens, tokens[1:])]
+    joined = f" {' '.join(tokens)} "
+    features += [(f"c:{joined[i:i + 3]}", 0.5) for i in range(len(joined) - 2)]
+    for feature, weight in features:
+        h = _bucket(feature)
+        # Top bit picks the sign so hash collisions tend to cancel out
+        vector[h % dim] += weight if h & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def skip_reason(message, has_context=False):
+    """Why a message must not be cached (None when it may be)"""
+    if has_context:
+        return 'context'
+    if not message or not message.strip():
+        return 'empty'
+    if len(message) > MAX_MESSAGE_CHARS:
+        return 'long'
+    if TIME_SENSITIVE.search(message):
+        return 'time_sensitive'
+    return None
+
+
+class SemanticChatCache:
+    """In-memory vector index of (question -> reply) with TTL and LRU replacement"""
+
+    def __init__(self, max_entries=None, ttl=None, threshold=None, dim=None, enabled=None):
+        self.enabled = CHAT_CACHE_ENABLED if enabled is None else enabled
+        self.max_entries = max(1, max_entries or CHAT_CACHE_MAX_ENTRIES)
+        self.ttl = CHAT_CACHE_TTL if ttl is None else ttl
+        self.threshold = CHAT_CACHE_THRESHOLD if threshold is None else threshold
+        self.dim = dim or CHAT_CACHE_DIM
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((self.max_entries, self.dim), dtype=np.float32)
+        self._expires = np.zeros(self.max_entries)  # 0 = free slot
+        self._used = np.zeros(self.max_entries)
+        self._entries = [None] * self.max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.skipped = {}
+        self.saved_ms = 0.0
+
+    def _skip(self, message, has_context):
+        reason = skip_reason(message, has_context)
+        if reason is not None:
+            with self._lock:
+                self.skipped[reason] = self.skipped.get(reason, 0) + 1
+        return reason
+
+    def lookup(self, message, has_context=False):
+        """Cached {'reply', 'model', 'similarity', 'question', 'saved_ms'} or None"""
+        if not self.enabled or self._skip(message, has_context):
+            return None
+        vector = embed(message, self.dim)
+        numbers = _NUMBER.findall(message)
+        content = content_words(message)
+        now = time.time()
+        with self._lock:
+            similarity = self._vectors @ vector
+            similarity[self._expires <= now] = -1.0
+            for index in np.argsort(similarity)[::-1][:3]:
+                if similarity[index] < self.threshold:
+                    break
+                entry = self._entries[index]
+                if entry['numbers'] != numbers or entry['words'] != content:
+                    continue
+                self._used[index] = now
+                entry['hits'] += 1
+                self.hits += 1
+                self.saved_ms += entry['latency_ms']
+                return {'reply': entry['reply'], 'model': entry['model'], 'question': entry['question'],
+                        'similarity': round(float(similarity[index]), 4), 'saved_ms': entry['latency_ms']}
+            self.misses += 1
+        return None
+
+    def store(self, message, reply, model=None, latency_ms=0.0, has_context=False):
+        """Remember a fresh upstream reply (no-op for uncacheable messages)"""
+        if not self.enabled or not reply or skip_reason(message, has_context) is not None:
+            return False
+        vector = embed(message, self.dim)
+        now = time.time()
+        with self._lock:
+            # Free or expired slot first, otherwise the least recently used one
+            free = np.flatnonzero(self._expires <= now)
+            index = int(free[0]) if len(free) else int(np.argmin(self._used))
+            self._vectors[index] = vector
+            self._expires[index] = now + self.ttl if self.ttl else np.inf
+            self._used[index] = now
+            self._entries[index] = {'question': message, 'reply': reply, 'model': model,
+                                    'latency_ms': round(latency_ms, 1), 'numbers': _NUMBER.findall(message),
+                                    'words': content_words(message), 'hits': 0}
+            self.stored += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._expires[:] = 0
+            self._entries = [None] * self.max_entries
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        lookups = self.hits + self.misses
+        return {
+            'enabled': True,
+            'entries': int(np.count_nonzero(self._expires > time.time())),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stored': self.stored,
+            'skipped': dict(self.skipped),
+            'saved_upstream_ms': round(self.saved_ms, 1),
+            'avg_saved_ms': round(self.saved_ms / self.hits, 1) if self.hits else 0.0
+        }
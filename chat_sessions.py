@@ -0,0 +1,93 @@
+"""Server-side chat conversations with a token-budgeted history.
+
+Instead of re-sending the whole transcript on every turn, the client sends a
+`conversationId` and only the new message. Conversations live in a
+`ResultCache` (LRU + TTL in memory, or the local SQLite database so all
+workers see them). After each turn the stored history is trimmed to a token
+budget: the oldest turns are folded into a short running summary, so the
+prompt sent upstream stays bounded however long the conversation gets.
+
+Conversation IDs come from the client and end up in cache keys (file names
+with the disk backend), so only `new_id()`-style tokens are accepted.
+"""
+import re
+import uuid
+
+from result_cache import ResultCache
+
+SUMMARY_SNIPPET_CHARS = 160
+CONVERSATION_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text or '') + 3) // 4
+
+
+class ConversationStore:
+    """Conversations keyed by ID, each holding turns plus a summary"""
+
+    def __init__(self, backend, ttl=86400, token_budget=3000, summary_budget=300):
+        self.cache = ResultCache(backend, ttl)
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.trimmed_turns = 0
+
+    @property
+    def enabled(self):
+        return self.cache.enabled
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def valid_id(conversation_id):
+        """Letters, digits, '_' and '-' only, at most 64 characters (new_id() gives 32 hex)"""
+        return isinstance(conversation_id, str) and CONVERSATION_ID.fullmatch(conversation_id) is not None
+
+    def load(self, conversation_id):
+        """Return the stored conversation, or a fresh empty one"""
+        if conversation_id and not self.valid_id(conversation_id):
+            raise ValueError('Invalid conversation ID')
+        conversation = self.cache.get(conversation_id) if conversation_id else None
+        return conversation or {'turns': [], 'summary': ''}
+
+    def gemini_history(self, conversation):
+        """Stored turns in the shape `start_chat(history=...)` expects"""
+        return [{'role': turn['role'], 'parts': [turn['content']]} for turn in conversation['turns']]
+
+    def append(self, conversation_id, conversation, user_message, reply):
+        """Add one user/model exchange, trim to budget and save"""
+        conversation['turns'].extend([
+            {'role': 'user', 'content': user_message},
+            {'role': 'model', 'content': reply}
+        ])
+        if not self.valid_id(conversation_id):
+            raise ValueError('Invalid conversation ID')
+        self._trim(conversation)
+        self.cache.set(conversation_id, conversation)
+        return conversation
+
+    def history_tokens(self, conversation):
+        return estimate_tokens(conversation['summary']) + sum(
+            estimate_tokens(turn['content']) for turn in conversation['turns'])
+
+    def _trim(self, conversation):
+        """Fold the oldest exchanges into the summary until under budget"""
+        turns = conversation['turns']
+        while len(turns) > 2 and self.history_tokens(conversation) > self.token_budget:
+            dropped, turns[:2] = turns[:2], []
+            self.trimmed_turns += len(dropped)
+            asked = ' '.join(dropped[0]['content'].split())[:SUMMARY_SNIPPET_CHARS]
+            summary = f"{conversation['summary']}\n- User asked: {asked}".strip()
+            # Keep only the most recent topics once the summary is full
+            while estimate_tokens(summary) > self.summary_budget and '\n' in summary:
+                summary = summary.split('\n', 1)[1]
+            conversation['summary'] = summary
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats['token_budget'] = self.token_budget
+        stats['trimmed_turns'] = self.trimmed_turns
+        return stats
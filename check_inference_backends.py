@@ -0,0 +1,119 @@
+"""Accuracy parity of the optimized inference backends against Keras.
+
+Runs the same fixed image set through the Keras reference and each backend and
+checks top-1 agreement (same best class) and top-3 agreement (Keras' best
+class within the backend's top 3) against per-backend thresholds. Also prints
+the average batch latency of each backend. Exits non-zero on a regression.
+
+    python check_inference_backends.py [--images path/to/images] [--backends graph tflite-int8 onnx]
+
+Without --images a deterministic synthetic set is used; real photos (e.g. a
+few ImageNet validation images) give a far more meaningful int8 result.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+import image_preprocess
+from inference_backends import BACKENDS, load_backend
+
+# Minimum (top-1, top-3) agreement with the Keras reference
+THRESHOLDS = {
+    'graph': (0.99, 1.0),
+    'tflite-fp16': (0.97, 0.99),
+    'tflite-int8': (0.90, 0.97),
+    'onnx': (0.99, 1.0),
+}
+
+
+def synthetic_images(count, seed=0):
+    """Fixed set of smooth random pictures encoded as JPEG"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+        out = io.BytesIO()
+        Image.fromarray(small).resize((320, 240), Image.BICUBIC).save(out, "JPEG", quality=90)
+        yield out.getvalue()
+
+
+def load_images(directory, count):
+    if not directory:
+        return list(synthetic_images(count))
+    paths = []
+    for pattern in ('*.jpg', '*.jpeg', '*.png'):
+        paths += glob.glob(os.path.join(directory, '**', pattern), recursive=True)
+    images = []
+    for path in sorted(paths)[:count]:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+def run(backend, batch, batch_size):
+    outputs, elapsed = [], 0.0
+    for start in range(0, len(batch), batch_size):
+        started = time.perf_counter()
+        outputs.append(np.asarray(backend.predict(batch[start:start + batch_size])))
+        elapsed += time.perf_counter() - started
+    batches = (len(batch) + batch_size - 1) // batch_size
+    return np.concatenate(outputs), elapsed / batches * 1000
+
+
+def agreement(reference, outputs):
+    expected = reference.argmax(axis=1)
+    top3 = np.argsort(outputs, axis=1)[:, -3:]
+    top1 = float((outputs.argmax(axis=1) == expected).mean())
+    within3 = float(np.mean([label in row for label, row in zip(expected, top3)]))
+    return top1, within3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference backend parity check")
+    parser.add_argument("--images", default=None, help="directory of JPG/PNG images")
+    parser.add_argument("--count", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--backends", nargs="+", default=[name for name in BACKENDS if name != 'keras'])
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    if not images:
+        print(f"❌ No images found in {args.images}")
+        sys.exit(1)
+    batch = image_preprocess.preprocess_batch([image_preprocess.decode_image(data) for data in images])
+
+    reference = load_backend('keras', fallback=False)
+    expected, keras_ms = run(reference, batch, args.batch_size)
+    print(f"{len(images)} images, batch size {args.batch_size}")
+    print(f"{'backend':>12} {'top-1':>7} {'top-3':>7} {'ms/batch':>9}")
+    print(f"{'keras':>12} {1.0:>7.3f} {1.0:>7.3f} {keras_ms:>9.1f}")
+
+    failed = []
+    for name in args.backends:
+        try:
+            backend = load_backend(name, fallback=False)
+        except ImportError as e:
+            print(f"{name:>12} skipped ({str(e)})")
+            continue
+        outputs, ms = run(backend, batch, args.batch_size)
+        top1, top3 = agreement(expected, outputs)
+        min_top1, min_top3 = THRESHOLDS[name]
+        ok = top1 >= min_top1 and top3 >= min_top3
+        print(f"{name:>12} {top1:>7.3f} {top3:>7.3f} {ms:>9.1f} {'✅' if ok else '❌'}")
+        if not ok:
+            failed.append(name)
+
+    if failed:
+        print(f"\n❌ Agreement below threshold: {', '.join(failed)}")
+        sys.exit(1)
+    print("\n✅ All backends within their agreement thresholds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Startup-time / import-time report for app.py.
+
+Imports the API in a fresh interpreter with `-X importtime`, prints the total
+boot time and the slowest top-level imports, and exits non-zero when the boot
+exceeds the budget so regressions show up in CI.
+
+    python check_startup.py [--budget-ms 1000] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+def measure(module="app"):
+    """Import `module` in a subprocess; return (wall_ms, [(cumulative_us, name)])"""
+    env = dict(os.environ)
+    env.pop("WARMUP_RESOURCES", None)  # measure the cold path only
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"Importing {module} failed")
+
+    # Children are printed before their parent and indented two spaces per
+    # level, so collect depth-1 entries until the target module itself shows up
+    imports, pending = [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line.split("|", 2)
+        name = raw_name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                imports = pending
+            pending = []
+        elif depth == 1:
+            pending.append((int(cumulative_us), name.strip()))
+    imports.sort(reverse=True)
+    return wall_ms, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    wall_ms, imports = measure(args.module)
+
+    print(f"Boot of '{args.module}' (interpreter + imports): {wall_ms:.0f} ms")
+    print(f"\nSlowest imports made by {args.module}:")
+    for us, name in imports[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    heavy = {"tensorflow", "keras", "cv2", "PyPDF2", "supabase", "google", "onnxruntime", "tflite_runtime"}
+    eager = sorted(name for _, name in imports if name.split(".")[0] in heavy)
+    if eager:
+        print(f"\n❌ Heavy modules imported at startup: {', '.join(eager)}")
+    if wall_ms > args.budget_ms:
+        print(f"\n❌ Boot exceeded budget of {args.budget_ms:.0f} ms")
+    if eager or wall_ms > args.budget_ms:
+        sys.exit(1)
+    print(f"\n✅ Boot within budget of {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
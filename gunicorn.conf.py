@@ -0,0 +1,24 @@
+"""gunicorn settings for both serving modes.
+
+SERVER_MODE=sync (default): the Flask app on threaded sync workers; each
+request holds a thread, Gemini calls included.
+SERVER_MODE=async: asgi_app on uvicorn workers; chat and resume reviews wait
+for Gemini on the event loop, everything else runs on ASYNC_SYNC_THREADS.
+
+    gunicorn -c gunicorn.conf.py [app_module:callable]
+"""
+import os
+
+SERVER_MODE = os.getenv("SERVER_MODE", "sync").lower()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+if SERVER_MODE == "async":
+    wsgi_app = "asgi_app:app"
+    worker_class = "uvicorn.workers.UvicornWorker"
+elif SERVER_MODE == "sync":
+    wsgi_app = "app:app"
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+else:
+    raise ValueError(f"SERVER_MODE must be 'sync' or 'async', not {SERVER_MODE!r}")
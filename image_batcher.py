@@ -0,0 +1,153 @@
+"""Dynamic micro-batching for the image classifier.
+
+Concurrent requests hand their preprocessed image to a shared queue. A single
+worker thread groups whatever arrives inside a short window into one batch and
+runs one forward pass for all of them, then hands each row back to the request
+that submitted it.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collect concurrent inputs into batches for a single predict call"""
+
+    def __init__(self, predict_fn, max_batch_size=None, max_wait_ms=None):
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("IMAGE_BATCH_MAX_SIZE", "16"))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("IMAGE_BATCH_MAX_WAIT_MS", "10"))
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._buffers = {}  # input shape -> reusable float32 batch buffer
+        self._worker = None
+        self._worker_pid = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._batch_sizes = {}
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._total_inference = 0.0
+        self._errors = 0
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use (and again after a fork)"""
+        pid = os.getpid()
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == pid:
+                return
+            if self._worker_pid != pid:
+                # Threads don't survive fork(); queued work belonged to the parent
+                self._queue = queue.Queue()
+            self._worker_pid = pid
+            self._worker = threading.Thread(
+                target=self._run, name="image-batcher", daemon=True
+            )
+            self._worker.start()
+
+    def submit(self, image):
+        """Queue one preprocessed image of shape (H, W, C) or (1, H, W, C)"""
+        image = np.asarray(image)
+        if image.ndim == 4 and image.shape[0] == 1:
+            image = image[0]
+
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((image, future, time.perf_counter()))
+        return future
+
+    def predict(self, image, timeout=None):
+        """Blocking helper: returns predictions shaped (1, num_classes)"""
+        return self.submit(image).result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        waits = [started - enqueued for _, _, enqueued in batch]
+
+        # Group by shape so one malformed upload can't fail everyone else's request
+        groups = {}
+        for item in batch:
+            groups.setdefault(item[0].shape, []).append(item)
+
+        for items in groups.values():
+            try:
+                inputs = self._stack([image for image, _, _ in items])
+                outputs = np.asarray(self.predict_fn(inputs))
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            for i, (_, future, _) in enumerate(items):
+                future.set_result(outputs[i:i + 1])
+
+        elapsed = time.perf_counter() - started
+        size = len(batch)
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._largest_batch = max(self._largest_batch, size)
+            self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+            self._total_wait += sum(waits)
+            self._max_wait_seen = max(self._max_wait_seen, max(waits))
+            self._total_inference += elapsed
+
+    def _stack(self, images):
+        """Copy images into the preallocated buffer for their shape (worker thread only)"""
+        shape = images[0].shape
+        buffer = self._buffers.get(shape)
+        if buffer is None:
+            buffer = self._buffers[shape] = np.empty((self.max_batch_size,) + shape, dtype=np.float32)
+        return np.stack(images, out=buffer[:len(images)], casting='same_kind')
+
+    def stats(self):
+        """Batch-size and queue-wait metrics since startup"""
+        with self._lock:
+            batches = self._batches or 1
+            items = self._items or 1
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'items': self._items,
+                'errors': self._errors,
+                'avg_batch_size': round(self._items / batches, 2),
+                'largest_batch': self._largest_batch,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'avg_queue_wait_ms': round(self._total_wait / items * 1000, 3),
+                'max_queue_wait_ms': round(self._max_wait_seen * 1000, 3),
+                'avg_inference_ms': round(self._total_inference / batches * 1000, 3),
+            }
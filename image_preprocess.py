@@ -0,0 +1,105 @@
+"""Bounded, low-copy image preprocessing for MobileNetV2.
+
+Uploads are checked against a byte limit before decoding and against a pixel
+limit using only the image header. JPEGs are decoded in draft mode (libjpeg
+scales by 1/2, 1/4 or 1/8 while decoding), other formats are shrunk with
+`reduce()` before the final resize, and the image is converted to RGB exactly
+once (RGBA, LA, palette and grayscale PNGs included). The resized pixels are
+scaled to [-1, 1] straight into a float32 buffer, which can be a row of a
+preallocated batch.
+"""
+import io
+import os
+
+import numpy as np
+
+MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+INPUT_SIZE = 224
+REDUCIBLE_MODES = ('RGB', 'RGBA', 'L', 'LA', 'CMYK')
+
+
+class ImageLimitError(Exception):
+    """The upload exceeded the byte or pixel limit"""
+
+
+def decode_error(error):
+    """Client-facing message for an upload that could not be decoded"""
+    from PIL import UnidentifiedImageError
+
+    if isinstance(error, ImageLimitError):
+        return str(error)
+    if isinstance(error, UnidentifiedImageError):
+        return 'Not a valid JPG or PNG image'
+    return f"Could not decode image: {str(error)}"
+
+
+def read_upload(stream, max_bytes=None):
+    """Read at most max_bytes + 1 bytes so oversized uploads fail early"""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    data = stream.read(max_bytes + 1) if max_bytes else stream.read()
+    if max_bytes and len(data) > max_bytes:
+        raise ImageLimitError(f"Image exceeds the upload limit of {max_bytes} bytes")
+    return data
+
+
+def _to_rgb(image):
+    """Single conversion to RGB; transparent areas become white"""
+    if image.mode == 'RGB':
+        return image
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        from PIL import Image
+
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def decode_image(data, size=INPUT_SIZE, max_pixels=None):
+    """Decode to RGB, downscaling while decoding but never below size x size"""
+    from PIL import Image
+
+    max_pixels = MAX_PIXELS if max_pixels is None else max_pixels
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size  # header only, nothing decoded yet
+    if max_pixels and width * height > max_pixels:
+        raise ImageLimitError(
+            f"Image is {width}x{height}; the limit is {max_pixels} pixels")
+    if image.format == 'JPEG':
+        # Let libjpeg do the downscaling (DCT scaling) and the colour conversion
+        image.draft('RGB', (size, size))
+    image.load()  # decode now, so decode time isn't hidden in the first resize
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    factor = min(image.size) // (2 * size)
+    if factor > 1 and image.mode in REDUCIBLE_MODES:
+        # Cheap box-filter shrink before any conversion; the final resize antialiases
+        image = image.reduce(factor)
+    return _to_rgb(image)
+
+
+def preprocess_image(image, out=None, size=INPUT_SIZE):
+    """Resize an RGB image and scale it to [-1, 1] into `out` (size, size, 3) float32"""
+    from PIL import Image
+
+    if image.size != (size, size):
+        image = image.resize((size, size), Image.BILINEAR)
+    if out is None:
+        out = np.empty((size, size, 3), dtype=np.float32)
+    # MobileNetV2 preprocess_input: x / 127.5 - 1, computed in place from uint8
+    np.divide(np.asarray(image), 127.5, out=out, casting='unsafe')
+    out -= 1.0
+    return out
+
+
+def preprocess_batch(images, out=None, size=INPUT_SIZE):
+    """Fill rows of a (N, size, size, 3) float32 buffer, one per image"""
+    if out is None:
+        out = np.empty((len(images), size, size, 3), dtype=np.float32)
+    for row, image in enumerate(images):
+        preprocess_image(image, out[row], size)
+    return out[:len(images)]
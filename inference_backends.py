@@ -0,0 +1,304 @@
+"""Pluggable CPU inference backends for the MobileNetV2 classifier.
+
+IMAGE_BACKEND picks how the forward pass runs:
+
+    keras        model.predict on the Keras model (reference, default)
+    graph        the same weights behind a fixed-signature tf.function
+    tflite-fp16  TFLite with float16 weights
+    tflite-int8  TFLite with int8 weights/activations (calibrated)
+    onnx         ONNX Runtime
+
+TFLite and ONNX models are converted from the Keras ImageNet weights the first
+time they are needed and kept in IMAGE_MODEL_DIR; build them ahead of time
+(e.g. in the Docker image) with:
+
+    python inference_backends.py convert tflite-int8 --calibration path/to/images
+
+Every backend takes the preprocessed float32 batch from image_preprocess and
+returns (N, 1000) probabilities, runs a warmup batch at load and honours
+IMAGE_BACKEND_THREADS. If an optional runtime (onnxruntime, tf2onnx) isn't
+installed, loading falls back to the Keras backend.
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+BACKEND = os.getenv("IMAGE_BACKEND", "keras").lower()
+THREADS = int(os.getenv("IMAGE_BACKEND_THREADS", "0"))  # 0 = runtime default
+WARMUP_BATCH = int(os.getenv("IMAGE_BACKEND_WARMUP_BATCH", "1"))
+INPUT_SHAPE = (224, 224, 3)
+CALIBRATION_SAMPLES = 100
+
+
+def model_dir():
+    return os.getenv("IMAGE_MODEL_DIR") or ('/tmp/spark_models' if os.name != 'nt' else 'models')
+
+
+def _keras_model():
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
+    return MobileNetV2(weights="imagenet")
+
+
+def _configure_tf_threads(threads):
+    if not threads:
+        return
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        # TensorFlow was already initialised (e.g. by another backend in this process)
+        print("⚠️ IMAGE_BACKEND_THREADS ignored: TensorFlow is already initialised")
+
+
+class InferenceBackend:
+    """Common interface: load(), predict(batch) -> probabilities, warmup()"""
+
+    name = None
+
+    def __init__(self, threads=None):
+        self.threads = THREADS if threads is None else threads
+        self.load_ms = None
+        self.calls = 0
+        self.items = 0
+        self.total_ms = 0.0
+
+    def load(self):
+        raise NotImplementedError
+
+    def _predict(self, batch):
+        raise NotImplementedError
+
+    def predict(self, batch):
+        started = time.perf_counter()
+        outputs = self._predict(np.ascontiguousarray(batch, dtype=np.float32))
+        self.calls += 1
+        self.items += len(batch)
+        self.total_ms += (time.perf_counter() - started) * 1000
+        return outputs
+
+    def warmup(self, batch_size=None):
+        """One throwaway batch so graph tracing/allocation isn't paid by a request"""
+        batch_size = batch_size or WARMUP_BATCH
+        if batch_size > 0:
+            self._predict(np.zeros((batch_size,) + INPUT_SHAPE, dtype=np.float32))
+
+    def stats(self):
+        calls = self.calls or 1
+        return {
+            'backend': self.name,
+            'threads': self.threads,
+            'load_ms': round(self.load_ms, 1) if self.load_ms is not None else None,
+            'calls': self.calls,
+            'items': self.items,
+            'avg_predict_ms': round(self.total_ms / calls, 3)
+        }
+
+
+class KerasBackend(InferenceBackend):
+    """The reference: Keras MobileNetV2 through model.predict"""
+
+    name = 'keras'
+
+    def load(self):
+        _configure_tf_threads(self.threads)
+        self.model = _keras_model()
+
+    def _predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class GraphBackend(InferenceBackend):
+    """A tf.function with a fixed input signature (no per-call predict() setup)"""
+
+    name = 'graph'
+
+    def load(self):
+        import tensorflow as tf
+
+        _configure_tf_threads(self.threads)
+        model = _keras_model()
+        self.model = model
+        self.fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32)],
+            jit_compile=os.getenv("IMAGE_BACKEND_XLA", "0") == "1"
+        )
+
+    def _predict(self, batch):
+        return self.fn(batch).numpy()
+
+
+def _calibration_batches(calibration_dir=None, samples=CALIBRATION_SAMPLES):
+    """Representative inputs for int8 calibration: real images if available"""
+    import image_preprocess
+
+    calibration_dir = calibration_dir or os.getenv("IMAGE_CALIBRATION_DIR")
+    paths = []
+    if calibration_dir:
+        for pattern in ('*.jpg', '*.jpeg', '*.png'):
+            paths += glob.glob(os.path.join(calibration_dir, '**', pattern), recursive=True)
+    if paths:
+        for path in sorted(paths)[:samples]:
+            with open(path, 'rb') as f:
+                image = image_preprocess.decode_image(f.read())
+            yield [image_preprocess.preprocess_image(image)[None]]
+        return
+    print("⚠️ No IMAGE_CALIBRATION_DIR images; calibrating int8 on synthetic inputs")
+    rng = np.random.default_rng(0)
+    for _ in range(samples):
+        yield [rng.uniform(-1, 1, (1,) + INPUT_SHAPE).astype(np.float32)]
+
+
+def convert_tflite(quantization, path, calibration_dir=None):
+    """Write a TFLite model converted from the Keras weights"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(_keras_model())
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        # Full int8 internally; float32 in/out so preprocessing stays the same
+        converter.representative_dataset = lambda: _calibration_batches(calibration_dir)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+def convert_onnx(path):
+    """Write an ONNX model converted from the Keras weights (needs tf2onnx)"""
+    import tensorflow as tf
+    import tf2onnx
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    signature = [tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32, name='input')]
+    tf2onnx.convert.from_keras(_keras_model(), input_signature=signature, opset=13, output_path=path)
+    return path
+
+
+def _tflite_interpreter(path, threads):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter(model_path=path, num_threads=threads or None)
+
+
+class TFLiteBackend(InferenceBackend):
+    """TFLite interpreter over an fp16- or int8-quantized model"""
+
+    def __init__(self, quantization='fp16', threads=None, path=None):
+        super().__init__(threads)
+        self.quantization = quantization
+        self.name = f'tflite-{quantization}'
+        self.path = path or os.path.join(model_dir(), f'mobilenet_v2_{quantization}.tflite')
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            print(f"⏳ Converting MobileNetV2 to {self.name} ({self.path})...")
+            convert_tflite(self.quantization, self.path)
+        self.interpreter = _tflite_interpreter(self.path, self.threads)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+
+    def _predict(self, batch):
+        # The interpreter is stateful: one batch at a time, resized on demand
+        with self._lock:
+            if len(batch) != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = len(batch)
+            self.interpreter.set_tensor(self.input_index, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class ONNXBackend(InferenceBackend):
+    """ONNX Runtime CPU session"""
+
+    name = 'onnx'
+
+    def __init__(self, threads=None, path=None):
+        super().__init__(threads)
+        self.path = path or os.path.join(model_dir(), 'mobilenet_v2.onnx')
+
+    def load(self):
+        import onnxruntime as ort
+
+        if not os.path.exists(self.path):
+            print(f"⏳ Converting MobileNetV2 to ONNX ({self.path})...")
+            convert_onnx(self.path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _predict(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'graph': GraphBackend,
+    'tflite-fp16': lambda **kw: TFLiteBackend('fp16', **kw),
+    'tflite-int8': lambda **kw: TFLiteBackend('int8', **kw),
+    'onnx': ONNXBackend,
+}
+
+
+def make_backend(name=None, threads=None):
+    name = (name or BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"IMAGE_BACKEND must be one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](threads=threads)
+
+
+def load_backend(name=None, threads=None, warmup=True, fallback=True):
+    """Build, load and warm up a backend (Keras if an optional runtime is missing)"""
+    backend = make_backend(name, threads)
+    started = time.perf_counter()
+    try:
+        backend.load()
+    except ImportError as e:
+        if not fallback or backend.name == 'keras':
+            raise
+        print(f"⚠️ {backend.name} backend unavailable ({str(e)}); using keras")
+        return load_backend('keras', threads, warmup, fallback=False)
+    if warmup:
+        backend.warmup()
+    backend.load_ms = (time.perf_counter() - started) * 1000
+    print(f"✅ Image backend {backend.name} ready in {backend.load_ms:.0f} ms")
+    return backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert MobileNetV2 for the optimized backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="write the TFLite/ONNX model file")
+    convert.add_argument("backend", choices=['tflite-fp16', 'tflite-int8', 'onnx'])
+    convert.add_argument("--output", default=None, help="model path (default: in $IMAGE_MODEL_DIR)")
+    convert.add_argument("--calibration", default=None, help="image directory for int8 calibration")
+    args = parser.parse_args()
+
+    if args.backend == 'onnx':
+        path = convert_onnx(args.output or ONNXBackend().path)
+    else:
+        backend = make_backend(args.backend)
+        path = convert_tflite(backend.quantization, args.output or backend.path, args.calibration)
+    print(f"✅ Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Lazy, per-feature loading of heavy dependencies.
+
+Each tool registers a loader for the modules and models it needs. Nothing is
+imported until the first request that uses it (or an optional background
+warmup), so a fresh worker can answer /api/health and /api/chat without first
+paying for TensorFlow. Load timings are kept for the startup report.
+"""
+import os
+import threading
+import time
+import traceback
+
+
+class LazyResource:
+    """A value built on first use, exactly once, from a loader function"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+        self.load_ms = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        """Return the resource, loading it if this is the first call"""
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                started = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    # Leave it unloaded so the next request can retry
+                    self.error = str(e)
+                    raise
+                finally:
+                    self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+                self.error = None
+                self._loaded = True
+                print(f"📦 Loaded {self.name} in {self.load_ms:.0f} ms")
+        return self._value
+
+    def override(self, value):
+        """Install a ready-made value instead of loading (stubs for benchmarks)"""
+        with self._lock:
+            self._value = value
+            self._loaded = True
+            self.error = None
+
+    def status(self):
+        return {
+            'loaded': self._loaded,
+            'load_ms': self.load_ms,
+            'error': self.error
+        }
+
+
+class ResourceRegistry:
+    """Named lazy resources plus the timings for the startup report"""
+
+    def __init__(self):
+        self._resources = {}
+        self.boot_started = time.perf_counter()
+        self.boot_ms = None
+        self.warmup_ms = None
+
+    def register(self, name, loader):
+        resource = LazyResource(name, loader)
+        self._resources[name] = resource
+        return resource
+
+    def mark_ready(self):
+        """Record how long the app module took to import"""
+        self.boot_ms = round((time.perf_counter() - self.boot_started) * 1000, 1)
+        return self.boot_ms
+
+    def warmup(self, names=None, background=True):
+        """Load the given resources (all of them if names is None)"""
+        if names is None:
+            targets = list(self._resources.values())
+        else:
+            targets = [self._resources[n] for n in names if n in self._resources]
+
+        def run():
+            started = time.perf_counter()
+            for resource in targets:
+                try:
+                    resource.get()
+                except Exception:
+                    print(f"⚠️ Warmup failed for {resource.name}")
+                    traceback.print_exc()
+            self.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+            print(f"🔥 Warmup finished in {self.warmup_ms:.0f} ms")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="resource-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def warmup_from_env(self, var="WARMUP_RESOURCES"):
+        """Start a background warmup if configured, e.g. WARMUP_RESOURCES=all"""
+        value = os.getenv(var, "").strip()
+        if not value:
+            return None
+        if value.lower() == "all":
+            return self.warmup()
+        return self.warmup([n.strip() for n in value.split(",") if n.strip()])
+
+    def report(self):
+        return {
+            'boot_ms': self.boot_ms,
+            'warmup_ms': self.warmup_ms,
+            'resources': {name: r.status() for name, r in self._resources.items()}
+        }
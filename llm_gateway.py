@@ -0,0 +1,508 @@
+"""One gateway for every Gemini call.
+
+The gateway reuses model objects, gives each call a deadline, retries
+transient failures with jittered exponential backoff and keeps a circuit
+breaker per model. Only upstream trouble (timeouts, connection errors, 429
+and 5xx, see `is_transient`) is retried, moves on to a fallback model or
+counts against a breaker; errors caused by the request itself (a blocked
+prompt, a reply without text, a 4xx) go straight back to the caller, so one
+client's bad prompts can't open the breakers for everyone. While a model's breaker is open, requests skip it
+immediately (e.g. chat goes straight to the basic model when search grounding
+is broken). A background probe closes the breaker again once the model
+answers. Optional hedging sends a second copy of a slow call and takes
+whichever finishes first.
+
+`agenerate` / `achat` are the asyncio versions used by the async serving mode
+(asgi_app.py): same breakers, retries, hedging and stats, but the waiting
+happens on the event loop instead of occupying a thread.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import request_metrics
+
+
+class LLMUnavailable(Exception):
+    """Every candidate model is failing (breakers open) or errored"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds, for the Retry-After header
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The call did not finish before its deadline"""
+
+
+def is_transient(error):
+    """Upstream trouble worth a retry and a breaker count, rather than the request's own fault"""
+    if isinstance(error, OSError):  # TimeoutError, ConnectionError, socket errors
+        return True
+    # google.api_core errors carry the HTTP status: 429 ResourceExhausted, 5xx ServiceUnavailable, ...
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures; closed again by a probe"""
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_error = None
+
+    def allow(self):
+        if self.state == 'closed':
+            return True
+        with self._lock:
+            self.skipped += 1
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state != 'closed':
+                print(f"✅ Circuit for {self.name} model closed")
+            self.state = 'closed'
+            self.opened_at = None
+
+    def record_failure(self, error):
+        """Returns True when this failure opened the breaker"""
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.state == 'closed' and self.consecutive_failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.time()
+                print(f"🔌 Circuit for {self.name} model opened: {str(error)}")
+                return True
+        return False
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'opened_at': self.opened_at,
+            'successes': self.successes,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_error': self.last_error
+        }
+
+
+class _Unlimited:
+    """Slot handed out when the gateway has no concurrency gate"""
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class LLMGateway:
+    """Deadline-, retry- and breaker-aware access to named Gemini models.
+
+    `models` maps a name to anything with a `get()` returning the model object
+    (the app passes its lazy resources), so each model is built once. An
+    optional `gate` (admission.ConcurrencyGate) bounds the calls in flight.
+    """
+
+    def __init__(self, models, timeout=None, retries=None, hedge_after_ms=None,
+                 failure_threshold=None, reset_timeout=None, max_workers=32, gate=None):
+        self.models = models
+        self.gate = gate
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+        self.retries = int(os.getenv("LLM_RETRIES", "1")) if retries is None else retries
+        if hedge_after_ms is None:
+            hedge_after_ms = float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+        self.hedge_after = hedge_after_ms / 1000.0
+        failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+        reset_timeout = reset_timeout or float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        self.breakers = {name: CircuitBreaker(name, failure_threshold, reset_timeout) for name in models}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._probing = set()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retried = 0
+        self.hedged = 0
+        self.deadline_exceeded = 0
+
+    # -- single attempts -------------------------------------------------
+
+    def _call(self, fn, deadline):
+        """Run fn(timeout) in the pool, hedging if configured, within deadline"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.deadline_exceeded += 1
+            raise LLMDeadlineExceeded("LLM deadline exceeded")
+        futures = [self._executor.submit(fn, remaining)]
+        if self.hedge_after and self.hedge_after < remaining:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                self.hedged += 1
+                futures.append(self._executor.submit(fn, deadline - time.monotonic()))
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if error is not None:
+            raise error
+        self.deadline_exceeded += 1
+        raise LLMDeadlineExceeded("LLM deadline exceeded")
+
+    def _with_retries(self, name, fn, deadline):
+        """Attempt + retries for one model, feeding its breaker"""
+        breaker = self.breakers[name]
+        attempt = 0
+        while True:
+            try:
+                result = self._call(fn, deadline)
+            except LLMDeadlineExceeded as e:
+                self._failed(name, e)
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    raise  # the request's own fault: no retry, breaker untouched
+                remaining = deadline - time.monotonic()
+                backoff = min(2.0, 0.25 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                if attempt >= self.retries or backoff >= remaining or breaker.state != 'closed':
+                    self._failed(name, e)
+                    raise
+                attempt += 1
+                self.retried += 1
+                print(f"🔁 Retrying {name} model in {backoff:.2f}s: {str(e)}")
+                time.sleep(backoff)
+                continue
+            breaker.record_success()
+            return result
+
+    def _failed(self, name, error):
+        if self.breakers[name].record_failure(error):
+            self._start_probe(name)
+
+    # -- single attempts (asyncio) ---------------------------------------
+
+    async def _acall(self, fn, deadline):
+        """Await fn(timeout), hedging if configured, within deadline"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.deadline_exceeded += 1
+            raise LLMDeadlineExceeded("LLM deadline exceeded")
+        tasks = [asyncio.ensure_future(fn(remaining))]
+        try:
+            if self.hedge_after and self.hedge_after < remaining:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done:
+                    self.hedged += 1
+                    tasks.append(asyncio.ensure_future(fn(deadline - time.monotonic())))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            if error is not None:
+                raise error
+            self.deadline_exceeded += 1
+            raise LLMDeadlineExceeded("LLM deadline exceeded")
+        finally:
+            # Unlike pool threads, the losing hedge / late call can be cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _awith_retries(self, name, fn, deadline):
+        breaker = self.breakers[name]
+        attempt = 0
+        while True:
+            try:
+                result = await self._acall(fn, deadline)
+            except LLMDeadlineExceeded as e:
+                self._failed(name, e)
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                remaining = deadline - time.monotonic()
+                backoff = min(2.0, 0.25 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                if attempt >= self.retries or backoff >= remaining or breaker.state != 'closed':
+                    self._failed(name, e)
+                    raise
+                attempt += 1
+                self.retried += 1
+                print(f"🔁 Retrying {name} model in {backoff:.2f}s: {str(e)}")
+                await asyncio.sleep(backoff)
+                continue
+            breaker.record_success()
+            return result
+
+    # -- background probe ------------------------------------------------
+
+    def _start_probe(self, name):
+        with self._lock:
+            if name in self._probing:
+                return
+            self._probing.add(name)
+        threading.Thread(target=self._probe, args=(name,), name=f"llm-probe-{name}", daemon=True).start()
+
+    def _probe(self, name):
+        breaker = self.breakers[name]
+        try:
+            while breaker.state == 'open':
+                time.sleep(breaker.reset_timeout)
+                try:
+                    model = self.models[name].get()
+                    model.generate_content("ping", request_options={'timeout': min(10.0, self.timeout)})
+                except Exception as e:
+                    breaker.last_error = str(e)
+                    print(f"⚠️ Probe for {name} model failed: {str(e)}")
+                    continue
+                breaker.record_success()
+        finally:
+            with self._lock:
+                self._probing.discard(name)
+
+    # -- public API ------------------------------------------------------
+
+    def _candidates(self, names):
+        allowed = [name for name in names if self.breakers[name].allow()]
+        if not allowed:
+            now = time.time()
+            # The probe retries every reset_timeout seconds after the breaker opened
+            retry_after = min(
+                breaker.reset_timeout - (now - (breaker.opened_at or now)) % breaker.reset_timeout
+                for breaker in (self.breakers[name] for name in names)
+            )
+            raise LLMUnavailable(f"Model temporarily unavailable ({', '.join(names)} failing)",
+                                 retry_after=retry_after)
+        return allowed
+
+    def admit(self):
+        """Reserve an in-flight slot; raises when the gate's queue is full or too slow"""
+        if self.gate is None:
+            return _Unlimited()
+        with request_metrics.phase('llm_queue'):
+            return self.gate.acquire()
+
+    async def admit_async(self):
+        if self.gate is None:
+            return _Unlimited()
+        with request_metrics.phase('llm_queue'):
+            return await self.gate.acquire_async()
+
+    def generate(self, name, prompt, timeout=None):
+        """generate_content on one model; returns the response text"""
+        self._candidates([name])
+        model = self.models[name].get()
+        with self.admit(), request_metrics.phase(f'gemini_{name}'):
+            # The deadline covers the call itself; queueing is bounded by the gate
+            self.calls += 1
+            deadline = time.monotonic() + (timeout or self.timeout)
+            return self._with_retries(
+                name,
+                lambda remaining: model.generate_content(prompt, request_options={'timeout': remaining}).text,
+                deadline
+            )
+
+    def chat(self, names, history, prompt, timeout=None):
+        """Send one chat turn, falling back along `names`; returns (text, model name)"""
+        candidates = self._candidates(names)
+        with self.admit():
+            return self._chat(candidates, history, prompt, timeout)
+
+    def _chat(self, candidates, history, prompt, timeout):
+        self.calls += 1
+        deadline = time.monotonic() + (timeout or self.timeout)
+        last_error = None
+        for index, name in enumerate(candidates):
+            model = self.models[name].get()
+            is_last = index == len(candidates) - 1
+            # Leave a third of the remaining budget for the fallback model
+            model_deadline = deadline if is_last else (
+                time.monotonic() + (deadline - time.monotonic()) * 2 / 3)
+
+            def send(remaining, model=model):
+                session = model.start_chat(history=history)
+                return session.send_message(prompt, request_options={'timeout': remaining}).text
+
+            try:
+                print(f"DEBUG: Attempting chat with {name} model...")
+                # One phase per model, so a search -> basic fallback shows up in Server-Timing
+                with request_metrics.phase(f'gemini_{name}'):
+                    text = self._with_retries(name, send, model_deadline)
+                print(f"✅ Successfully got response from {name} model")
+                return text, name
+            except Exception as e:
+                print(f"⚠️ {name} model failed: {str(e)}")
+                if not is_transient(e):
+                    raise  # the fallback model would reject the same prompt
+                last_error = e
+        raise last_error
+
+    async def agenerate(self, name, prompt, timeout=None):
+        """generate_content_async on one model; returns the response text"""
+        self._candidates([name])
+        model = self.models[name].get()
+
+        async def send(remaining):
+            response = await model.generate_content_async(prompt, request_options={'timeout': remaining})
+            return response.text
+
+        with await self.admit_async(), request_metrics.phase(f'gemini_{name}'):
+            self.calls += 1
+            deadline = time.monotonic() + (timeout or self.timeout)
+            return await self._awith_retries(name, send, deadline)
+
+    async def achat(self, names, history, prompt, timeout=None):
+        """Async chat turn with the same fallback as chat(); returns (text, model name)"""
+        candidates = self._candidates(names)
+        with await self.admit_async():
+            return await self._achat(candidates, history, prompt, timeout)
+
+    async def _achat(self, candidates, history, prompt, timeout):
+        self.calls += 1
+        deadline = time.monotonic() + (timeout or self.timeout)
+        last_error = None
+        for index, name in enumerate(candidates):
+            model = self.models[name].get()
+            is_last = index == len(candidates) - 1
+            model_deadline = deadline if is_last else (
+                time.monotonic() + (deadline - time.monotonic()) * 2 / 3)
+
+            async def send(remaining, model=model):
+                session = model.start_chat(history=history)
+                response = await session.send_message_async(prompt, request_options={'timeout': remaining})
+                return response.text
+
+            try:
+                with request_metrics.phase(f'gemini_{name}'):
+                    text = await self._awith_retries(name, send, model_deadline)
+                return text, name
+            except Exception as e:
+                print(f"⚠️ {name} model failed: {str(e)}")
+                if not is_transient(e):
+                    raise
+                last_error = e
+        raise last_error
+
+    def stream_chat(self, names, history, prompt, timeout=None, slot=None):
+        """Yield (model name, text chunk) pairs, falling back until a chunk is sent.
+
+        Pass a `slot` from admit() to be rejected before the response starts;
+        otherwise one is reserved on the first iteration. Either way it is
+        released when the stream ends.
+        """
+        candidates = self._candidates(names)
+        with slot or self.admit():
+            yield from self._stream_chat(candidates, history, prompt, timeout)
+
+    def _stream_chat(self, candidates, history, prompt, timeout):
+        self.calls += 1
+        deadline = time.monotonic() + (timeout or self.timeout)
+        for index, name in enumerate(candidates):
+            sent = False
+            try:
+                session = self.models[name].get().start_chat(history=history)
+                response = session.send_message(
+                    prompt, stream=True,
+                    request_options={'timeout': max(0.1, deadline - time.monotonic())})
+                for chunk in response:
+                    if time.monotonic() > deadline:
+                        self.deadline_exceeded += 1
+                        raise LLMDeadlineExceeded("LLM deadline exceeded")
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue  # chunk without text parts (e.g. grounding metadata)
+                    if text:
+                        sent = True
+                        yield name, text
+            except Exception as e:
+                print(f"⚠️ Streaming with {name} model failed: {str(e)}")
+                if not is_transient(e):
+                    raise
+                self._failed(name, e)
+                # Once tokens have reached the client we can't restart on another model
+                if sent or index == len(candidates) - 1:
+                    raise
+                continue
+            self.breakers[name].record_success()
+            return
+
+    async def astream_chat(self, names, history, prompt, timeout=None, slot=None):
+        """Async version of stream_chat() (send_message_async with stream=True)"""
+        candidates = self._candidates(names)
+        with slot or await self.admit_async():
+            self.calls += 1
+            deadline = time.monotonic() + (timeout or self.timeout)
+            for index, name in enumerate(candidates):
+                sent = False
+                try:
+                    session = self.models[name].get().start_chat(history=history)
+                    response = await session.send_message_async(
+                        prompt, stream=True,
+                        request_options={'timeout': max(0.1, deadline - time.monotonic())})
+                    async for chunk in response:
+                        if time.monotonic() > deadline:
+                            self.deadline_exceeded += 1
+                            raise LLMDeadlineExceeded("LLM deadline exceeded")
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            continue
+                        if text:
+                            sent = True
+                            yield name, text
+                except Exception as e:
+                    print(f"⚠️ Streaming with {name} model failed: {str(e)}")
+                    if not is_transient(e):
+                        raise
+                    self._failed(name, e)
+                    if sent or index == len(candidates) - 1:
+                        raise
+                    continue
+                self.breakers[name].record_success()
+                return
+
+    def stats(self):
+        return {
+            'timeout_seconds': self.timeout,
+            'retries': self.retries,
+            'hedge_after_ms': self.hedge_after * 1000,
+            'calls': self.calls,
+            'retried': self.retried,
+            'hedged': self.hedged,
+            'deadline_exceeded': self.deadline_exceeded,
+            'breakers': {name: breaker.stats() for name, breaker in self.breakers.items()},
+            'gate': self.gate.stats() if self.gate is not None else None
+        }
@@ -0,0 +1,253 @@
+"""Shared single-process model server for the image classifier.
+
+One dedicated process owns MobileNetV2 and every gunicorn worker talks to it
+over a local socket instead of loading its own copy of TensorFlow. Pixel
+buffers travel through shared memory; only a tiny header (segment name, shape,
+dtype) goes over the socket, so the arrays are never pickled.
+
+Run it next to the API and point both at the same address:
+
+    MODEL_SERVER_ADDRESS=/tmp/spark_model_server.sock python model_server.py
+    MODEL_SERVER_ADDRESS=/tmp/spark_model_server.sock gunicorn app:app
+
+When MODEL_SERVER_ADDRESS is unset or the server is down, the API falls back
+to its in-process model.
+
+Prefer a Unix socket (or named pipe on Windows): only local processes can
+reach it. A TCP address ("host:port") is refused unless MODEL_SERVER_AUTHKEY
+is set explicitly, since the connection handshake is the only thing standing
+between the network and a pickle-speaking socket.
+"""
+import argparse
+import atexit
+import os
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from image_batcher import MicroBatcher
+
+DEFAULT_ADDRESS = "/tmp/spark_model_server.sock" if os.name != "nt" else r"\\.\pipe\spark_model_server"
+
+
+class ModelServerUnavailable(Exception):
+    """Raised when the model server can't be reached; callers fall back"""
+
+
+def parse_address(value):
+    """'host:port' -> (host, port); anything else is a socket/pipe path"""
+    if not value:
+        return None
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and host and not host.startswith("\\"):
+        return (host, int(port))
+    return value
+
+
+def check_address(address):
+    """Refuse a TCP address without an explicit MODEL_SERVER_AUTHKEY"""
+    if isinstance(address, tuple) and not os.getenv("MODEL_SERVER_AUTHKEY"):
+        raise ValueError(f"Model server address {address[0]}:{address[1]} is TCP; "
+                         "set MODEL_SERVER_AUTHKEY or use a Unix socket path")
+    return address
+
+
+def _authkey(address):
+    # The built-in key only ever guards local sockets/pipes (see check_address)
+    key = os.getenv("MODEL_SERVER_AUTHKEY")
+    if not key and isinstance(address, tuple):
+        raise ValueError("MODEL_SERVER_AUTHKEY is required for TCP addresses")
+    return (key or "spark-model-server").encode()
+
+
+def _attach(name):
+    """Attach to a client's segment without adopting ownership of it"""
+    shm = SharedMemory(name=name)
+    try:
+        # The client unlinks its own segments; stop our tracker doing it too
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+class ModelServer:
+    """Accept worker connections and answer predictions from one model"""
+
+    def __init__(self, predict_fn, address=None):
+        self.address = check_address(address or parse_address(os.getenv("MODEL_SERVER_ADDRESS")) or DEFAULT_ADDRESS)
+        # Requests from all workers are batched together before the forward pass
+        self.batcher = MicroBatcher(predict_fn)
+
+    def serve_forever(self):
+        if isinstance(self.address, str) and os.name != "nt" and os.path.exists(self.address):
+            os.unlink(self.address)  # stale socket from a previous run
+        with Listener(self.address, authkey=_authkey(self.address)) as listener:
+            print(f"✅ Model server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"⚠️ Rejected model server connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        shm = None
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+
+                if message[0] == "ping":
+                    conn.send(("ok", None))
+                    continue
+
+                _, name, shape, dtype = message
+                try:
+                    if shm is None or shm.name != name:
+                        if shm is not None:
+                            shm.close()
+                        shm = _attach(name)
+                    # One local memcpy out of the segment (the batcher may hold
+                    # on to its inputs after we reply); nothing is pickled
+                    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+                    batch = view.copy()
+                    del view
+                    futures = [self.batcher.submit(image) for image in batch]
+                    preds = np.concatenate([f.result() for f in futures])
+                    conn.send(("ok", preds))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+        finally:
+            if shm is not None:
+                shm.close()
+            conn.close()
+
+
+class ModelServerClient:
+    """Per-worker handle on the model server, safe to call from many threads"""
+
+    def __init__(self, address=None, retry_interval=5.0, timeout=30.0):
+        if address is None:
+            address = parse_address(os.getenv("MODEL_SERVER_ADDRESS"))
+        self.address = check_address(address)
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._segments = {}  # segment -> pid that created it
+        self._down_until = 0.0
+        self.calls = 0
+        self.fallbacks = 0
+        atexit.register(self.close)
+
+    @property
+    def enabled(self):
+        return self.address is not None
+
+    @property
+    def available(self):
+        return self.enabled and time.monotonic() >= self._down_until
+
+    def _connection(self, nbytes):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Fresh process after fork: never share a socket with the parent
+            local.pid, local.conn, local.shm = os.getpid(), None, None
+        if local.conn is None:
+            local.conn = Client(self.address, authkey=_authkey(self.address))
+        if local.shm is None or local.shm.size < nbytes:
+            self._release(local.shm)
+            local.shm = SharedMemory(create=True, size=max(nbytes, 1))
+            with self._lock:
+                self._segments[local.shm] = os.getpid()
+        return local.conn, local.shm
+
+    def _release(self, shm):
+        if shm is None:
+            return
+        with self._lock:
+            self._segments.pop(shm, None)
+        try:
+            shm.close()
+            shm.unlink()
+        except Exception:
+            pass
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def predict(self, batch):
+        """Run a preprocessed (N, H, W, C) batch on the server"""
+        if not self.available:
+            self.fallbacks += 1
+            raise ModelServerUnavailable("model server not available")
+
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        try:
+            conn, shm = self._connection(batch.nbytes)
+            np.ndarray(batch.shape, dtype=batch.dtype, buffer=shm.buf)[...] = batch
+            conn.send(("predict", shm.name, batch.shape, batch.dtype.str))
+            if not conn.poll(self.timeout):
+                raise TimeoutError("model server did not answer in time")
+            status, payload = conn.recv()
+        except (OSError, EOFError, TimeoutError) as e:
+            self._drop_connection()
+            self._down_until = time.monotonic() + self.retry_interval
+            self.fallbacks += 1
+            print(f"⚠️ Model server unreachable, using in-process model: {str(e)}")
+            raise ModelServerUnavailable(str(e)) from e
+
+        self.calls += 1
+        if status != "ok":
+            raise RuntimeError(f"Model server error: {payload}")
+        return payload
+
+    def close(self):
+        with self._lock:
+            # Only unlink what this process created, never a forked parent's
+            segments = [shm for shm, pid in self._segments.items() if pid == os.getpid()]
+        for shm in segments:
+            self._release(shm)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'address': str(self.address) if self.enabled else None,
+            'available': self.available,
+            'calls': self.calls,
+            'fallbacks': self.fallbacks
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared MobileNetV2 model server")
+    parser.add_argument("--address", default=None,
+                        help="socket path, or host:port with $MODEL_SERVER_AUTHKEY set (default: $MODEL_SERVER_ADDRESS)")
+    parser.add_argument("--backend", default=None,
+                        help="inference backend (default: $IMAGE_BACKEND)")
+    args = parser.parse_args()
+
+    from inference_backends import load_backend
+
+    print("⏳ Loading MobileNetV2...")
+    backend = load_backend(args.backend)
+    server = ModelServer(backend.predict, address=parse_address(args.address))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Streaming, bounded PDF text extraction.
+
+Pages are produced by a generator and assembled with a single join, and every
+extraction runs under byte, page and wall-clock limits so one huge upload
+can't hold a worker indefinitely. Large documents can optionally be split into
+page ranges and extracted in a process pool (PDF_WORKERS > 0).
+"""
+import io
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+MAX_SECONDS = float(os.getenv("PDF_MAX_SECONDS", "20"))
+WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PAGE_BREAK = "\f"  # between pages, so headers/footers can be recognised later
+
+
+class PDFLimitError(Exception):
+    """The upload exceeded a size, page or time limit"""
+
+
+def _reader(data):
+    import PyPDF2
+    return PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def iter_pdf_pages(reader, start=0, stop=None, deadline=None):
+    """Yield the text of pages [start, stop), checking the deadline per page"""
+    pages = reader.pages
+    stop = len(pages) if stop is None else min(stop, len(pages))
+    for index in range(start, stop):
+        if deadline is not None and time.monotonic() > deadline:
+            raise PDFLimitError("PDF text extraction took too long")
+        yield pages[index].extract_text() or ""
+
+
+def _extract_range(data, start, stop):
+    """Process-pool task: text for one page range"""
+    return PAGE_BREAK.join(iter_pdf_pages(_reader(data), start, stop))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def extract_text(data, max_pages=None, max_bytes=None, timeout=None, workers=None):
+    """Extract all page text from PDF bytes under the configured limits"""
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    timeout = MAX_SECONDS if timeout is None else timeout
+    workers = WORKERS if workers is None else workers
+
+    if max_bytes and len(data) > max_bytes:
+        raise PDFLimitError(f"PDF exceeds the upload limit of {max_bytes} bytes")
+
+    deadline = time.monotonic() + timeout if timeout else None
+    reader = _reader(data)
+    num_pages = len(reader.pages)
+    if max_pages and num_pages > max_pages:
+        raise PDFLimitError(f"PDF has {num_pages} pages (limit is {max_pages})")
+
+    if workers and workers > 1 and num_pages >= PARALLEL_MIN_PAGES:
+        chunk = -(-num_pages // workers)  # ceil division
+        pool = _get_pool(workers)
+        futures = [pool.submit(_extract_range, data, start, start + chunk)
+                   for start in range(0, num_pages, chunk)]
+        try:
+            parts = [f.result(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+                     for f in futures]
+        except FutureTimeout:
+            for f in futures:
+                f.cancel()
+            raise PDFLimitError("PDF text extraction took too long")
+        return PAGE_BREAK.join(parts) + "\n"
+
+    return PAGE_BREAK.join(iter_pdf_pages(reader, deadline=deadline)) + "\n"
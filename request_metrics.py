@@ -0,0 +1,206 @@
+"""Per-request phase timing, Server-Timing headers and Prometheus metrics.
+
+Code marks the interesting parts of a request with
+
+    with request_metrics.phase('pdf_extract'):
+        ...
+
+Each request's phases go back to the client in a `Server-Timing` header and
+into per-process latency histograms and counters, served in the Prometheus
+text format at /api/metrics. With METRICS_ENABLED=0 no hooks are installed
+and `phase()` returns a shared no-op context manager, so the cost is one
+ContextVar lookup per phase.
+
+Each gunicorn worker keeps its own numbers; Prometheus sees whichever worker
+answers the scrape (sum the series per instance when running several).
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar('request_timer', default=None)
+_noop = nullcontext()
+
+
+class RequestTimer:
+    """Phases recorded during one request, in the order they started"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Repeated phases (retries, several uploads) add up
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(parts)
+
+
+def phase(name):
+    """Time a block as part of the current request (no-op outside requests)"""
+    timer = _current.get()
+    return timer.phase(name) if timer is not None else _noop
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+
+
+def _labels(names, values):
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+class Metrics:
+    """Counters, histograms and scrape-time callbacks rendered as Prometheus text"""
+
+    def __init__(self, prefix='spark'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.requests = {}   # (endpoint, method, status) -> count
+        self.durations = {}  # endpoint -> _Histogram
+        self.phases = {}     # (endpoint, phase) -> _Histogram
+        self._callbacks = []  # (name, help, labels, kind, fn)
+
+    def observe_request(self, endpoint, method, status, seconds, phases):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.durations.setdefault(endpoint, _Histogram()).observe(seconds)
+            for name, phase_seconds in phases.items():
+                self.phases.setdefault((endpoint, name), _Histogram()).observe(phase_seconds)
+
+    def callback(self, name, help_text, fn, labels=(), kind='gauge'):
+        """Register a value read at scrape time; fn returns a number or {label values: number}"""
+        self._callbacks.append((name, help_text, tuple(labels), kind, fn))
+
+    def _histogram_lines(self, name, label_names, series):
+        lines = []
+        for label_values, histogram in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                labels = _labels(label_names + ('le',), label_values + (bound,))
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _labels(label_names, label_values)
+            lines.append(f"{name}_sum{labels} {histogram.total:.6f}")
+            lines.append(f"{name}_count{labels} {histogram.count}")
+        return lines
+
+    def render(self):
+        p = self.prefix
+        with self._lock:
+            requests = dict(self.requests)
+            durations = {(endpoint,): h for endpoint, h in self.durations.items()}
+            phases = dict(self.phases)
+            lines = [
+                f"# HELP {p}_http_requests_total HTTP requests by endpoint, method and status.",
+                f"# TYPE {p}_http_requests_total counter",
+            ]
+            lines += [f"{p}_http_requests_total{_labels(('endpoint', 'method', 'status'), key)} {count}"
+                      for key, count in sorted(requests.items())]
+            lines += [
+                f"# HELP {p}_http_request_duration_seconds Time until the response headers were ready.",
+                f"# TYPE {p}_http_request_duration_seconds histogram",
+            ]
+            lines += self._histogram_lines(f"{p}_http_request_duration_seconds", ('endpoint',), durations)
+            lines += [
+                f"# HELP {p}_request_phase_duration_seconds Time spent in each phase of a request.",
+                f"# TYPE {p}_request_phase_duration_seconds histogram",
+            ]
+            lines += self._histogram_lines(f"{p}_request_phase_duration_seconds", ('endpoint', 'phase'), phases)
+
+        for name, help_text, label_names, kind, fn in self._callbacks:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines += [f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}"]
+            if isinstance(value, dict):
+                for label_values, number in sorted(value.items()):
+                    if not isinstance(label_values, tuple):
+                        label_values = (label_values,)
+                    lines.append(f"{p}_{name}{_labels(label_names, label_values)} {float(number)}")
+            else:
+                lines.append(f"{p}_{name} {float(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def begin_request():
+    """Start timing a request in the current context; returns a token for end_request"""
+    return _current.set(RequestTimer())
+
+
+def end_request(token, endpoint, method, status):
+    """Record the request started with `token`; returns its Server-Timing value"""
+    timer = _current.get()
+    _current.reset(token)
+    if timer is None:
+        return None
+    total = timer.elapsed()
+    metrics.observe_request(endpoint, method, status, total, timer.phases)
+    return timer.server_timing(total)
+
+
+def init_app(app, enabled=None):
+    """Install the per-request hooks (nothing at all when disabled)"""
+    enabled = ENABLED if enabled is None else enabled
+    if not enabled:
+        return False
+    from flask import request
+
+    @app.before_request
+    def _start_timer():
+        request.environ['spark.timer_token'] = begin_request()
+
+    @app.after_request
+    def _record(response):
+        timer = _current.get()
+        if timer is None:
+            return response
+        total = timer.elapsed()
+        response.headers['Server-Timing'] = timer.server_timing(total)
+        response.headers['Timing-Allow-Origin'] = '*'  # let the cross-origin frontend read it
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe_request(endpoint, request.method, response.status_code, total, timer.phases)
+        return response
+
+    @app.teardown_request
+    def _stop_timer(exc):
+        token = request.environ.pop('spark.timer_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    return True
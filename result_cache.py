@@ -0,0 +1,407 @@
+"""Bounded LRU + TTL result caches with memory, on-disk and SQLite backends.
+
+`ResultCache` maps string keys to JSON-serializable values. Backends only
+store `(expires_at, value)` pairs and enforce the size bound; expiry and the
+hit/miss counters live in the cache itself so every backend reports the same
+numbers. `ImageResultCache` adds content addressing for uploads plus an
+optional perceptual-hash tier that also matches re-encoded copies, and
+`ResumeReviewCache` pairs an extracted-text level with a parsed-review level.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def default_cache_dir(name):
+    """Writable cache directory (/tmp on Spaces, like the contact fallback)"""
+    base = '/tmp/spark_cache' if os.name != 'nt' else os.path.join('data', 'cache')
+    return os.path.join(base, name)
+
+
+class MemoryBackend:
+    """In-process LRU store"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max(1, max_entries)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, expires_at, value):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskBackend:
+    """One JSON file per key; file mtime doubles as the LRU clock.
+
+    Several gunicorn workers can share the directory. Writes are atomic
+    (temp file + rename) and the size bound is approximate across processes.
+    """
+
+    def __init__(self, directory, max_entries=10000):
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._count = sum(1 for name in os.listdir(directory) if name.endswith('.json'))
+
+    def _path(self, key):
+        # Keys are file names inside the directory, never paths
+        if not key or key in ('.', '..') or os.sep in key or (os.altsep and os.altsep in key):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return entry['expires_at'], entry['value']
+
+    def set(self, key, expires_at, value):
+        path = self._path(key)
+        is_new = not os.path.exists(path)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': expires_at, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._lock:
+            if is_new:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Drop the least recently used files down to 90% of the bound"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    pass
+        entries.sort()
+        target = int(self.max_entries * 0.9)
+        excess = len(entries) - target
+        for _, path in entries[:max(0, excess)]:
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except OSError:
+                pass
+        self._count = min(len(entries), target)
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+            with self._lock:
+                self._count = max(0, self._count - 1)
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        with self._lock:
+            self._count = 0
+
+    def __len__(self):
+        return self._count
+
+
+class SQLiteBackend:
+    """Entries in a table of the local SQLite database, shared by all workers"""
+
+    def __init__(self, namespace, max_entries=10000, path=None):
+        from storage import default_db_path
+
+        self.namespace = namespace
+        self.path = path or default_db_path()
+        self.max_entries = max(1, max_entries)
+        self.evictions = 0
+        with self._db() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                expires_at REAL,
+                used_at REAL NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )''')
+            db.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, used_at)')
+
+    def _db(self):
+        from storage import sqlite_connection
+        return sqlite_connection(self.path)
+
+    def get(self, key):
+        with self._db() as db:
+            row = db.execute(
+                'SELECT expires_at, value FROM cache_entries WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE cache_entries SET used_at = ? WHERE namespace = ? AND key = ?',
+                       (time.time(), self.namespace, key))
+        return row[0], json.loads(row[1])
+
+    def set(self, key, expires_at, value):
+        with self._db() as db:
+            db.execute(
+                '''INSERT INTO cache_entries (namespace, key, expires_at, used_at, value)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (namespace, key) DO UPDATE SET
+                       expires_at = excluded.expires_at, used_at = excluded.used_at, value = excluded.value''',
+                (self.namespace, key, expires_at, time.time(), json.dumps(value))
+            )
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                db.execute(
+                    '''DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                           SELECT key FROM cache_entries WHERE namespace = ? ORDER BY used_at LIMIT ?)''',
+                    (self.namespace, self.namespace, excess)
+                )
+                self.evictions += excess
+
+    def delete(self, key):
+        with self._db() as db:
+            db.execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def clear(self):
+        with self._db() as db:
+            db.execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+
+    def __len__(self):
+        return self._db().execute(
+            'SELECT COUNT(*) FROM cache_entries WHERE namespace = ?', (self.namespace,)
+        ).fetchone()[0]
+
+
+def make_backend(kind, name, max_entries):
+    """Build a backend from config ('memory', 'disk', 'sqlite' or 'off')"""
+    kind = (kind or 'memory').lower()
+    if kind in ('off', 'none', '0', 'false'):
+        return None
+    if kind == 'disk':
+        return DiskBackend(default_cache_dir(name), max_entries)
+    if kind == 'sqlite':
+        return SQLiteBackend(name, max_entries)
+    return MemoryBackend(max_entries)
+
+
+class ResultCache:
+    """LRU + TTL cache with hit/miss/eviction counters"""
+
+    def __init__(self, backend, ttl=86400):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get(self, key):
+        if self.backend is None:
+            return None
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count('misses')
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.time():
+            self.backend.delete(key)
+            self._count('expirations')
+            self._count('misses')
+            return None
+        self._count('hits')
+        return value
+
+    def set(self, key, value, ttl=None):
+        if self.backend is None:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        try:
+            self.backend.set(key, expires_at, value)
+        except Exception as e:
+            print(f"⚠️ Failed to write cache entry: {str(e)}")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        if self.backend is None:
+            return {'enabled': False}
+        lookups = self.hits + self.misses
+        return {
+            'enabled': True,
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'max_entries': self.backend.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.backend.evictions,
+            'expirations': self.expirations
+        }
+
+
+def content_key(data, *parts):
+    """SHA-256 of the raw bytes plus any extra key parts"""
+    digest = hashlib.sha256(data)
+    for part in parts:
+        digest.update(b'\0' + str(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def dhash(image, size=8):
+    """64-bit difference hash of a PIL image (robust to re-encoding/resizing)"""
+    from PIL import Image
+
+    gray = image.convert('L').resize((size + 1, size), Image.BILINEAR)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class ImageResultCache(ResultCache):
+    """Classification results keyed by upload bytes, with a perceptual tier.
+
+    Exact lookups need only the raw bytes, so a hit skips decoding entirely.
+    When `perceptual` is on, a miss on the bytes falls back to comparing the
+    decoded image's dHash against recent entries (Hamming distance <=
+    `max_distance`), which catches re-saved or re-compressed copies.
+    """
+
+    def __init__(self, backend, ttl=86400, perceptual=False, max_distance=4):
+        super().__init__(backend, ttl)
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self._phashes = OrderedDict()  # (phash, top) -> exact key
+        self.perceptual_hits = 0
+
+    def key(self, data, top):
+        return content_key(data, 'top', top)
+
+    def lookup_similar(self, image, top):
+        """Perceptual-tier lookup; returns (value, phash)"""
+        if self.backend is None or not self.perceptual:
+            return None, None
+        phash = dhash(image)
+        with self._lock:
+            candidates = list(self._phashes.items())
+        for (other, other_top), key in reversed(candidates):
+            if other_top == top and (phash ^ other).bit_count() <= self.max_distance:
+                entry = self.backend.get(key)
+                if entry is not None and (entry[0] is None or entry[0] >= time.time()):
+                    self._count('perceptual_hits')
+                    return entry[1], phash
+        return None, phash
+
+    def store(self, data, top, value, image=None, phash=None):
+        key = self.key(data, top)
+        self.set(key, value)
+        if self.backend is not None and self.perceptual and (image is not None or phash is not None):
+            if phash is None:
+                phash = dhash(image)
+            with self._lock:
+                self._phashes[(phash, top)] = key
+                self._phashes.move_to_end((phash, top))
+                while len(self._phashes) > self.backend.max_entries:
+                    self._phashes.popitem(last=False)
+
+    def stats(self):
+        stats = super().stats()
+        if self.backend is not None:
+            stats['perceptual'] = self.perceptual
+            stats['perceptual_hits'] = self.perceptual_hits
+        return stats
+
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic differences don't change the key"""
+    return ' '.join((text or '').split())
+
+
+class ResumeReviewCache:
+    """Two-level cache for resume review.
+
+    `texts` maps the uploaded file's hash to its extracted text; `reviews`
+    maps (normalized text, job role, job description, model name) to the
+    parsed `{analysis, ats_score}`. Both levels work without Gemini, so the
+    disk backend doubles as an offline store for testing.
+    """
+
+    def __init__(self, text_backend, review_backend, ttl=604800):
+        self.texts = ResultCache(text_backend, ttl)
+        self.reviews = ResultCache(review_backend, ttl)
+
+    def text_key(self, data):
+        return content_key(data)
+
+    def review_key(self, text, job_role, job_description, model_name):
+        return content_key(
+            normalize_text(text).encode('utf-8'),
+            normalize_text(job_role).lower(),
+            normalize_text(job_description),
+            model_name
+        )
+
+    def stats(self):
+        return {'text': self.texts.stats(), 'review': self.reviews.stats()}
@@ -0,0 +1,182 @@
+"""Bulk resume screening for /api/resume-review/batch.
+
+Uploads are read up front under file-count and byte limits, with per-item
+errors instead of failing the request. Text extraction runs in one thread
+pool and the Gemini reviews in a second, smaller one (RESUME_BATCH_WORKERS).
+Both pools are per worker process and shared by every batch it serves, so
+batch traffic never holds more than that many LLM calls at once per worker;
+each review still goes through the gateway and its concurrency gate. When
+the client goes away (the NDJSON generator is closed), the batch's queued
+extractions and reviews are cancelled so they stop spending Gemini quota. Each resume's
+local ATS score (ats_scorer) is yielded as soon as its text is extracted,
+its review as soon as that finishes, and `ranking` orders the successful
+reviews by ATS score for the final summary line. In fast mode (`score`)
+there is no LLM at all: the texts are extracted in parallel and scored
+against the JD in one matrix operation.
+"""
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pdf_extract
+from spark_core import RESUME_EXTENSIONS
+
+MAX_FILES = int(os.getenv("RESUME_BATCH_MAX_FILES", "50"))
+MAX_TOTAL_BYTES = int(os.getenv("RESUME_BATCH_MAX_TOTAL_BYTES", str(50 * 1024 * 1024)))
+LLM_WORKERS = int(os.getenv("RESUME_BATCH_WORKERS", "4"))
+EXTRACT_WORKERS = int(os.getenv("RESUME_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class ResumeBatchLimitError(Exception):
+    """Too many files or too many bytes in one batch request"""
+
+
+def collect_resumes(files, max_files=None, max_total_bytes=None):
+    """Read uploads into [(filename, bytes or None, error or None)]"""
+    max_files = MAX_FILES if max_files is None else max_files
+    max_total_bytes = MAX_TOTAL_BYTES if max_total_bytes is None else max_total_bytes
+    if max_files and len(files) > max_files:
+        raise ResumeBatchLimitError(f"A batch can contain at most {max_files} resumes")
+    items, total = [], 0
+    for upload in files:
+        filename = upload.filename or ''
+        if not filename.endswith(RESUME_EXTENSIONS):
+            items.append((filename, None, 'Invalid file type. Only PDF and TXT are supported'))
+            continue
+        # One byte past the PDF limit is enough for extraction to reject it
+        data = upload.read(pdf_extract.MAX_BYTES + 1)
+        total += len(data)
+        if max_total_bytes and total > max_total_bytes:
+            raise ResumeBatchLimitError(f"A batch can contain at most {max_total_bytes} bytes of resumes")
+        items.append((filename, data, None))
+    return items
+
+
+class ResumeBatchReviewer:
+    """Extract in one pool, review with at most `workers` concurrent LLM calls"""
+
+    def __init__(self, workers=None, extract_workers=None):
+        self.workers = max(1, workers or LLM_WORKERS)
+        self.extract_workers = max(1, extract_workers or EXTRACT_WORKERS)
+        self._pools = None
+        self._pools_pid = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.items = 0
+        self.reviewed = 0
+        self.cached = 0
+        self.scored = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def _get_pools(self):
+        with self._lock:
+            if self._pools is None or self._pools_pid != os.getpid():
+                self._pools = (ThreadPoolExecutor(self.extract_workers, thread_name_prefix="resume-extract"),
+                               ThreadPoolExecutor(self.workers, thread_name_prefix="resume-review"))
+                self._pools_pid = os.getpid()
+            return self._pools
+
+    def _error(self, index, filename, error):
+        self.errors += 1
+        return {'type': 'result', 'index': index, 'filename': filename, 'success': False, 'error': error}
+
+    def run(self, items, prepare_fn, review_fn):
+        """Yield a 'score' dict per item as soon as it is prepared (when it still
+        needs a review) and one 'result' dict per item, in completion order.
+
+        prepare_fn(filename, data) -> (prompt, key, cached review or None, token report, local score)
+        review_fn(prompt, key) -> {'analysis', 'ats_score'}
+        """
+        self.requests += 1
+        self.items += len(items)
+        extract_pool, review_pool = self._get_pools()
+        pending = {}  # future -> (stage, index, filename, (token report, local score))
+        for index, (filename, data, error) in enumerate(items):
+            if error is not None:
+                yield self._error(index, filename, error)
+                continue
+            pending[extract_pool.submit(prepare_fn, filename, data)] = ('prepare', index, filename, None)
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, index, filename, reports = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        yield self._error(index, filename, str(e))
+                        continue
+                    if stage == 'prepare':
+                        prompt, key, review, *reports = result
+                        if review is None:
+                            pending[review_pool.submit(review_fn, prompt, key)] = ('review', index, filename, reports)
+                            if reports[1] is not None:
+                                yield {'type': 'score', 'index': index, 'filename': filename,
+                                       'local_score': reports[1]}
+                            continue
+                        self.cached += 1
+                        cached = True
+                    else:
+                        review, cached = result, False
+                        self.reviewed += 1
+                    yield {'type': 'result', 'index': index, 'filename': filename, 'success': True,
+                           'ats_score': review['ats_score'], 'analysis': review['analysis'],
+                           'cached': cached, 'prompt_tokens': reports[0], 'local_score': reports[1]}
+        finally:
+            # Client gone (GeneratorExit) or an error: drop this batch's queued work;
+            # calls already running finish, but nothing new is submitted
+            self.cancelled += sum(future.cancel() for future in pending)
+
+    def score(self, items, text_fn, score_fn):
+        """Fast mode: extract every text in parallel, then score them all in one call.
+
+        text_fn(filename, data) -> text; score_fn(texts) -> [local score]
+        Yields one 'result' dict per item, in upload order.
+        """
+        self.requests += 1
+        self.items += len(items)
+        extract_pool, _ = self._get_pools()
+        futures = [None if error is not None else extract_pool.submit(text_fn, filename, data)
+                   for filename, data, error in items]
+        texts, errors = {}, {}
+        for index, ((filename, _, error), future) in enumerate(zip(items, futures)):
+            if future is None:
+                errors[index] = error
+                continue
+            try:
+                texts[index] = future.result()
+            except Exception as e:
+                errors[index] = str(e)
+        scores = dict(zip(texts, score_fn(list(texts.values()))))
+        self.scored += len(scores)
+        for index, (filename, _, _) in enumerate(items):
+            if index in errors:
+                yield self._error(index, filename, errors[index])
+                continue
+            local_score = scores[index]
+            yield {'type': 'result', 'index': index, 'filename': filename, 'success': True,
+                   'ats_score': local_score['score'] if local_score else None, 'analysis': None,
+                   'cached': False, 'local_score': local_score}
+
+    def stats(self):
+        return {
+            'llm_workers': self.workers,
+            'extract_workers': self.extract_workers,
+            'requests': self.requests,
+            'items': self.items,
+            'reviewed': self.reviewed,
+            'cached': self.cached,
+            'scored': self.scored,
+            'errors': self.errors,
+            'cancelled': self.cancelled
+        }
+
+
+def ranking(results):
+    """Successful results by ATS score, best first (ties keep upload order)"""
+    ranked = sorted((r for r in results if r['type'] == 'result' and r['success'] and r['ats_score'] is not None),
+                    key=lambda r: (-r['ats_score'], r['index']))
+    return [{'rank': rank, 'index': r['index'], 'filename': r['filename'], 'ats_score': r['ats_score']}
+            for rank, r in enumerate(ranked, start=1)]
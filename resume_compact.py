@@ -0,0 +1,222 @@
+"""Token-aware compaction of resume and job description text for the prompt.
+
+Extracted PDF text carries a lot that costs tokens without telling the model
+anything: runs of spaces, hyphenated line breaks, page numbers, the name and
+contact line repeated as a header or footer on every page, and boilerplate
+("References available upon request") pasted more than once. `compact_resume`
+
+1. normalizes the text (NFKC, whitespace runs, soft hyphens, blank lines),
+2. drops page numbers and header/footer lines that repeat at the top or
+   bottom of most pages (pages are separated by pdf_extract.PAGE_BREAK),
+3. drops repeated long lines / boilerplate after their first occurrence,
+4. and, if the result is still over RESUME_TOKEN_BUDGET, truncates by section:
+   short sections (contact header, summary, education) stay, then experience
+   and skills are kept first, then projects and certifications; hobbies and
+   references are the first to go.
+
+Job descriptions get the same clean-up and are cut to JD_TOKEN_BUDGET.
+Token counts use the same ~4 characters per token estimate as chat_sessions.
+"""
+import math
+import os
+import re
+import unicodedata
+
+from chat_sessions import estimate_tokens
+from pdf_extract import PAGE_BREAK
+
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "2500"))
+JD_TOKEN_BUDGET = int(os.getenv("JD_TOKEN_BUDGET", "800"))
+MIN_DUPLICATE_CHARS = 30  # shorter lines ("Python", "2019 - 2021") may legitimately repeat
+TRUNCATION_MARK = "[...]"
+
+# Section headings -> keep priority (lower is kept first when over budget)
+SECTION_PRIORITY = {
+    'experience': 0, 'work experience': 0, 'professional experience': 0, 'employment': 0,
+    'employment history': 0, 'work history': 0, 'internships': 0, 'internship': 0,
+    'skills': 0, 'technical skills': 0, 'core skills': 0, 'key skills': 0, 'core competencies': 0,
+    'summary': 1, 'professional summary': 1, 'profile': 1, 'objective': 1, 'career objective': 1, 'about me': 1,
+    'projects': 2, 'personal projects': 2, 'key projects': 2, 'education': 2, 'certifications': 2,
+    'certificates': 2, 'achievements': 2, 'awards': 2, 'publications': 2,
+    'languages': 3, 'volunteering': 3, 'volunteer experience': 3, 'activities': 3,
+    'extracurricular activities': 3, 'leadership': 3,
+    'interests': 4, 'hobbies': 4, 'hobbies and interests': 4, 'references': 4, 'declaration': 4,
+    'personal details': 4, 'personal information': 4,
+}
+HEADER_PRIORITY = 1  # name / contact lines before the first heading
+EDGE_LINES = 3  # lines at the top and bottom of a page that may be header/footer
+SMALL_SECTION_SHARE = 0.05  # header, summary, education: cheap enough to always keep
+
+_SPACES = re.compile(r'[ \t\u00a0\u2000-\u200b\u202f\u205f\u3000]+')
+_CONTROL = re.compile(r'[\x00-\x08\x0b\x0e-\x1f\x7f\u00ad\ufeff\ufffd]')
+_HYPHEN_BREAK = re.compile(r'(?<=[a-z])-\n(?=[a-z])')
+_PAGE_NUMBER = re.compile(r'^(page\s*)?[-–—(\[]?\s*\d{1,3}\s*[-–—)\]]?(\s*(of|/)\s*\d{1,3})?$', re.IGNORECASE)
+_DIGITS = re.compile(r'\d+')
+
+
+def normalize(text):
+    """Unicode/whitespace clean-up; keeps page breaks and line structure"""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = _CONTROL.sub('', text)
+    text = _HYPHEN_BREAK.sub('', text)
+    pages = []
+    for page in text.split(PAGE_BREAK):
+        lines = [_SPACES.sub(' ', line).strip() for line in page.split('\n')]
+        # Lines without a letter or digit are rules, bullets on their own, etc.
+        pages.append([line for line in lines if any(c.isalnum() for c in line)])
+    return pages
+
+
+def _line_key(line):
+    # "Page 2 of 3" and "Page 3 of 3" count as the same repeated line
+    return _DIGITS.sub('#', line.lower())
+
+
+def drop_page_furniture(pages):
+    """Remove page numbers and repeated headers/footers; returns (lines, dropped)"""
+    dropped = 0
+    repeated = set()
+    if len(pages) > 1:
+        seen_on = {}
+        for page in pages:
+            edges = page[:EDGE_LINES] + page[-EDGE_LINES:]
+            for key in {_line_key(line) for line in edges}:
+                seen_on[key] = seen_on.get(key, 0) + 1
+        threshold = max(2, math.ceil(len(pages) / 2))
+        repeated = {key for key, count in seen_on.items() if count >= threshold}
+    lines = []
+    kept_repeated = set()
+    for page in pages:
+        edges = set(page[:EDGE_LINES] + page[-EDGE_LINES:])
+        for line in page:
+            if _PAGE_NUMBER.match(line):
+                dropped += 1
+                continue
+            key = _line_key(line)
+            if key in repeated and line in edges:
+                # Keep the first copy: on page 1 the name/contact header is content
+                if key in kept_repeated:
+                    dropped += 1
+                    continue
+                kept_repeated.add(key)
+            lines.append(line)
+    return lines, dropped
+
+
+def drop_duplicates(lines):
+    """Drop exact repeats of long lines (pasted boilerplate); returns (lines, dropped)"""
+    seen = set()
+    kept = []
+    for line in lines:
+        if len(line) >= MIN_DUPLICATE_CHARS:
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return kept, len(lines) - len(kept)
+
+
+def _heading(line):
+    """Section name if the line is a heading ("WORK EXPERIENCE", "Skills:")"""
+    if len(line) > 40:
+        return None
+    name = re.sub(r'[^a-z& ]', '', line.lower().replace('&', ' and ')).strip()
+    name = re.sub(r'\s+', ' ', name)
+    return name if name in SECTION_PRIORITY else None
+
+
+def split_sections(lines):
+    """[(name, priority, lines)] in document order; text before a heading is 'header'"""
+    sections = [['header', HEADER_PRIORITY, []]]
+    for line in lines:
+        name = _heading(line)
+        if name is not None:
+            sections.append([name, SECTION_PRIORITY[name], [line]])
+        else:
+            sections[-1][2].append(line)
+    return [tuple(section) for section in sections if section[2]]
+
+
+def _tokens(lines):
+    return estimate_tokens('\n'.join(lines))
+
+
+def _take(lines, budget):
+    """Leading lines that fit in `budget` tokens"""
+    kept, used = [], 0
+    for line in lines:
+        cost = (len(line) + 1) / 4  # same rate as estimate_tokens, newline included
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+
+def truncate_sections(lines, budget):
+    """Fit `lines` into `budget` tokens by section priority; returns (lines, truncated names)"""
+    sections = split_sections(lines)
+    allowed = [None] * len(sections)
+    remaining = budget
+    for i, (_, priority, section_lines) in enumerate(sections):
+        size = _tokens(section_lines)
+        if priority <= 2 and size <= budget * SMALL_SECTION_SHARE:
+            allowed[i] = section_lines
+            remaining -= size
+    for priority in sorted({section[1] for section in sections}):
+        members = [i for i, section in enumerate(sections) if section[1] == priority and allowed[i] is None]
+        need = sum(_tokens(sections[i][2]) for i in members)
+        if need <= remaining:
+            for i in members:
+                allowed[i] = sections[i][2]
+            remaining -= need
+            continue
+        # Not enough for the whole tier: split what is left in proportion to size
+        for i in members:
+            share = max(0, remaining) * _tokens(sections[i][2]) / need
+            allowed[i] = _take(sections[i][2], share)
+        remaining = 0
+
+    kept, truncated = [], []
+    for (name, _, section_lines), keep in zip(sections, allowed):
+        keep = keep or []
+        if len(keep) < len(section_lines):
+            truncated.append(name)
+            if keep:
+                keep = keep + [TRUNCATION_MARK]
+        kept.extend(keep)
+    return kept, truncated
+
+
+def compact(text, budget, sections=True):
+    """Compact `text` to at most ~`budget` tokens; returns (text, report dict)"""
+    before = estimate_tokens(text)
+    lines, furniture = drop_page_furniture(normalize(text))
+    lines, duplicates = drop_duplicates(lines)
+    truncated = []
+    if budget and _tokens(lines) > budget:
+        if sections:
+            lines, truncated = truncate_sections(lines, budget)
+        else:
+            kept = _take(lines, budget)
+            truncated = ['text'] if len(kept) < len(lines) else []
+            lines = kept + ([TRUNCATION_MARK] if truncated and kept else [])
+    result = '\n'.join(lines)
+    return result, {
+        'tokens_before': before,
+        'tokens_after': estimate_tokens(result),
+        'lines_dropped': furniture + duplicates,
+        'truncated_sections': truncated
+    }
+
+
+def compact_resume(text, budget=None):
+    return compact(text, RESUME_TOKEN_BUDGET if budget is None else budget)
+
+
+def compact_job_description(text, budget=None):
+    if not text:
+        return '', {'tokens_before': 0, 'tokens_after': 0, 'lines_dropped': 0, 'truncated_sections': []}
+    return compact(text, JD_TOKEN_BUDGET if budget is None else budget, sections=False)
@@ -0,0 +1,128 @@
+"""Framework-free resume and image helpers shared by the Flask API and the Streamlit apps.
+
+app.py, `AI_ResumeCritiquer final_no_theme.py` and `ImageClassifier.py` all
+extract resume text, build and parse the review prompt, and preprocess and
+label images for MobileNetV2. Those steps live here, once, with no state and
+no Flask or Streamlit imports; models and caching stay with the callers
+(lazy resources and result_cache in the API, st.cache_resource and
+st.cache_data in the Streamlit apps). Model calls are passed in as plain
+callables, so the same pipeline runs against the gateway, a bare Gemini
+model or a Keras model.
+"""
+import re
+
+import image_preprocess
+import pdf_extract
+
+RESUME_EXTENSIONS = ('.pdf', '.txt')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class RequestError(Exception):
+    """Invalid client input, with the HTTP status to answer (Flask and async views)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# -- resume review ---------------------------------------------------------
+
+def extract_pdf_text(data):
+    """Extract text from PDF bytes (page/size/time limits in pdf_extract.py)"""
+    try:
+        return pdf_extract.extract_text(data)
+    except pdf_extract.PDFLimitError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+
+
+def extract_resume_text(filename, data, pdf_text=extract_pdf_text):
+    """Text of a PDF or TXT resume upload; RequestError for other types, non-UTF-8 text or empty files"""
+    if filename.endswith('.pdf'):
+        text = pdf_text(data)
+    elif filename.endswith('.txt'):
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            raise RequestError('Resume .txt file must be UTF-8 text')
+    else:
+        raise RequestError('Invalid file type. Only PDF and TXT are supported')
+    if not text.strip():
+        raise RequestError('File does not have any content')
+    return text
+
+
+def build_resume_prompt(file_content, job_role='', job_description=''):
+    """Create prompt for AI analysis"""
+    return f"""You are a brutally honest, zero-fluff recruitment critic and expert resume reviewer. 
+Your goal is to tear apart this resume and give the candidate the harsh truth they need to hear to actually get hired. NO SUGAR-COATING.
+
+Analyze the resume for the role of: {job_role if job_role else 'General Role'}
+{"Compare it strictly against this Job Description:" if job_description else ""}
+{job_description if job_description else ""}
+
+Focus on:
+1. Hard Truths: What is objectively wrong or weak?
+2. Red Flags: Why would a recruiter toss this in the trash in 5 seconds?
+3. Keyword Gaps: What essential skills are missing?
+4. Formatting Nightmares: Is it readable for an ATS?
+
+IMPORTANT: You must also provide a numerical ATS compatibility score between 0 and 100. Be strict. If it's bad, give it a low score.
+
+Format your response as follows:
+ATS Score: [Score]
+Analysis:
+[Your brutal, honest, and direct feedback here in markdown format. Use bolding and headers for emphasis.]
+
+Actionable Suggestions:
+[A numbered list of specific steps the candidate must take to fix the issues identified.]
+
+Resume content:
+{file_content}"""
+
+
+def parse_review_response(text):
+    """Parse ATS score and analysis out of the model's reply"""
+    ats_score = 0
+    analysis_text = text
+
+    if "ATS Score:" in text:
+        try:
+            score_part = text.split("ATS Score:")[1].split("\n")[0].strip()
+            # Leading number only: "72/100" and "72%" are both 72
+            score_match = re.match(r'\D*(\d+)', score_part)
+            if score_match:
+                ats_score = int(score_match.group(1))
+
+            if "Analysis:" in text:
+                analysis_text = text.split("Analysis:")[1].strip()
+            else:
+                analysis_text = text.split(score_part)[1].strip()
+        except:
+            pass
+
+    return {'analysis': analysis_text, 'ats_score': ats_score}
+
+
+def review_resume(generate, file_content, job_role='', job_description=''):
+    """Prompt -> model -> parsed {'analysis', 'ats_score'}; `generate(prompt)` returns the reply text"""
+    return parse_review_response(generate(build_resume_prompt(file_content, job_role, job_description)))
+
+
+# -- image classification --------------------------------------------------
+
+def label_predictions(decode_predictions, predictions, top):
+    """[{'label', 'confidence' (percent)}] for each row of a prediction batch"""
+    return [
+        [{'label': label, 'confidence': float(score * 100)} for _, label, score in row]
+        for row in decode_predictions(predictions, top=top)
+    ]
+
+
+def classify_image(predict, decode_predictions, data, top=3):
+    """Decode, preprocess, predict and label one image; `predict(batch)` returns class scores"""
+    image = image_preprocess.decode_image(data)
+    batch = image_preprocess.preprocess_batch([image])
+    return label_predictions(decode_predictions, predict(batch), top)[0]
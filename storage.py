@@ -0,0 +1,243 @@
+"""Pluggable storage for contact messages and usage logs.
+
+`SupabaseStore` wraps the hosted tables; `SQLiteStore` is the local backend
+used when Supabase is not configured or a write to it fails. The SQLite file
+runs in WAL mode with indexes, so each insert is a single-row append that
+several gunicorn workers can do concurrently (instead of rewriting a whole
+JSON file per message).
+
+Import existing JSON message files once with:
+
+    python storage.py import-json data/messages.json /tmp/spark_data/messages.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+
+def data_dir():
+    """Local data directory (/tmp on Spaces to avoid Permission Denied)"""
+    return '/tmp/spark_data' if os.name != 'nt' else 'data'
+
+
+def default_db_path():
+    return os.getenv("LOCAL_DB_PATH") or os.path.join(data_dir(), 'spark.db')
+
+
+MESSAGE_FIELDS = ('id', 'timestamp', 'name', 'email', 'message')
+
+# Legacy JSON files written by the old contact fallback / shipped in the repo
+LEGACY_MESSAGE_FILES = [os.path.join(data_dir(), 'messages.json'), os.path.join('data', 'messages.json')]
+
+_connections = threading.local()
+
+
+def message_columns(fields=None):
+    """Validate a field projection (it ends up in SQL / PostgREST selects)"""
+    fields = tuple(fields or MESSAGE_FIELDS)
+    unknown = [f for f in fields if f not in MESSAGE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown message fields: {', '.join(unknown)}")
+    return fields
+
+
+def message_cursor(before, before_id=None):
+    """Validate a pagination cursor (it ends up in PostgREST filter strings)
+
+    `before` must be an ISO timestamp and comes back re-serialized, so no
+    commas, quotes or parentheses can reach the filter; ValueError otherwise.
+    """
+    if before_id is not None:
+        try:
+            before_id = int(before_id)
+        except (TypeError, ValueError):
+            raise ValueError("before_id must be an integer")
+    if before is not None:
+        try:
+            before = datetime.fromisoformat(before).isoformat()
+        except (TypeError, ValueError):
+            raise ValueError("before must be an ISO timestamp")
+    return before, before_id
+
+
+def sqlite_connection(path):
+    """Per-thread (and per-process) WAL connection to `path`"""
+    cache = getattr(_connections, 'cache', None)
+    if cache is None or getattr(_connections, 'pid', None) != os.getpid():
+        cache = _connections.cache = {}
+        _connections.pid = os.getpid()
+    db = cache.get(path)
+    if db is None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = sqlite3.connect(path, timeout=10)
+        db.row_factory = sqlite3.Row
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        cache[path] = db
+    return db
+
+
+class SupabaseStore:
+    """Messages and usage logs in the hosted Supabase tables"""
+
+    name = 'supabase'
+
+    def __init__(self, client):
+        self.client = client
+
+    def insert_message(self, message):
+        # No timestamp: Supabase fills 'created_at' by default
+        self.client.table('messages').insert(message).execute()
+
+    def iter_messages(self, before=None, before_id=None, limit=None, fields=None, page_size=500):
+        """Newest first, keyset-paginated; yields rows page by page"""
+        columns = ','.join(message_columns(fields))
+        before, before_id = message_cursor(before, before_id)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            query = self.client.table('messages').select(columns)
+            if before is not None:
+                if before_id is not None:
+                    query = query.or_(f'timestamp.lt."{before}",and(timestamp.eq."{before}",id.lt.{before_id})')
+                else:
+                    query = query.lt('timestamp', before)
+            rows = query.order('timestamp', desc=True).order('id', desc=True).limit(size).execute().data
+            yield from rows
+            if len(rows) < size:
+                return
+            before, before_id = message_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def list_messages(self, **kwargs):
+        return list(self.iter_messages(**kwargs))
+
+    def insert_usage(self, rows):
+        self.client.table('usage_logs').insert(rows).execute()
+
+
+class SQLiteStore:
+    """Indexed local SQLite database in WAL mode"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None, import_legacy=True):
+        self.path = path or default_db_path()
+        with self._db() as db:
+            db.executescript('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    UNIQUE (timestamp, email, message)
+                );
+                CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp, id);
+
+                CREATE TABLE IF NOT EXISTS usage_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    tool_name TEXT NOT NULL,
+                    ip_address TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_usage_logs_timestamp ON usage_logs (timestamp);
+                CREATE INDEX IF NOT EXISTS idx_usage_logs_tool ON usage_logs (tool_name, timestamp);
+
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            ''')
+        if import_legacy:
+            self._import_legacy_once()
+
+    def _db(self):
+        return sqlite_connection(self.path)
+
+    def _import_legacy_once(self):
+        """Bring old messages.json files into a fresh database exactly once"""
+        with self._db() as db:
+            claimed = db.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('legacy_json_imported', ?)",
+                (datetime.now().isoformat(),)
+            ).rowcount
+        if claimed:
+            for path in LEGACY_MESSAGE_FILES:
+                if os.path.exists(path):
+                    count = self.import_json(path)
+                    print(f"📥 Imported {count} messages from {path}")
+
+    def import_json(self, path):
+        """Import a JSON list of messages; re-running it is harmless"""
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                messages = json.load(f)
+            except ValueError:
+                return 0
+        rows = [
+            (m.get('timestamp') or datetime.now().isoformat(), m.get('name', ''),
+             m.get('email', ''), m.get('message', ''))
+            for m in messages if isinstance(m, dict)
+        ]
+        with self._db() as db:
+            before = db.total_changes
+            db.executemany(
+                'INSERT OR IGNORE INTO messages (timestamp, name, email, message) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            return db.total_changes - before
+
+    def insert_message(self, message):
+        with self._db() as db:
+            db.execute(
+                'INSERT OR IGNORE INTO messages (timestamp, name, email, message) VALUES (?, ?, ?, ?)',
+                (message.get('timestamp') or datetime.now().isoformat(),
+                 message['name'], message['email'], message['message'])
+            )
+
+    def iter_messages(self, before=None, before_id=None, limit=None, fields=None):
+        """Newest first, keyset-paginated; rows are yielded as they are read"""
+        columns = ', '.join(message_columns(fields))
+        where, params = '', []
+        if before is not None:
+            if before_id is not None:
+                where = 'WHERE timestamp < ? OR (timestamp = ? AND id < ?)'
+                params = [before, before, int(before_id)]
+            else:
+                where = 'WHERE timestamp < ?'
+                params = [before]
+        sql = f'SELECT {columns} FROM messages {where} ORDER BY timestamp DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        for row in self._db().execute(sql, params):
+            yield dict(row)
+
+    def list_messages(self, **kwargs):
+        return list(self.iter_messages(**kwargs))
+
+    def insert_usage(self, rows):
+        with self._db() as db:
+            db.executemany(
+                'INSERT INTO usage_logs (timestamp, tool_name, ip_address) VALUES (?, ?, ?)',
+                [(r['timestamp'], r['tool_name'], r.get('ip_address')) for r in rows]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SQLite storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    importer = sub.add_parser("import-json", help="import messages.json files")
+    importer.add_argument("files", nargs="+")
+    importer.add_argument("--db", default=None, help="database path (default: $LOCAL_DB_PATH)")
+    args = parser.parse_args()
+
+    store = SQLiteStore(args.db, import_legacy=False)
+    for path in args.files:
+        print(f"✅ {path}: imported {store.import_json(path)} new messages into {store.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMITS", "off")
+# Keep the app's local database out of /tmp/spark_data
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="spark-tests-"), "spark.db"))
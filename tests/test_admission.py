@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from flask import Flask, request
+
+import admission
+import asgi_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('peer, forwarded, hops, expected', [
+    ('10.0.0.1', '203.0.113.7', 0, '10.0.0.1'),
+    ('10.0.0.1', '203.0.113.7', 1, '203.0.113.7'),
+    ('10.0.0.1', 'spoofed, 203.0.113.7', 1, '203.0.113.7'),
+    ('10.0.0.1', 'spoofed, 203.0.113.7, 10.0.0.2', 2, '203.0.113.7'),
+    ('10.0.0.1', '203.0.113.7', 2, '10.0.0.1'),
+    ('10.0.0.1', '', 1, '10.0.0.1'),
+])
+def test_forwarded_client_ip(peer, forwarded, hops, expected):
+    assert admission.forwarded_client_ip(peer, forwarded, hops) == expected
+
+
+def test_flask_and_asgi_agree_on_client_ip(monkeypatch):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXY_HOPS', 1)
+    flask_app = Flask(__name__)
+    admission.init_app(flask_app, admission.RateLimiter(limits={}))
+    flask_app.add_url_rule('/ip', 'ip', lambda: request.remote_addr)
+
+    forwarded = 'spoofed, 203.0.113.7'
+    response = flask_app.test_client().get('/ip', headers={'X-Forwarded-For': forwarded},
+                                           environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    scope = {'client': ('10.0.0.1', 443), 'headers': [(b'x-forwarded-for', forwarded.encode())]}
+    assert response.get_data(as_text=True) == asgi_app.client_ip(scope) == '203.0.113.7'
+
+
+def test_asgi_client_ip_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXY_HOPS', 0)
+    scope = {'client': ('10.0.0.1', 443), 'headers': [(b'x-forwarded-for', b'203.0.113.7')]}
+    assert asgi_app.client_ip(scope) == '10.0.0.1'
+
+
+def test_default_limits_need_trusted_proxy_hops():
+    assert admission.parse_limits('off') == {}
+    assert admission.parse_limits('default') == admission.parse_limits(admission.DEFAULT_RATE_LIMITS)
+    assert admission.parse_limits('default')['/api/chat'] == (20, 60)
+
+
+@pytest.mark.parametrize('hops, rate_limits, enabled', [
+    ('0', None, False),
+    ('1', None, True),
+    ('0', 'default', True),
+    ('1', 'off', False),
+])
+def test_rate_limits_default(hops, rate_limits, enabled):
+    # Module-level settings: read them in a fresh interpreter
+    env = {k: v for k, v in os.environ.items() if k != 'RATE_LIMITS'}
+    env.update({'TRUSTED_PROXY_HOPS': hops, 'PYTHONPATH': ROOT})
+    if rate_limits is not None:
+        env['RATE_LIMITS'] = rate_limits
+    result = subprocess.run([sys.executable, '-c', 'import admission; print(admission.RateLimiter().enabled)'],
+                            env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == str(enabled)
+
+
+def test_proxy_warning_is_logged_once(monkeypatch, capsys):
+    monkeypatch.setattr(admission, 'TRUSTED_PROXY_HOPS', 0)
+    monkeypatch.setattr(admission, '_proxy_warned', False)
+    limiter = admission.RateLimiter(limits={'/api/chat': (20, 60)})
+    admission.warn_untrusted_proxy(limiter, '')
+    assert capsys.readouterr().out == ''
+    admission.warn_untrusted_proxy(limiter, '203.0.113.7')
+    admission.warn_untrusted_proxy(limiter, '203.0.113.8')
+    assert capsys.readouterr().out.count('⚠️') == 1
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import pytest
+
+import admission
+import app as flask_app
+import asgi_app
+
+SCOPE = {'type': 'http', 'client': ('127.0.0.1', 5000), 'query_string': b''}
+BODY = json.dumps({'message': 'Summarize the plot of Hamlet'}).encode()
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    gate = admission.ConcurrencyGate(limit=2, max_queue=0, max_wait=1)
+    monkeypatch.setattr(flask_app.llm_gateway, 'gate', gate)
+    monkeypatch.setattr(flask_app.chat_cache, 'enabled', False)
+    return gate
+
+
+def test_stream_never_iterated_releases_slot(gate):
+    async def run():
+        status, stream, _ = await asgi_app.chat_stream(SCOPE, BODY)
+        assert status == 200
+        assert gate.active == 1
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert gate.active == 0
+
+
+def test_client_gone_before_headers_releases_slot(gate):
+    async def send(message):
+        raise OSError('client disconnected')
+
+    async def run():
+        status, stream, headers = await asgi_app.chat_stream(SCOPE, BODY)
+        with pytest.raises(OSError):
+            await asgi_app.send_response(send, status, stream, extra_headers=headers)
+
+    asyncio.run(run())
+    assert gate.active == 0
+
+
+def call_asgi(method, path, query=b''):
+    """Run one request through asgi_app.app; returns (status, body bytes)"""
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'headers': [],
+             'client': ('127.0.0.1', 5000), 'server': ('localhost', 80), 'http_version': '1.1'}
+    asyncio.run(asgi_app.app(scope, receive, send))
+    body = b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+    return sent[0]['status'], body
+
+
+def test_async_ndjson_export_streams_from_one_thread(monkeypatch):
+    monkeypatch.setattr(flask_app, 'get_supabase', lambda: None)
+    store = flask_app.local_store
+    for i in range(300):
+        store.insert_message({'timestamp': f'2026-01-01T00:{i // 60:02d}:{i % 60:02d}',
+                              'name': f'user {i}', 'email': f'u{i}@example.com', 'message': 'hello'})
+    total = len(store.list_messages())
+
+    status, body = call_asgi('GET', '/api/messages', b'key=spark_admin_2025&format=ndjson')
+    assert status == 200
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+    assert len(rows) == total >= 300
+    assert 'error' not in rows[-1]
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+import app as flask_app
+import asgi_app
+
+SCOPE = {'type': 'http', 'client': ('127.0.0.1', 5000), 'query_string': b''}
+BAD_BODIES = [
+    ('not json', 'application/json'),
+    ('{"message": "hi"}', 'text/plain'),
+    ('', None),
+    ('["hi"]', 'application/json'),
+    ('null', 'application/json'),
+]
+
+
+@pytest.fixture
+def client():
+    return flask_app.app.test_client()
+
+
+@pytest.mark.parametrize('path', ['/api/chat', '/api/chat/stream'])
+@pytest.mark.parametrize('body, content_type', BAD_BODIES)
+def test_flask_chat_rejects_non_object_body(client, path, body, content_type):
+    response = client.post(path, data=body, content_type=content_type)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Request body must be a JSON object'}
+
+
+@pytest.mark.parametrize('view', [asgi_app.chat, asgi_app.chat_stream])
+@pytest.mark.parametrize('body', [b'not json', b'', b'["hi"]', b'null', b'\xff'])
+def test_async_chat_rejects_non_object_body(view, body):
+    status, payload, _ = asyncio.run(view(SCOPE, body))
+    assert status == 400
+    assert payload == {'error': 'Request body must be a JSON object'}
+
+
+@pytest.mark.parametrize('path', ['/api/chat', '/api/chat/stream'])
+@pytest.mark.parametrize('conversation_id', ['../../pwned_dir/evil', 'a/b', 'x' * 65, [1], {'id': 1}, 42])
+def test_chat_rejects_invalid_conversation_ids(client, path, conversation_id):
+    assert flask_app.chat_sessions.enabled
+    response = client.post(path, json={'conversationId': conversation_id, 'message': 'hi'})
+    assert response.status_code == 400
+    assert 'conversationId' in response.get_json()['error']
+
+
+def test_async_chat_rejects_invalid_conversation_id():
+    body = b'{"conversationId": "../../pwned_dir/evil", "message": "hi"}'
+    status, payload, _ = asyncio.run(asgi_app.chat(SCOPE, body))
+    assert status == 400
@@ -0,0 +1,55 @@
+import pytest
+
+from chat_cache import SemanticChatCache, content_words, skip_reason
+
+
+@pytest.fixture
+def cache():
+    return SemanticChatCache(max_entries=16, ttl=60, enabled=True)
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ('how do i connect flask to postgresql', 'how do i connect flask to mysql'),
+    ('write a cover letter for a junior python developer', 'write a cover letter for a senior python developer'),
+    ('is it safe to take ibuprofen with alcohol', 'is it not safe to take ibuprofen with alcohol'),
+    ('vegan cake recipe without eggs', 'vegan cake recipe with eggs'),
+    ("is it safe to take ibuprofen with alcohol", "isn't it safe to take ibuprofen with alcohol"),
+    ('what is 2+2', 'what is 2+3'),
+    ('what is 2+2', 'what is 2-2'),
+    ('who are you', 'who are you not'),
+])
+def test_near_misses_are_not_served(cache, cached, asked):
+    assert cache.store(cached, 'cached reply', 'basic', 1000.0)
+    assert cache.lookup(asked) is None
+    assert cache.misses == 1
+
+
+@pytest.mark.parametrize('cached, asked', [
+    ('who are you?', 'Who are you'),
+    ('who are you?', 'hey, who are u?'),
+    ('What can you do?', 'what can you do please'),
+])
+def test_rephrasings_are_served(cache, cached, asked):
+    cache.store(cached, 'I am S.P.A.R.K.', 'basic', 1200.0)
+    hit = cache.lookup(asked)
+    assert hit is not None
+    assert hit['reply'] == 'I am S.P.A.R.K.'
+    assert hit['saved_ms'] == 1200.0
+
+
+def test_negations_are_content_words():
+    assert content_words('is it not safe') != content_words('is it safe')
+    assert content_words('without eggs') != content_words('with eggs')
+    assert content_words('Hey, who are u?') == content_words('who are you')
+
+
+def test_only_short_single_turn_questions_are_cached():
+    assert skip_reason('who are you?') is None
+    assert skip_reason('who are you?', has_context=True) == 'context'
+    assert skip_reason('explain ' + 'this concept in detail ' * 5) == 'long'
+    assert skip_reason("what's the weather today") == 'time_sensitive'
+    assert skip_reason('   ') == 'empty'
+
+
+def test_default_threshold_is_strict():
+    assert SemanticChatCache(enabled=True).threshold >= 0.97
@@ -0,0 +1,42 @@
+import pytest
+
+from chat_sessions import ConversationStore
+from result_cache import DiskBackend
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ConversationStore(DiskBackend(str(tmp_path / 'sessions')), ttl=60)
+
+
+def test_new_ids_are_valid():
+    assert ConversationStore.valid_id(ConversationStore.new_id())
+    assert ConversationStore.valid_id('client-chosen_ID-1')
+
+
+@pytest.mark.parametrize('conversation_id', ['../evil', '..', 'a/b', 'a\\b', '', 'x' * 65, [1], None])
+def test_invalid_ids(conversation_id):
+    assert not ConversationStore.valid_id(conversation_id)
+
+
+def test_path_traversal_id_never_reaches_the_disk(store, tmp_path):
+    with pytest.raises(ValueError):
+        store.load('../../pwned_dir/evil')
+    with pytest.raises(ValueError):
+        store.append('../../pwned_dir/evil', {'turns': [], 'summary': ''}, 'hi', 'hello')
+    assert not (tmp_path / 'pwned_dir').exists()
+
+
+def test_round_trip(store):
+    conversation_id = store.new_id()
+    store.append(conversation_id, store.load(conversation_id), 'hi', 'hello')
+    assert [t['content'] for t in store.load(conversation_id)['turns']] == ['hi', 'hello']
+
+
+@pytest.mark.parametrize('key', ['../evil', 'a/b', '..', ''])
+def test_disk_backend_refuses_paths(tmp_path, key):
+    backend = DiskBackend(str(tmp_path / 'cache'))
+    with pytest.raises(ValueError):
+        backend.set(key, None, {'value': 1})
+    with pytest.raises(ValueError):
+        backend.get(key)
@@ -0,0 +1,30 @@
+import io
+
+import pytest
+
+import app as flask_app
+import batch_classify
+from bench_image_preprocess import make_image
+
+
+def classify(data, filename='photo.jpg'):
+    return flask_app.app.test_client().post(
+        '/api/image-classify', data={'file': (io.BytesIO(data), filename)}, content_type='multipart/form-data')
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'this is not an image', 'Not a valid JPG or PNG image'),
+    (make_image(640, 480, 'JPEG')[:400], 'Could not decode image'),
+])
+def test_undecodable_uploads_are_client_errors(data, message):
+    response = classify(data)
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(message)
+
+
+def test_batch_reports_the_same_decode_error():
+    items = [('photo.jpg', b'this is not an image', None)]
+    classifier = batch_classify.BatchClassifier(lambda batch: batch, lambda preds, top: [], batch_size=1, workers=1)
+    [result] = list(classifier.run(items, 3))
+    assert result['success'] is False
+    assert result['error'] == 'Not a valid JPG or PNG image'
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from llm_gateway import LLMGateway, LLMUnavailable, is_transient
+
+
+class Reply:
+    """Model reply; reading `.text` raises `error` like a safety-blocked response"""
+
+    def __init__(self, text=None, error=None):
+        self._text = text
+        self.error = error
+
+    @property
+    def text(self):
+        if self.error is not None:
+            raise self.error
+        return self._text
+
+
+class FakeModel:
+    """Chat model whose replies raise `error` when their text is read"""
+
+    def __init__(self, error=None, text='ok'):
+        self.error = error
+        self.text = text
+        self.calls = 0
+
+    def get(self):
+        return self
+
+    def start_chat(self, history=None):
+        return self
+
+    def send_message(self, prompt, request_options=None, stream=False):
+        self.calls += 1
+        return Reply(self.text, self.error)
+
+    async def send_message_async(self, prompt, request_options=None, stream=False):
+        return self.send_message(prompt, request_options, stream)
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def gateway(search, basic):
+    return LLMGateway({'search': search, 'basic': basic}, timeout=5, retries=1,
+                      failure_threshold=3, reset_timeout=3600)
+
+
+@pytest.mark.parametrize('error, transient', [
+    (TimeoutError('slow'), True),
+    (ConnectionError('reset'), True),
+    (UpstreamError(429), True),
+    (UpstreamError(503), True),
+    (UpstreamError(400), False),
+    (ValueError('response was blocked'), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_blocked_prompts_leave_breakers_closed():
+    search, basic = FakeModel(ValueError('response was blocked')), FakeModel()
+    llm = gateway(search, basic)
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            llm.chat(['search', 'basic'], [], 'blocked prompt')
+    assert {name: b.state for name, b in llm.breakers.items()} == {'search': 'closed', 'basic': 'closed'}
+    # No retries and no fallback to the basic model for the caller's own error
+    assert search.calls == 5 and basic.calls == 0 and llm.retried == 0
+    search.error = None
+    assert llm.chat(['search', 'basic'], [], 'harmless') == ('ok', 'search')
+
+
+def test_async_blocked_prompts_leave_breakers_closed():
+    llm = gateway(FakeModel(ValueError('response was blocked')), FakeModel())
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            asyncio.run(llm.achat(['search', 'basic'], [], 'blocked prompt'))
+    assert all(b.state == 'closed' for b in llm.breakers.values())
+
+
+def test_upstream_failures_fall_back_and_open_the_breaker():
+    search, basic = FakeModel(UpstreamError(503)), FakeModel()
+    llm = gateway(search, basic)
+    for _ in range(3):
+        assert llm.chat(['search', 'basic'], [], 'hi') == ('ok', 'basic')
+    assert llm.breakers['search'].state == 'open'
+    assert llm.breakers['basic'].state == 'closed'
+    search.error = basic.error = UpstreamError(503)
+    for _ in range(3):
+        with pytest.raises(UpstreamError):
+            llm.chat(['basic'], [], 'hi')
+    with pytest.raises(LLMUnavailable):
+        llm.chat(['search', 'basic'], [], 'hi')
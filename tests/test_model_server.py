@@ -0,0 +1,38 @@
+import pytest
+
+import model_server
+from model_server import ModelServer, ModelServerClient, parse_address
+
+
+def test_parse_address():
+    assert parse_address("127.0.0.1:6000") == ("127.0.0.1", 6000)
+    assert parse_address("/tmp/spark_model_server.sock") == "/tmp/spark_model_server.sock"
+    assert parse_address("") is None
+
+
+def test_tcp_address_without_authkey_is_rejected(monkeypatch):
+    monkeypatch.delenv("MODEL_SERVER_AUTHKEY", raising=False)
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        ModelServer(lambda batch: batch, address=("0.0.0.0", 6000))
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        ModelServerClient(address=("127.0.0.1", 6000))
+
+
+def test_tcp_address_from_env_without_authkey_is_rejected(monkeypatch):
+    monkeypatch.delenv("MODEL_SERVER_AUTHKEY", raising=False)
+    monkeypatch.setenv("MODEL_SERVER_ADDRESS", "127.0.0.1:6000")
+    with pytest.raises(ValueError):
+        ModelServerClient()
+
+
+def test_tcp_address_with_authkey_is_accepted(monkeypatch):
+    monkeypatch.setenv("MODEL_SERVER_AUTHKEY", "s3cret")
+    client = ModelServerClient(address=("127.0.0.1", 6000))
+    assert client.enabled
+    assert model_server._authkey(client.address) == b"s3cret"
+
+
+def test_unix_socket_keeps_default_authkey(monkeypatch):
+    monkeypatch.delenv("MODEL_SERVER_AUTHKEY", raising=False)
+    client = ModelServerClient(address="/tmp/spark_model_server.sock")
+    assert model_server._authkey(client.address) == b"spark-model-server"
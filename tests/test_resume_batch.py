@@ -0,0 +1,43 @@
+import threading
+import time
+
+from resume_batch import ResumeBatchReviewer, ranking
+
+
+def test_closing_the_stream_cancels_queued_reviews():
+    release = threading.Event()
+    calls = []
+
+    def prepare(filename, data):
+        if filename not in ('cv0.txt', 'cv1.txt'):
+            release.wait(5)  # a slow extraction holds the only extract thread
+        return f'prompt {filename}', filename, None, {'prompt_tokens': 10}, None
+
+    def review(prompt, key):
+        calls.append(key)
+        if len(calls) > 1:
+            release.wait(5)  # the rest are slow Gemini calls
+        return {'analysis': 'ok', 'ats_score': 50}
+
+    reviewer = ResumeBatchReviewer(workers=1, extract_workers=1)
+    items = [(f'cv{i}.txt', b'resume', None) for i in range(6)]
+    lines = reviewer.run(items, prepare, review)
+    first = next(lines)
+    assert first['type'] == 'result' and first['success']
+
+    lines.close()  # client disconnected
+    release.set()
+    time.sleep(0.2)
+    # Only the review already running when the client left went on to completion
+    assert len(calls) <= 2
+    # cv3..cv5 were still queued for extraction
+    assert reviewer.stats()['cancelled'] >= 3
+
+
+def test_ranking_orders_by_score():
+    results = [
+        {'type': 'result', 'index': 0, 'filename': 'a', 'success': True, 'ats_score': 40},
+        {'type': 'result', 'index': 1, 'filename': 'b', 'success': True, 'ats_score': 80},
+        {'type': 'result', 'index': 2, 'filename': 'c', 'success': False},
+    ]
+    assert [r['filename'] for r in ranking(results)] == ['b', 'a']
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+import app as flask_app
+import spark_core
+from spark_core import RequestError
+
+
+def test_txt_resume_is_decoded_as_utf8():
+    assert spark_core.extract_resume_text('cv.txt', 'Zoë — Python developer'.encode('utf-8')) == 'Zoë — Python developer'
+
+
+def test_non_utf8_txt_resume_is_a_request_error():
+    with pytest.raises(RequestError, match='UTF-8') as error:
+        spark_core.extract_resume_text('cv.txt', 'Zoë, développeuse Python'.encode('latin-1'))
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize('filename, data, message', [
+    ('cv.txt', b'  \n', 'File does not have any content'),
+    ('cv.docx', b'resume', 'Invalid file type. Only PDF and TXT are supported'),
+])
+def test_invalid_resume_uploads(filename, data, message):
+    with pytest.raises(RequestError, match=message):
+        spark_core.extract_resume_text(filename, data)
+
+
+def test_resume_review_answers_400_for_non_utf8_txt():
+    response = flask_app.app.test_client().post(
+        '/api/resume-review',
+        data={'file': (io.BytesIO('Zoë, développeuse Python'.encode('latin-1')), 'cv.txt')},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Resume .txt file must be UTF-8 text'}
+
+
+@pytest.mark.parametrize('reply, score', [
+    ('ATS Score: 72\nAnalysis:\nWeak.', 72),
+    ('ATS Score: 72/100\nAnalysis:\nWeak.', 72),
+    ('ATS Score: 85%\nAnalysis:\nGood.', 85),
+    ('No score here', 0),
+])
+def test_parse_review_response(reply, score):
+    assert spark_core.parse_review_response(reply)['ats_score'] == score
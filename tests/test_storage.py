@@ -0,0 +1,64 @@
+import pytest
+
+import app as flask_app
+from storage import SupabaseStore, message_cursor
+
+
+class FakeQuery:
+    """Records the PostgREST calls of a messages query"""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return call
+
+    def execute(self):
+        return type('Result', (), {'data': []})()
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def table(self, name):
+        return FakeQuery(self.calls)
+
+
+def test_message_cursor_is_reserialized():
+    assert message_cursor('2026-01-01T10:00:00.5+00:00', '7') == ('2026-01-01T10:00:00.500000+00:00', 7)
+    assert message_cursor(None, None) == (None, None)
+
+
+@pytest.mark.parametrize('before, before_id', [
+    ('2026-01-01T00:00:00",id.gt.0),or(id.gt.0', 1),
+    ('not a date', None),
+    ('2026-01-01', 'abc'),
+])
+def test_bad_cursors_never_reach_the_filter(before, before_id):
+    client = FakeClient()
+    with pytest.raises(ValueError):
+        list(SupabaseStore(client).iter_messages(before=before, before_id=before_id))
+    assert not any(name == 'or_' for name, _ in client.calls)
+
+
+def test_supabase_filter_uses_the_parsed_cursor():
+    client = FakeClient()
+    list(SupabaseStore(client).iter_messages(before='2026-01-01T10:00:00+00:00', before_id='5'))
+    assert ('or_', ('timestamp.lt."2026-01-01T10:00:00+00:00",'
+                    'and(timestamp.eq."2026-01-01T10:00:00+00:00",id.lt.5)',)) in client.calls
+
+
+@pytest.mark.parametrize('query', ['before=2026-01-01),id.gt.(0', 'before=2026-01-01&before_id=abc',
+                                   'before_id=1.5'])
+def test_messages_endpoint_rejects_bad_cursors(query):
+    response = flask_app.app.test_client().get(f'/api/messages?key=spark_admin_2025&{query}')
+    assert response.status_code == 400
+
+
+def test_messages_endpoint_accepts_a_cursor():
+    response = flask_app.app.test_client().get('/api/messages?key=spark_admin_2025&before=2026-01-01&before_id=3')
+    assert response.status_code == 200
@@ -0,0 +1,48 @@
+import json
+import time
+
+from usage_logger import UsageLogWriter
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_truncated_spill_line_is_skipped(tmp_path):
+    spill = tmp_path / 'usage_spill.jsonl'
+    spill.write_text(json.dumps({'tool_name': 'chat'}) + '\n{"tool_name": "res\n' +
+                     json.dumps({'tool_name': 'image'}) + '\n')
+    written = []
+    writer = UsageLogWriter(written.extend, batch_size=10, flush_interval=0.01, spill_path=str(spill))
+    writer.log({'tool_name': 'contact'})
+    assert wait_for(lambda: writer.replayed == 2)
+    assert [row['tool_name'] for row in written] == ['contact', 'chat', 'image']
+    assert writer.stats()['corrupt_spill_lines'] == 1
+    assert not spill.exists()
+    writer.close()
+
+
+def test_writer_survives_a_failing_batch(tmp_path):
+    written = []
+
+    class FlakyWriter(UsageLogWriter):
+        replay_failures = 1
+
+        def _replay(self):
+            # An unexpected error escaping the batch write
+            if self.replay_failures:
+                self.replay_failures -= 1
+                raise RuntimeError('replay bug')
+            super()._replay()
+
+    writer = FlakyWriter(written.extend, batch_size=1, flush_interval=0.01,
+                         spill_path=str(tmp_path / 'spill.jsonl'))
+    writer.log({'tool_name': 'first'})
+    assert wait_for(lambda: writer.failures == 1)
+    writer.log({'tool_name': 'second'})
+    assert wait_for(lambda: len(written) == 2)
+    assert writer._worker.is_alive()
+    writer.close()
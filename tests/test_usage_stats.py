@@ -0,0 +1,42 @@
+from usage_stats import UsageRollups
+
+
+def make_rollups(tmp_path):
+    rollups = UsageRollups(str(tmp_path / "spark.db"))
+    rollups.record([
+        {'tool_name': 'chat', 'timestamp': '2026-01-01T10:05:00'},
+        {'tool_name': 'chat', 'timestamp': '2026-01-01T10:50:00'},
+        {'tool_name': 'resume', 'timestamp': '2026-01-01T11:10:00'},
+    ])
+    return rollups
+
+
+def test_totals_and_series_share_hour_boundaries(tmp_path):
+    rollups = make_rollups(tmp_path)
+    # A start in the middle of an hour still counts that whole hour, like series()
+    assert rollups.totals('2026-01-01T10:30:00', '2026-01-01T12:00:00') == {'chat': 2, 'resume': 1}
+    series = rollups.series('hour', '2026-01-01T10:30:00', '2026-01-01T12:00:00')
+    assert sum(b['total'] for b in series) == 3
+    assert rollups.totals('2026-01-01T11:00:00', '2026-01-01T12:00:00') == {'resume': 1}
+    assert rollups.totals() == {'chat': 2, 'resume': 1}
+
+
+def test_empty_rollups_are_seeded_once(tmp_path):
+    rollups = UsageRollups(str(tmp_path / "spark.db"))
+    seen = []
+
+    def fetch(before):
+        seen.append(before)
+        return [{'tool_name': 'chat', 'timestamp': '2026-01-01T10:05:00'}]
+
+    thread = rollups.seed_in_background(fetch)
+    thread.join(5)
+    assert rollups.totals() == {'chat': 1}
+    assert len(seen) == 1
+    # Another worker (or a restart on the same database) does not seed again
+    assert UsageRollups(rollups.path).seed_in_background(fetch) is None
+
+
+def test_rollups_with_data_are_not_seeded(tmp_path):
+    rollups = make_rollups(tmp_path)
+    assert rollups.seed_in_background(lambda before: []) is None
@@ -0,0 +1,205 @@
+"""Asynchronous, batched usage logging.
+
+`log_usage` only enqueues a row; a background thread bulk-inserts queued rows
+in batches (by size or interval). When the backend is down the batch is
+appended to a local JSONL spill file and replayed once writes succeed again.
+The queue is bounded, so a slow backend costs dropped log rows, never request
+latency.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+
+def default_spill_path():
+    data_dir = '/tmp/spark_data' if os.name != 'nt' else 'data'
+    return os.path.join(data_dir, 'usage_spill.jsonl')
+
+
+class UsageLogWriter:
+    """Bounded in-memory queue drained by a background bulk writer"""
+
+    def __init__(self, insert_fn, max_queue=None, batch_size=None,
+                 flush_interval=None, spill_path=None, on_batch=None):
+        self.insert_fn = insert_fn
+        self.on_batch = on_batch
+        self.batch_size = batch_size or int(os.getenv("USAGE_LOG_BATCH_SIZE", "50"))
+        self.flush_interval = flush_interval or float(os.getenv("USAGE_LOG_FLUSH_SECONDS", "2"))
+        self.spill_path = spill_path or default_spill_path()
+        self._max_queue = max_queue or int(os.getenv("USAGE_LOG_MAX_QUEUE", "10000"))
+        self._queue = queue.Queue(maxsize=self._max_queue)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.corrupt = 0
+        self.failures = 0
+        self.last_error = None
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue(maxsize=self._max_queue)
+            self._worker_pid = pid
+            self._worker = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+            self._worker.start()
+
+    def log(self, entry):
+        """Enqueue one row without blocking; drops it if the queue is full"""
+        if self._closed:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            if batch:
+                self._write(batch)
+
+    def _collect(self):
+        """Wait for the first row, then gather more until size or interval"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: write what we have, then stop
+                self._write(batch)
+                return None
+            batch.append(item)
+        return batch
+
+    def _write(self, batch):
+        """Write one batch; an unexpected error is logged, never kills the writer thread"""
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"⚠️ Usage log writer error ({len(batch)} rows): {str(e)}")
+
+    def _write_batch(self, batch):
+        if self.on_batch is not None:
+            # Runs once per fresh batch (never for replays) so counts stay exact
+            try:
+                self.on_batch(batch)
+            except Exception as e:
+                print(f"⚠️ Usage batch listener failed: {str(e)}")
+        try:
+            self.insert_fn(batch)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"⚠️ Failed to log usage ({len(batch)} rows), spilling to disk: {str(e)}")
+            self._spill(batch)
+            return
+        self.written += len(batch)
+        self._replay()
+
+    def _spill(self, batch):
+        try:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for row in batch:
+                    f.write(json.dumps(row) + '\n')
+            self.spilled += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"❌ Could not spill usage logs: {str(e)}")
+
+    def _replay(self):
+        """Re-send spilled rows now that the backend accepts writes again"""
+        if not os.path.exists(self.spill_path):
+            return
+        replay_path = f"{self.spill_path}.{os.getpid()}.replay"
+        try:
+            os.replace(self.spill_path, replay_path)  # claim it; other workers skip
+        except OSError:
+            return
+        rows = []
+        with open(replay_path, 'r', encoding='utf-8', errors='replace') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # e.g. a line cut short by a crash mid-write
+                    self.corrupt += 1
+                    print(f"⚠️ Skipping undecodable usage spill line {number}")
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
+            try:
+                self.insert_fn(chunk)
+            except Exception as e:
+                self.last_error = str(e)
+                self._spill(rows[start:])
+                break
+            self.replayed += len(chunk)
+        os.unlink(replay_path)
+
+    def flush(self, timeout=5.0):
+        """Block until the queue has drained (best effort)"""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def close(self, timeout=5.0):
+        """Flush remaining rows and stop the writer (called at exit)"""
+        if self._closed:
+            return
+        self._closed = True
+        worker = self._worker
+        if worker is None or self._worker_pid != os.getpid() or not worker.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        worker.join(timeout)
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue': self._max_queue,
+            'batch_size': self.batch_size,
+            'flush_interval_seconds': self.flush_interval,
+            'written': self.written,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'replayed': self.replayed,
+            'corrupt_spill_lines': self.corrupt,
+            'failures': self.failures,
+            'last_error': self.last_error
+        }
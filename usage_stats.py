@@ -0,0 +1,197 @@
+"""Incrementally maintained usage statistics.
+
+Instead of scanning every `usage_logs` row on each `/api/stats` call, the
+usage log writer feeds each batch into per-tool counters and hour/day
+buckets kept in the local SQLite database (see storage.py). Every gunicorn
+worker updates the same file, the numbers are available in local-only mode
+too, and a query touches at most one row per tool per bucket in the range.
+
+When Supabase is configured and the rollup table starts out empty (a fresh
+/tmp after a redeploy), the API backfills it from `usage_logs` in the
+background; rows logged after that point are counted live. Rebuild the
+rollups from existing Supabase rows by hand with:
+
+    python usage_stats.py --from-supabase
+
+Time ranges are widened to whole buckets: `from` rounds down to the start of
+its hour (or day, for a day series) and a bucket is included when it starts
+before `to`, so a partial hour at either end counts in full.
+"""
+import argparse
+import os
+import threading
+from datetime import datetime, timedelta
+
+from storage import default_db_path, sqlite_connection
+
+BUCKETS = ('hour', 'day')
+ALL_TIME = 'all'
+
+
+def bucket_start(timestamp, bucket):
+    """Truncate an ISO timestamp to the start of its hour/day bucket"""
+    if bucket == 'hour':
+        return timestamp[:13] + ':00:00'
+    return timestamp[:10] + 'T00:00:00'
+
+
+def parse_time(value, end=False):
+    """Accept YYYY-MM-DD or a full ISO timestamp; dates cover the whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) <= 10:
+        parsed += timedelta(days=1)
+    return parsed.replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+class UsageRollups:
+    """Per-tool totals and hour/day buckets, updated as usage is logged"""
+
+    def __init__(self, path=None):
+        self.path = path or default_db_path()
+        with self._connect() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS usage_rollups (
+                bucket TEXT NOT NULL,
+                start TEXT NOT NULL,
+                tool_name TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, start, tool_name)
+            )''')
+            # One row once a worker has claimed the Supabase backfill
+            db.execute('CREATE TABLE IF NOT EXISTS usage_rollups_seed (cutoff TEXT NOT NULL)')
+
+    def _connect(self):
+        return sqlite_connection(self.path)
+
+    def record(self, rows):
+        """Add a batch of usage rows to every rollup in one transaction"""
+        counts = {}
+        for row in rows:
+            tool = row['tool_name']
+            timestamp = row.get('timestamp') or datetime.now().isoformat()
+            keys = [(ALL_TIME, '', tool)] + [(b, bucket_start(timestamp, b), tool) for b in BUCKETS]
+            for key in keys:
+                counts[key] = counts.get(key, 0) + 1
+        if not counts:
+            return
+        with self._connect() as db:
+            db.executemany(
+                '''INSERT INTO usage_rollups (bucket, start, tool_name, count) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (bucket, start, tool_name) DO UPDATE SET count = count + excluded.count''',
+                [(b, start, tool, n) for (b, start, tool), n in counts.items()]
+            )
+
+    def totals(self, start=None, end=None):
+        """Per-tool counts, all-time or for the hours overlapping [start, end)"""
+        if start is None and end is None:
+            rows = self._connect().execute(
+                'SELECT tool_name, count FROM usage_rollups WHERE bucket = ?', (ALL_TIME,)
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                '''SELECT tool_name, SUM(count) FROM usage_rollups
+                   WHERE bucket = 'hour' AND start >= ? AND start < ?
+                   GROUP BY tool_name''',
+                (bucket_start(start, 'hour') if start else '', end or '9999')
+            ).fetchall()
+        return {tool: count for tool, count in rows}
+
+    def series(self, bucket, start=None, end=None):
+        """Per-bucket breakdowns for the buckets overlapping [start, end), oldest first"""
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+        rows = self._connect().execute(
+            '''SELECT start, tool_name, count FROM usage_rollups
+               WHERE bucket = ? AND start >= ? AND start < ?
+               ORDER BY start''',
+            (bucket, bucket_start(start, bucket) if start else '', end or '9999')
+        ).fetchall()
+        series = []
+        for start_at, tool, count in rows:
+            if not series or series[-1]['start'] != start_at:
+                series.append({'start': start_at, 'total': 0, 'breakdown': {}})
+            series[-1]['breakdown'][tool] = count
+            series[-1]['total'] += count
+        return series
+
+    def rebuild(self, rows):
+        """Replace all rollups with counts computed from `rows`"""
+        with self._connect() as db:
+            db.execute('DELETE FROM usage_rollups')
+        self.record(rows)
+
+    def _claim_seed(self):
+        """Cutoff timestamp if the rollups are empty and nobody seeded them yet, else None"""
+        db = self._connect()
+        with db:
+            # Write lock first, so only one worker of a fresh deploy wins
+            db.execute('BEGIN IMMEDIATE')
+            if (db.execute('SELECT 1 FROM usage_rollups LIMIT 1').fetchone()
+                    or db.execute('SELECT 1 FROM usage_rollups_seed').fetchone()):
+                return None
+            cutoff = datetime.now().isoformat(timespec='seconds')
+            db.execute('INSERT INTO usage_rollups_seed (cutoff) VALUES (?)', (cutoff,))
+        return cutoff
+
+    def seed_in_background(self, fetch_rows):
+        """Backfill empty rollups once with `fetch_rows(before)` on a daemon thread
+
+        Only rows older than the claim are added; anything logged from then on
+        is already counted by `record`. Returns the thread, or None when the
+        rollups already hold data.
+        """
+        cutoff = self._claim_seed()
+        if cutoff is None:
+            return None
+
+        def run():
+            try:
+                rows = list(fetch_rows(cutoff))
+                self.record(rows)
+                print(f"✅ Seeded usage rollups from {len(rows)} usage rows")
+            except Exception as e:
+                print(f"⚠️ Failed to seed usage rollups (run `python usage_stats.py --from-supabase`): {str(e)}")
+
+        thread = threading.Thread(target=run, name="usage-rollups-seed", daemon=True)
+        thread.start()
+        return thread
+
+
+def supabase_rows(client=None, before=None, page_size=1000):
+    """Every (timestamp, tool_name) row of Supabase usage_logs, optionally before a timestamp"""
+    if client is None:
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    offset = 0
+    while True:
+        query = client.table('usage_logs').select('timestamp,tool_name')
+        if before:
+            query = query.lt('timestamp', before)
+        result = query.order('timestamp').range(offset, offset + page_size - 1).execute()
+        yield from result.data
+        if len(result.data) < page_size:
+            break
+        offset += page_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild usage rollups")
+    parser.add_argument("--from-supabase", action="store_true",
+                        help="recount everything in the Supabase usage_logs table")
+    parser.add_argument("--db", default=None, help="rollup database path")
+    args = parser.parse_args()
+
+    rollups = UsageRollups(args.db)
+    if args.from_supabase:
+        rows = list(supabase_rows())
+        rollups.rebuild(rows)
+        print(f"✅ Rebuilt rollups from {len(rows)} usage rows")
+    print(rollups.totals())
+
+
+if __name__ == "__main__":
+    main()